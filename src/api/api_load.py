@@ -1,11 +1,23 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.responses import RedirectResponse
 from src.api.routes.load import router as load_router
+from src.api.startup import prepare_database
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Tablas y columnas nuevas antes de la primera carga
+    await prepare_database()
+    yield
+
 
 app = FastAPI(
     title="IEI ITV API",
     description="API para carga de estaciones",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 app.include_router(load_router)
@@ -1,14 +1,31 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.responses import RedirectResponse
+from src.api.read_model import station_read_model
 from src.api.routes.search import router as search_router
+from src.api.routes.autocomplete import router as autocomplete_router
+from src.api.startup import prepare_database
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Esquema al día y tabla de lectura rellena antes de cargar el catálogo
+    await prepare_database()
+    # El catálogo en memoria queda cargado antes de la primera búsqueda
+    await station_read_model.start()
+    yield
+
 
 app = FastAPI(
     title="IEI ITV API",
     description="API para búsqueda de estaciones ITV en España",
-    version="1.0.1"
+    version="1.0.1",
+    lifespan=lifespan,
 )
 
 app.include_router(search_router)
+app.include_router(autocomplete_router)
 
 @app.get("/", include_in_schema=False)
 async def redirect_to_docs():
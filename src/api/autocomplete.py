@@ -0,0 +1,110 @@
+# src/api/autocomplete.py
+"""
+Autocompletado de localidades y provincias con un trie de prefijos sin
+tildes ni mayúsculas. Cada nombre se indexa por su inicio y por el inicio
+de cada palabra ("compo" sugiere "Santiago de Compostela"). Cada nodo guarda
+ya ordenadas (por número de estaciones) sus mejores MAX_SUGGESTIONS
+sugerencias, así que una consulta solo recorre los caracteres del prefijo,
+sin depender del tamaño del catálogo. Los tries se reconstruyen con cada
+generación de datos.
+"""
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.common.search_keys import normalize_search_text
+from src.database.models import EstacionBusqueda
+
+MAX_SUGGESTIONS = 50
+
+
+class _Node:
+    __slots__ = ("children", "top")
+
+    def __init__(self):
+        self.children: dict[str, "_Node"] = {}
+        self.top: list[dict] = []
+
+
+class PrefixTrie:
+    """Trie de prefijos con las mejores sugerencias precalculadas en cada nodo."""
+
+    def __init__(self, entries: list[dict]):
+        """entries: sugerencias con "nombre", ya ordenadas de mejor a peor."""
+        self._root = _Node()
+        for entry in entries:
+            folded = normalize_search_text(entry["nombre"])
+            for start in _word_starts(folded):
+                self._insert(folded[start:], entry)
+
+    def _insert(self, key: str, entry: dict) -> None:
+        node = self._root
+        self._offer(node, entry)
+        for char in key:
+            node = node.children.setdefault(char, _Node())
+            self._offer(node, entry)
+
+    @staticmethod
+    def _offer(node: _Node, entry: dict) -> None:
+        # Las entradas llegan ordenadas: basta con no pasar del máximo ni repetir
+        if len(node.top) < MAX_SUGGESTIONS and (not node.top or node.top[-1] is not entry):
+            node.top.append(entry)
+
+    def complete(self, prefix: str, limit: int) -> list[dict]:
+        node = self._root
+        for char in normalize_search_text(prefix.strip()):
+            node = node.children.get(char)
+            if node is None:
+                return []
+        return node.top[:limit]
+
+
+def _word_starts(text: str) -> list[int]:
+    return [i for i, char in enumerate(text) if char.isalnum() and (i == 0 or not text[i - 1].isalnum())]
+
+
+def _ranked(rows) -> list[dict]:
+    # Más estaciones primero; a igualdad, orden alfabético sin tildes
+    return sorted(
+        (dict(row._mapping) for row in rows),
+        key=lambda entry: (-entry["estaciones"], normalize_search_text(entry["nombre"])),
+    )
+
+
+class NameCompletions:
+    """Tries de localidades y provincias para la generación actual."""
+
+    def __init__(self):
+        self.generation: int | None = None
+        self.localidades = PrefixTrie([])
+        self.provincias = PrefixTrie([])
+
+    async def refresh(self, db: AsyncSession, generation: int) -> None:
+        if self.generation == generation:
+            return
+        localidades = await db.execute(
+            select(
+                EstacionBusqueda.localidad_nombre.label("nombre"),
+                EstacionBusqueda.provincia_nombre.label("provincia"),
+                func.count().label("estaciones"),
+            )
+            .where(EstacionBusqueda.localidad_nombre.is_not(None))
+            .group_by(
+                EstacionBusqueda.codigo_localidad,
+                EstacionBusqueda.localidad_nombre,
+                EstacionBusqueda.provincia_nombre,
+            )
+        )
+        provincias = await db.execute(
+            select(
+                EstacionBusqueda.provincia_nombre.label("nombre"),
+                func.count().label("estaciones"),
+            )
+            .where(EstacionBusqueda.provincia_nombre.is_not(None))
+            .group_by(EstacionBusqueda.codigo_provincia, EstacionBusqueda.provincia_nombre)
+        )
+        self.localidades = PrefixTrie(_ranked(localidades))
+        self.provincias = PrefixTrie(_ranked(provincias))
+        self.generation = generation
+
+
+name_completions = NameCompletions()
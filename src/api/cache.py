@@ -0,0 +1,116 @@
+# src/api/cache.py
+"""
+Caché de respuestas de la API de búsqueda versionada por generación de datos.
+La API de carga incrementa la generación (tabla generacion_datos) tras cada
+escritura; al detectar una generación nueva se vacía la caché, de modo que
+nunca se sirve una respuesta calculada con datos anteriores a una recarga.
+"""
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Hashable
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.models import GeneracionDatos
+from src.database.settings import CACHE_MAX_ENTRIES, GENERATION_POLL_SECONDS
+
+
+class ResponseCache:
+    """Caché LRU de cuerpos de respuesta ya serializados."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.generation: int | None = None
+        self._entries: OrderedDict[Hashable, bytes] = OrderedDict()
+
+    def get(self, key: Hashable, generation: int) -> bytes | None:
+        if generation != self.generation:
+            return None
+        body = self._entries.get(key)
+        if body is not None:
+            self._entries.move_to_end(key)
+        return body
+
+    def set(self, key: Hashable, generation: int, body: bytes) -> None:
+        # Una respuesta calculada con otra generación no se guarda
+        if generation != self.generation:
+            return
+        self._entries[key] = body
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def reset(self, generation: int) -> None:
+        self.generation = generation
+        self._entries.clear()
+
+
+class DataGeneration:
+    """
+    Generación de datos vista por este proceso. Se consulta en la BD como
+    mucho cada poll_seconds y avisa a los suscriptores cuando cambia.
+    """
+
+    def __init__(self, poll_seconds: float):
+        self.poll_seconds = poll_seconds
+        self.value: int | None = None
+        self._checked_at = 0.0
+        self._listeners: list[Callable[[int], Awaitable[None] | None]] = []
+        self._tasks: set[asyncio.Task] = set()
+
+    def subscribe(self, listener: Callable[[int], Awaitable[None] | None]) -> None:
+        """Registra una función a la que se llama con la nueva generación."""
+        self._listeners.append(listener)
+
+    async def current(self, db: AsyncSession) -> int:
+        now = time.monotonic()
+        if self.value is not None and now - self._checked_at < self.poll_seconds:
+            return self.value
+
+        result = await db.execute(select(GeneracionDatos.generacion).where(GeneracionDatos.id == 1))
+        generation = result.scalar_one_or_none() or 0
+        self._checked_at = now
+        if generation != self.value:
+            self.value = generation
+            self._notify(generation)
+        return generation
+
+    def _notify(self, generation: int) -> None:
+        for listener in self._listeners:
+            outcome = listener(generation)
+            if asyncio.iscoroutine(outcome):
+                # Tareas en segundo plano (p. ej. precalentar la caché) sin bloquear la petición
+                task = asyncio.create_task(outcome)
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+
+def make_etag(generation: int, key: Hashable) -> str:
+    """ETag fuerte derivado de la generación de datos y de los parámetros normalizados."""
+    digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()[:16]
+    return f'"{generation}-{digest}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Comprueba la cabecera If-None-Match (lista de ETags, débiles o no). Solo
+    cuenta una ETag concreta: '*' se ignora, porque las rutas comprueban la
+    cabecera antes de saber si el recurso existe y un 304 ocultaría el 404.
+    """
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+data_generation = DataGeneration(GENERATION_POLL_SECONDS)
+response_cache = ResponseCache(CACHE_MAX_ENTRIES)
+data_generation.subscribe(response_cache.reset)
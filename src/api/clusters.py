@@ -0,0 +1,109 @@
+# src/api/clusters.py
+"""
+Agrupación de estaciones para el mapa. Por cada nivel de zoom (hasta
+MAX_CLUSTER_ZOOM) se reparten las estaciones en una rejilla de celdas de
+CLUSTER_CELL_PX píxeles en proyección Web Mercator (la de los mosaicos de
+OpenStreetMap) y cada celda se resume en su centroide, número de estaciones
+y tipo predominante. La pirámide completa se precalcula una vez por
+generación de datos; a partir de MAX_CLUSTER_ZOOM se devuelven las
+estaciones individuales.
+"""
+import math
+from collections import Counter
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.models import EstacionBusqueda
+
+TILE_SIZE_PX = 256
+CLUSTER_CELL_PX = 64
+MAX_CLUSTER_ZOOM = 12
+MAX_ZOOM = 22
+
+# Límite de latitud de la proyección Web Mercator
+MAX_MERCATOR_LAT = 85.05112878
+
+
+def mercator(lat: float, lon: float) -> tuple[float, float]:
+    """Posición normalizada (0..1, 0..1) en el mapa Web Mercator del zoom 0."""
+    lat = max(-MAX_MERCATOR_LAT, min(MAX_MERCATOR_LAT, lat))
+    phi = math.radians(lat)
+    x = (lon + 180.0) / 360.0
+    y = (1.0 - math.log(math.tan(phi) + 1.0 / math.cos(phi)) / math.pi) / 2.0
+    return x, y
+
+
+def _in_bbox(lat: float, lon: float, bbox: tuple[float, float, float, float] | None) -> bool:
+    if bbox is None:
+        return True
+    min_lat, min_lon, max_lat, max_lon = bbox
+    return min_lat <= lat <= max_lat and min_lon <= lon <= max_lon
+
+
+class ClusterPyramid:
+    """Clusters precalculados por nivel de zoom para la generación actual."""
+
+    def __init__(self):
+        self.generation: int | None = None
+        self._levels: list[list[dict]] = []
+        self._stations: list[dict] = []
+        self._projected: list[tuple[float, float]] = []
+
+    async def refresh(self, db: AsyncSession, generation: int) -> None:
+        if self.generation == generation:
+            return
+        result = await db.execute(
+            select(
+                EstacionBusqueda.cod_estacion,
+                EstacionBusqueda.nombre,
+                EstacionBusqueda.latitud,
+                EstacionBusqueda.longitud,
+                EstacionBusqueda.tipo,
+            )
+            .where(EstacionBusqueda.latitud.is_not(None), EstacionBusqueda.longitud.is_not(None))
+            .order_by(EstacionBusqueda.cod_estacion)
+        )
+        self._stations = [dict(row._mapping) for row in result]
+        self._projected = [mercator(station["latitud"], station["longitud"]) for station in self._stations]
+        self._levels = [self._build_level(zoom) for zoom in range(MAX_CLUSTER_ZOOM + 1)]
+        self.generation = generation
+
+    def _build_level(self, zoom: int) -> list[dict]:
+        cells_per_side = (TILE_SIZE_PX << zoom) / CLUSTER_CELL_PX
+        cells: dict[tuple[int, int], list[dict]] = {}
+        for station, (x, y) in zip(self._stations, self._projected):
+            cell = (int(x * cells_per_side), int(y * cells_per_side))
+            cells.setdefault(cell, []).append(station)
+
+        clusters = []
+        for members in cells.values():
+            total = len(members)
+            tipos = Counter(member["tipo"] for member in members)
+            clusters.append({
+                "latitud": sum(member["latitud"] for member in members) / total,
+                "longitud": sum(member["longitud"] for member in members) / total,
+                "total": total,
+                "tipo_dominante": tipos.most_common(1)[0][0],
+                # Un cluster de una sola estación se puede dibujar como la estación
+                "cod_estacion": members[0]["cod_estacion"] if total == 1 else None,
+            })
+        return clusters
+
+    def query(self, zoom: int, bbox: tuple[float, float, float, float] | None) -> dict:
+        """Clusters (o estaciones, con zoom alto) cuyo punto cae dentro de bbox."""
+        if zoom > MAX_CLUSTER_ZOOM:
+            estaciones = [
+                station for station in self._stations
+                if _in_bbox(station["latitud"], station["longitud"], bbox)
+            ]
+            return {"zoom": zoom, "clusters": [], "estaciones": estaciones}
+
+        clusters = [
+            cluster for cluster in self._levels[zoom]
+            if _in_bbox(cluster["latitud"], cluster["longitud"], bbox)
+        ]
+        return {"zoom": zoom, "clusters": clusters, "estaciones": []}
+
+
+cluster_pyramid = ClusterPyramid()
@@ -0,0 +1,142 @@
+# src/api/full_text.py
+"""
+Búsqueda de texto libre (parámetro q=) sobre nombre, dirección, localidad
+y horario de las estaciones. Se mantiene en memoria un índice invertido con
+ranking BM25, coincidencia por prefijo y sin distinguir mayúsculas ni tildes.
+Tras cada carga (nueva generación de datos) solo se vuelven a indexar las
+estaciones cuyo hash_contenido ha cambiado.
+"""
+import math
+import re
+from bisect import bisect_left
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.common.search_keys import normalize_search_text
+from src.database.models import EstacionBusqueda
+
+# Parámetros habituales de BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Número máximo de términos del vocabulario que puede cubrir un prefijo
+MAX_PREFIX_EXPANSIONS = 32
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str | None) -> list[str]:
+    return _TOKEN_RE.findall(normalize_search_text(text)) if text else []
+
+
+class StationTextIndex:
+    """Índice invertido término -> {cod_estacion: frecuencia} con ranking BM25."""
+
+    def __init__(self):
+        self.generation: int | None = None
+        self._hashes: dict[int, str | None] = {}
+        self._lengths: dict[int, int] = {}
+        self._total_length = 0
+        self._postings: dict[str, dict[int, int]] = {}
+        self._doc_terms: dict[int, dict[str, int]] = {}
+        # Vocabulario ordenado para resolver prefijos con búsqueda binaria
+        self._vocabulary: list[str] = []
+
+    async def refresh(self, db: AsyncSession, generation: int) -> None:
+        """Sincroniza el índice con la BD reindexando solo las estaciones modificadas."""
+        if self.generation == generation:
+            return
+
+        hashes = dict((await db.execute(select(EstacionBusqueda.cod_estacion, EstacionBusqueda.hash_contenido))).all())
+        removed = [cod for cod in self._hashes if cod not in hashes]
+        # Sin hash no se puede saber si ha cambiado: se reindexa siempre
+        changed = [cod for cod, digest in hashes.items()
+                   if digest is None or self._hashes.get(cod, "") != digest]
+
+        rows = []
+        if changed:
+            result = await db.execute(
+                select(
+                    EstacionBusqueda.cod_estacion,
+                    EstacionBusqueda.nombre,
+                    EstacionBusqueda.direccion,
+                    EstacionBusqueda.horario,
+                    EstacionBusqueda.localidad_nombre,
+                )
+                .where(EstacionBusqueda.cod_estacion.in_(changed))
+            )
+            rows = result.all()
+
+        for cod in removed:
+            self._remove(cod)
+        for cod, *texts in rows:
+            self._remove(cod)
+            self._add(cod, hashes[cod], texts)
+
+        if removed or rows:
+            self._vocabulary = sorted(self._postings)
+        self.generation = generation
+
+    def _add(self, cod: int, digest: str | None, texts) -> None:
+        terms: dict[str, int] = {}
+        for text in texts:
+            for token in tokenize(text):
+                terms[token] = terms.get(token, 0) + 1
+        for term, frequency in terms.items():
+            self._postings.setdefault(term, {})[cod] = frequency
+        length = sum(terms.values())
+        self._hashes[cod] = digest
+        self._doc_terms[cod] = terms
+        self._lengths[cod] = length
+        self._total_length += length
+
+    def _remove(self, cod: int) -> None:
+        terms = self._doc_terms.pop(cod, None)
+        if terms is None:
+            return
+        for term in terms:
+            posting = self._postings[term]
+            del posting[cod]
+            if not posting:
+                del self._postings[term]
+        self._total_length -= self._lengths.pop(cod)
+        del self._hashes[cod]
+
+    def _expand(self, token: str) -> list[str]:
+        """Términos del vocabulario que empiezan por token (incluido el propio token)."""
+        start = bisect_left(self._vocabulary, token)
+        expanded = []
+        for term in self._vocabulary[start:start + MAX_PREFIX_EXPANSIONS]:
+            if not term.startswith(token):
+                break
+            expanded.append(term)
+        return expanded
+
+    def search(self, query: str) -> list[int]:
+        """Códigos de las estaciones que coinciden con query, de mayor a menor puntuación."""
+        documents = len(self._lengths)
+        if not documents:
+            return []
+        average_length = self._total_length / documents
+
+        scores: dict[int, float] = {}
+        for token in set(tokenize(query)):
+            # Por cada término de la consulta cuenta la mejor de sus expansiones
+            best: dict[int, float] = {}
+            for term in self._expand(token):
+                posting = self._postings[term]
+                idf = math.log(1 + (documents - len(posting) + 0.5) / (len(posting) + 0.5))
+                for cod, frequency in posting.items():
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[cod] / average_length)
+                    score = idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+                    if score > best.get(cod, 0.0):
+                        best[cod] = score
+            for cod, score in best.items():
+                scores[cod] = scores.get(cod, 0.0) + score
+
+        # A igual puntuación, orden estable por código
+        return sorted(scores, key=lambda cod: (-scores[cod], cod))
+
+
+station_text_index = StationTextIndex()
@@ -0,0 +1,264 @@
+# src/api/geo.py
+"""
+Índice espacial en memoria de las estaciones con coordenadas.
+Se construye un KD-tree sobre la posición de cada estación en la esfera
+unitaria (x, y, z): la distancia euclídea entre esos puntos (cuerda) crece
+con la distancia sobre la superficie, así que los vecinos más cercanos del
+árbol son exactos. Las distancias devueltas se recalculan con haversine.
+Para los filtros por rectángulo (bbox) hay un segundo árbol sobre (lat, lon).
+Las consultas por lotes usan además una tabla de coordenadas en arrays de
+NumPy y calculan haversine de forma vectorizada.
+El índice se reconstruye cuando cambia la generación de datos.
+"""
+import heapq
+import math
+
+import numpy as np
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.models import EstacionBusqueda
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Tamaño máximo (puntos x estaciones) de cada bloque de la matriz de productos escalares
+BATCH_CELLS = 2_000_000
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Distancia sobre la superficie terrestre entre dos puntos, en km."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def to_unit_vector(lat: float, lon: float) -> tuple[float, float, float]:
+    phi, lam = math.radians(lat), math.radians(lon)
+    return (math.cos(phi) * math.cos(lam), math.cos(phi) * math.sin(lam), math.sin(phi))
+
+
+def km_to_chord(distance_km: float) -> float:
+    """Longitud de la cuerda de la esfera unitaria equivalente a una distancia en km."""
+    angle = min(distance_km / EARTH_RADIUS_KM, math.pi)
+    return 2 * math.sin(angle / 2)
+
+
+def parse_bbox(bbox: str | None) -> tuple[float, float, float, float] | None:
+    """
+    Interpreta bbox=min_lon,min_lat,max_lon,max_lat (orden de GeoJSON).
+    Devuelve (min_lat, min_lon, max_lat, max_lon).
+    """
+    if not bbox:
+        return None
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(value) for value in bbox.split(","))
+    except ValueError:
+        raise HTTPException(
+            status_code=400,
+            detail="bbox debe tener el formato min_lon,min_lat,max_lon,max_lat",
+        )
+    if not (-90 <= min_lat <= max_lat <= 90 and -180 <= min_lon <= max_lon <= 180):
+        raise HTTPException(status_code=400, detail="bbox fuera de rango o con los límites invertidos")
+    return (min_lat, min_lon, max_lat, max_lon)
+
+
+def _unit_vectors(lat_rad: np.ndarray, lon_rad: np.ndarray) -> np.ndarray:
+    cos_lat = np.cos(lat_rad)
+    return np.column_stack((cos_lat * np.cos(lon_rad), cos_lat * np.sin(lon_rad), np.sin(lat_rad)))
+
+
+class KDTree:
+    """KD-tree estático sobre puntos de dimensión fija con un valor asociado a cada punto."""
+
+    def __init__(self, points: list[tuple[tuple[float, ...], int]], dimensions: int):
+        self.dimensions = dimensions
+        self._root = self._build(points, 0)
+
+    def _build(self, points, depth):
+        if not points:
+            return None
+        axis = depth % self.dimensions
+        points.sort(key=lambda item: item[0][axis])
+        middle = len(points) // 2
+        return (
+            points[middle],
+            axis,
+            self._build(points[:middle], depth + 1),
+            self._build(points[middle + 1:], depth + 1),
+        )
+
+    def nearest(self, target: tuple[float, ...], k: int, max_distance: float = math.inf) -> list[tuple[float, int]]:
+        """Los k puntos más cercanos a target dentro de max_distance: [(distancia, valor)]."""
+        # Montículo de máximos (distancias negadas) con los k mejores encontrados
+        best: list[tuple[float, int]] = []
+
+        def visit(node):
+            if node is None:
+                return
+            (point, value), axis, left, right = node
+            distance = math.dist(point, target)
+            if distance <= max_distance:
+                if len(best) < k:
+                    heapq.heappush(best, (-distance, value))
+                elif distance < -best[0][0]:
+                    heapq.heapreplace(best, (-distance, value))
+
+            delta = target[axis] - point[axis]
+            near, far = (left, right) if delta < 0 else (right, left)
+            visit(near)
+            # La otra rama solo puede mejorar si el plano de corte está más cerca que el peor actual
+            bound = -best[0][0] if len(best) == k else max_distance
+            if abs(delta) <= bound:
+                visit(far)
+
+        visit(self._root)
+        return sorted((-distance, value) for distance, value in best)
+
+    def within(self, lows: tuple[float, ...], highs: tuple[float, ...]) -> list[int]:
+        """Valores de los puntos dentro del rectángulo [lows, highs] (bordes incluidos)."""
+        found = []
+
+        def visit(node):
+            if node is None:
+                return
+            (point, value), axis, left, right = node
+            if all(low <= coord <= high for coord, low, high in zip(point, lows, highs)):
+                found.append(value)
+            if lows[axis] <= point[axis]:
+                visit(left)
+            if point[axis] <= highs[axis]:
+                visit(right)
+
+        visit(self._root)
+        return found
+
+
+class StationGeoIndex:
+    """Árboles de las estaciones con coordenadas para la generación actual."""
+
+    def __init__(self):
+        self.generation: int | None = None
+        self._positions: dict[int, tuple[float, float]] = {}
+        self._sphere = KDTree([], 3)
+        self._plane = KDTree([], 2)
+        # Tabla de coordenadas (en radianes) para las consultas vectorizadas
+        self._codes = np.empty(0, dtype=np.int64)
+        self._lat_rad = np.empty(0)
+        self._lon_rad = np.empty(0)
+        self._tipos = np.empty(0, dtype=object)
+        self._origenes = np.empty(0, dtype=object)
+
+    async def refresh(self, db: AsyncSession, generation: int) -> None:
+        if self.generation == generation:
+            return
+        result = await db.execute(
+            select(
+                EstacionBusqueda.cod_estacion,
+                EstacionBusqueda.latitud,
+                EstacionBusqueda.longitud,
+                EstacionBusqueda.tipo,
+                EstacionBusqueda.origen_datos,
+            ).where(
+                EstacionBusqueda.latitud.is_not(None),
+                EstacionBusqueda.longitud.is_not(None),
+            ).order_by(EstacionBusqueda.cod_estacion)
+        )
+        rows = result.all()
+        self._positions = {cod: (lat, lon) for cod, lat, lon, _, _ in rows}
+        self._codes = np.array([row[0] for row in rows], dtype=np.int64)
+        self._lat_rad = np.radians(np.array([row[1] for row in rows], dtype=float))
+        self._lon_rad = np.radians(np.array([row[2] for row in rows], dtype=float))
+        self._tipos = np.array([row[3] for row in rows], dtype=object)
+        self._origenes = np.array([row[4] for row in rows], dtype=object)
+        self._sphere = KDTree(
+            [(to_unit_vector(lat, lon), cod) for cod, (lat, lon) in self._positions.items()], 3
+        )
+        self._plane = KDTree([((lat, lon), cod) for cod, (lat, lon) in self._positions.items()], 2)
+        self.generation = generation
+
+    def nearest(self, lat: float, lon: float, k: int, radio_km: float | None = None) -> list[tuple[int, float]]:
+        """Las k estaciones más cercanas (y dentro de radio_km): [(cod_estacion, distancia_km)]."""
+        max_chord = km_to_chord(radio_km) if radio_km is not None else math.inf
+        candidates = self._sphere.nearest(to_unit_vector(lat, lon), k, max_chord)
+        # Distancia exacta con haversine para la respuesta y el orden final
+        ranked = [
+            (cod, haversine_km(lat, lon, *self._positions[cod]))
+            for _, cod in candidates
+        ]
+        if radio_km is not None:
+            ranked = [(cod, distance) for cod, distance in ranked if distance <= radio_km]
+        ranked.sort(key=lambda item: (item[1], item[0]))
+        return ranked
+
+    def nearest_batch(
+        self,
+        lats: np.ndarray,
+        lons: np.ndarray,
+        k: int,
+        radio_km: float | None = None,
+        tipo: str | None = None,
+        origen_datos: str | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Las k estaciones más cercanas a cada punto, calculadas con haversine vectorizado.
+        Devuelve dos matrices (puntos x k): códigos y distancias en km. Los huecos
+        (menos de k estaciones o fuera de radio_km) tienen código -1 y distancia NaN.
+        """
+        mask = np.ones(len(self._codes), dtype=bool)
+        if tipo:
+            mask &= self._tipos == tipo
+        if origen_datos:
+            mask &= self._origenes == origen_datos
+        codes, lat_rad, lon_rad = self._codes[mask], self._lat_rad[mask], self._lon_rad[mask]
+
+        points = len(lats)
+        out_codes = np.full((points, k), -1, dtype=np.int64)
+        out_dist = np.full((points, k), np.nan)
+        if not len(codes) or not points:
+            return out_codes, out_dist
+
+        take = min(k, len(codes))
+        point_lat = np.radians(np.asarray(lats, dtype=float))
+        point_lon = np.radians(np.asarray(lons, dtype=float))
+        # Cuanto mayor el producto escalar de los vectores unitarios, menor la distancia:
+        # la selección se hace con un producto de matrices y haversine solo para los k elegidos
+        stations = _unit_vectors(lat_rad, lon_rad)
+        targets = _unit_vectors(point_lat, point_lon)
+        # Bloques de puntos para acotar la memoria de la matriz de productos
+        step = max(1, BATCH_CELLS // len(codes))
+        for start in range(0, points, step):
+            end = min(start + step, points)
+            similarity = targets[start:end] @ stations.T
+            if take < len(codes):
+                nearest = np.argpartition(-similarity, take - 1, axis=1)[:, :take]
+            else:
+                nearest = np.broadcast_to(np.arange(len(codes)), (end - start, take))
+
+            plat, plon = point_lat[start:end, None], point_lon[start:end, None]
+            slat, slon = lat_rad[nearest], lon_rad[nearest]
+            a = (np.sin((slat - plat) / 2) ** 2
+                 + np.cos(plat) * np.cos(slat) * np.sin((slon - plon) / 2) ** 2)
+            nearest_dist = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+            order = np.argsort(nearest_dist, axis=1, kind="stable")
+            nearest = np.take_along_axis(nearest, order, axis=1)
+            nearest_dist = np.take_along_axis(nearest_dist, order, axis=1)
+
+            block_codes = codes[nearest]
+            if radio_km is not None:
+                outside = nearest_dist > radio_km
+                block_codes = np.where(outside, -1, block_codes)
+                nearest_dist = np.where(outside, np.nan, nearest_dist)
+            out_codes[start:end, :take] = block_codes
+            out_dist[start:end, :take] = nearest_dist
+        return out_codes, out_dist
+
+    def in_bbox(self, bbox: tuple[float, float, float, float]) -> list[int]:
+        min_lat, min_lon, max_lat, max_lon = bbox
+        return self._plane.within((min_lat, min_lon), (max_lat, max_lon))
+
+
+station_geo_index = StationGeoIndex()
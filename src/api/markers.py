@@ -0,0 +1,55 @@
+# src/api/markers.py
+"""
+Carga compacta de marcadores para el mapa: solo código, coordenadas y tipo
+de cada estación, como arrays paralelos en JSON o empaquetados en binario.
+
+Formato binario (little-endian):
+    uint32           n: número de estaciones
+    uint32[n]        ids (cod_estacion)
+    float32[n]       latitudes
+    float32[n]       longitudes
+    uint8[n]         códigos de tipo (codigo_tipo, índice en MARKER_TIPOS)
+"""
+import numpy as np
+from sqlalchemy import Select, select
+
+from src.database.models import EstacionBusqueda, TIPO_CODIGOS
+
+# Nombre de cada tipo en la posición de su código (el codigo_tipo indexado de la tabla de lectura)
+MARKER_TIPOS = tuple(sorted(TIPO_CODIGOS, key=TIPO_CODIGOS.get))
+
+
+def select_markers() -> Select:
+    """Estaciones con coordenadas, ordenadas por código."""
+    return (
+        select(
+            EstacionBusqueda.cod_estacion,
+            EstacionBusqueda.latitud,
+            EstacionBusqueda.longitud,
+            EstacionBusqueda.codigo_tipo,
+        )
+        .where(EstacionBusqueda.latitud.is_not(None), EstacionBusqueda.longitud.is_not(None))
+        .order_by(EstacionBusqueda.cod_estacion)
+    )
+
+
+def markers_json(rows) -> dict:
+    return {
+        "total": len(rows),
+        "tipos": list(MARKER_TIPOS),
+        "ids": [row[0] for row in rows],
+        "lat": [row[1] for row in rows],
+        "lon": [row[2] for row in rows],
+        "tipo": [row[3] for row in rows],
+    }
+
+
+def markers_binary(rows) -> bytes:
+    count = len(rows)
+    return b"".join((
+        np.array([count], dtype="<u4").tobytes(),
+        np.fromiter((row[0] for row in rows), dtype="<u4", count=count).tobytes(),
+        np.fromiter((row[1] for row in rows), dtype="<f4", count=count).tobytes(),
+        np.fromiter((row[2] for row in rows), dtype="<f4", count=count).tobytes(),
+        np.fromiter((row[3] for row in rows), dtype="u1", count=count).tobytes(),
+    ))
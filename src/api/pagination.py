@@ -0,0 +1,68 @@
+# src/api/pagination.py
+"""
+Paginación por cursor (keyset) sobre cod_estacion para los listados de
+estaciones, y conteo opcional del total (exacto, estimado o ninguno).
+El cursor es opaco para el cliente: codifica el último cod_estacion devuelto.
+"""
+import base64
+import json
+
+from fastapi import HTTPException
+from sqlalchemy import Select, func, select
+
+from src.database.models import EstacionBusqueda
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 1000
+
+
+def encode_cursor(cod_estacion: int) -> str:
+    return base64.urlsafe_b64encode(str(cod_estacion).encode("ascii")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str | None) -> int | None:
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return int(base64.urlsafe_b64decode(padded.encode("ascii")).decode("ascii"))
+    except (ValueError, UnicodeError):
+        raise HTTPException(status_code=400, detail="El cursor de paginación no es válido")
+
+
+def paginate(query: Select, after: int | None, limit: int) -> Select:
+    """Página que empieza tras el cursor; pide una fila de más para saber si hay otra página."""
+    if after is not None:
+        query = query.where(EstacionBusqueda.cod_estacion > after)
+    return query.order_by(EstacionBusqueda.cod_estacion).limit(limit + 1)
+
+
+def split_page(rows: list[dict], limit: int) -> tuple[list[dict], str | None]:
+    """Separa la fila extra de paginate() y calcula el cursor de la página siguiente."""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1]["cod_estacion"])
+
+
+def count_statement(query: Select) -> Select:
+    """COUNT(*) exacto con los mismos filtros que la consulta (sin cursor ni límite)."""
+    return select(func.count()).select_from(query.order_by(None).subquery())
+
+
+def estimate_statement(query: Select, dialect) -> str | None:
+    """
+    EXPLAIN del planificador de Postgres para estimar el total sin recorrer las filas.
+    Se ejecuta con exec_driver_sql. Devuelve None en otros backends (se usa el conteo exacto).
+    """
+    if dialect.name != "postgresql":
+        return None
+    sql = query.compile(dialect=dialect, compile_kwargs={"literal_binds": True})
+    return f"EXPLAIN (FORMAT JSON) {sql}"
+
+
+def parse_estimate(plan) -> int:
+    # Según el driver el plan llega como texto JSON o ya decodificado
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
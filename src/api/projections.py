@@ -0,0 +1,92 @@
+# src/api/projections.py
+"""
+Consultas de solo lectura que proyectan directamente las columnas de la
+respuesta (EstacionSchema) desde la tabla de lectura desnormalizada
+estaciones_busqueda, sin joins. Las filas se convierten en diccionarios sin
+pasar por el ORM ni por Pydantic y se serializan con orjson (ORJSONResponse).
+El parámetro fields= permite pedir solo un subconjunto de columnas.
+"""
+from fastapi import HTTPException
+from sqlalchemy import ARRAY, Integer, Select, any_, bindparam, select
+from sqlalchemy.sql.elements import ColumnElement
+
+from src.database.models import EstacionBusqueda
+
+# Columnas de EstacionSchema en el mismo orden que el esquema
+STATION_COLUMNS = (
+    EstacionBusqueda.cod_estacion,
+    EstacionBusqueda.nombre,
+    EstacionBusqueda.tipo,
+    EstacionBusqueda.direccion,
+    EstacionBusqueda.codigo_postal,
+    EstacionBusqueda.latitud,
+    EstacionBusqueda.longitud,
+    EstacionBusqueda.descripcion,
+    EstacionBusqueda.horario,
+    EstacionBusqueda.contacto,
+    EstacionBusqueda.url,
+    EstacionBusqueda.codigo_localidad,
+    EstacionBusqueda.origen_datos,
+    EstacionBusqueda.localidad_nombre,
+    EstacionBusqueda.provincia_nombre,
+)
+
+# Columna de cada campo de la respuesta, por nombre
+STATION_FIELDS = {column.key: column for column in STATION_COLUMNS}
+
+# Campo que se incluye siempre: identifica la estación y es la clave del cursor
+KEY_FIELD = "cod_estacion"
+
+
+def parse_fields(fields: str | None) -> tuple[str, ...] | None:
+    """
+    Interpreta el parámetro fields= ("cod_estacion,latitud,longitud").
+    Devuelve None si se piden todos los campos. Los campos se ordenan como
+    en el esquema para que la misma selección dé siempre la misma clave de caché.
+    """
+    if not fields:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - STATION_FIELDS.keys()
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=(
+                f"Campos no válidos: {', '.join(sorted(unknown))}. "
+                f"Valores permitidos: {', '.join(STATION_FIELDS)}"
+            ),
+        )
+    requested.add(KEY_FIELD)
+    if len(requested) == len(STATION_FIELDS):
+        return None
+    return tuple(name for name in STATION_FIELDS if name in requested)
+
+
+def select_stations(fields: tuple[str, ...] | None = None) -> Select:
+    """SELECT de las columnas de la respuesta (o solo de fields) sobre la tabla de lectura."""
+    columns = STATION_COLUMNS if fields is None else [STATION_FIELDS[name] for name in fields]
+    return select(*columns).select_from(EstacionBusqueda)
+
+
+def codes_condition(codes: list[int], dialect) -> ColumnElement:
+    """
+    Condición sobre una lista de cod_estacion. En Postgres se envía como un
+    único array (cod_estacion = ANY(:codigos)), así la sentencia es la misma
+    para cualquier número de códigos; en otros backends se usa IN.
+    """
+    if dialect.name == "postgresql":
+        # unique: una misma sentencia puede combinar varias listas (bbox y texto libre)
+        codigos = bindparam("codigos", codes, type_=ARRAY(Integer), unique=True)
+        return EstacionBusqueda.cod_estacion == any_(codigos)
+    return EstacionBusqueda.cod_estacion.in_(codes)
+
+
+def where_codes(query: Select, codes: list[int], dialect) -> Select:
+    """Filtra por una lista de cod_estacion (ver codes_condition)."""
+    return query.where(codes_condition(codes, dialect))
+
+
+def rows_to_dicts(result) -> list[dict]:
+    """Convierte el resultado de select_stations() en diccionarios listos para serializar."""
+    keys = tuple(result.keys())
+    return [dict(zip(keys, row)) for row in result]
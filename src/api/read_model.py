@@ -0,0 +1,251 @@
+# src/api/read_model.py
+"""
+Modelo de lectura en memoria de la tabla estaciones_busqueda. El catálogo
+cabe de sobra en RAM: se carga entero al arrancar y con cada nueva
+generación de datos, y el listado, las facetas y el detalle de una estación
+se responden sin ir a la BD.
+
+Cada carga construye una instantánea inmutable (filas ya en la forma de
+EstacionSchema e índices hash por localidad, provincia, tipo y origen, más
+los códigos postales ordenados para prefijos y rangos) y la sustituye de una
+sola asignación, así que las peticiones en curso siguen usando la anterior.
+Mientras no hay instantánea de la generación actual (arranque, recarga en
+curso o error al cargar) las rutas consultan la BD como antes.
+"""
+import asyncio
+import logging
+from bisect import bisect_left, bisect_right
+from collections import Counter
+
+from sqlalchemy import select
+
+from src.api.cache import data_generation
+from src.api.full_text import station_text_index
+from src.api.geo import station_geo_index
+from src.api.pagination import encode_cursor, split_page
+from src.api.projections import KEY_FIELD, STATION_COLUMNS
+from src.api.schemas import ModoCombinacion
+from src.api.text_search import NgramIndex
+from src.database.async_session import AsyncSessionLocal
+from src.database.models import EstacionBusqueda
+
+logger = logging.getLogger(__name__)
+
+
+class _Snapshot:
+    """Catálogo de una generación con sus índices; no se modifica una vez creado."""
+
+    __slots__ = (
+        "generation",
+        "rows",
+        "codes",
+        "positions",
+        "localidades",
+        "provincias",
+        "by_localidad",
+        "by_provincia",
+        "by_tipo",
+        "by_origen",
+        "postal_codes",
+        "postal_positions",
+    )
+
+    def __init__(self, generation: int, records: list[dict]):
+        """records: filas ordenadas por cod_estacion con las columnas de la respuesta y los códigos."""
+        self.generation = generation
+        self.rows = [{column.key: record[column.key] for column in STATION_COLUMNS} for record in records]
+        self.codes = [row[KEY_FIELD] for row in self.rows]
+        self.positions = {cod: position for position, cod in enumerate(self.codes)}
+
+        # Índices hash valor -> posiciones (en orden de cod_estacion)
+        self.by_localidad = _group(records, "codigo_localidad")
+        self.by_provincia = _group(records, "codigo_provincia")
+        self.by_tipo = _group(records, "codigo_tipo")
+        self.by_origen = _group(records, "origen_datos")
+
+        # Búsqueda por subcadena de nombres, igual que NameSearch
+        self.localidades = NgramIndex()
+        self.localidades.build(_names(records, "codigo_localidad", "localidad_nombre"))
+        self.provincias = NgramIndex()
+        self.provincias.build(_names(records, "codigo_provincia", "provincia_nombre"))
+
+        # Códigos postales de ancho fijo ordenados: prefijos y rangos por búsqueda binaria
+        postal = sorted(
+            (record["codigo_postal"], position)
+            for position, record in enumerate(records)
+            if record["codigo_postal"]
+        )
+        self.postal_codes = [codigo for codigo, _ in postal]
+        self.postal_positions = [position for _, position in postal]
+
+    def _postal(self, rangos: tuple) -> set[int]:
+        matches = set()
+        for desde, hasta in rangos:
+            start = bisect_left(self.postal_codes, desde) if desde else 0
+            end = bisect_right(self.postal_codes, hasta) if hasta else len(self.postal_codes)
+            matches.update(self.postal_positions[start:end])
+        return matches
+
+    def _by_name(self, index: NgramIndex, by_code: dict, values: tuple) -> set[int]:
+        codes = set().union(*(index.search(value) for value in values))
+        return _lookup(by_code, codes)
+
+    def matches(self, filtros: tuple) -> list[int] | range:
+        """Posiciones (en orden de cod_estacion) que cumplen los filtros normalizados."""
+        localidades, cod_postal, provincias, tipos, origenes, bbox, combinar = filtros
+        sets = []
+        if localidades:
+            sets.append(self._by_name(self.localidades, self.by_localidad, localidades))
+        if cod_postal is not None:
+            sets.append(self._postal(cod_postal))
+        if provincias:
+            sets.append(self._by_name(self.provincias, self.by_provincia, provincias))
+        if tipos:
+            sets.append(_lookup(self.by_tipo, tipos))
+        if origenes:
+            sets.append(_lookup(self.by_origen, origenes))
+        if bbox:
+            sets.append(self._codes_to_positions(station_geo_index.in_bbox(bbox)))
+
+        if not sets:
+            return range(len(self.rows))
+        if combinar == ModoCombinacion.o.value:
+            return sorted(set().union(*sets))
+        # Se intersecan primero los conjuntos más pequeños
+        sets.sort(key=len)
+        return sorted(sets[0].intersection(*sets[1:]))
+
+    def _codes_to_positions(self, codes) -> set[int]:
+        return {self.positions[cod] for cod in codes if cod in self.positions}
+
+    def _project(self, position: int, campos: tuple | None) -> dict:
+        row = self.rows[position]
+        return row if campos is None else {campo: row[campo] for campo in campos}
+
+    def search(
+        self,
+        filtros: tuple,
+        limit: int,
+        after: int | None,
+        contar: bool,
+        campos: tuple | None = None,
+        texto: str | None = None,
+    ) -> dict:
+        """Página de resultados con la misma forma que el listado servido desde la BD."""
+        positions = self.matches(filtros)
+        if texto:
+            return self._search_ranked(positions, limit, after, contar, campos, texto)
+
+        # Cursor: primera posición con cod_estacion mayor que after
+        start = bisect_left(positions, bisect_right(self.codes, after)) if after is not None else 0
+        rows = [self._project(position, campos) for position in positions[start:start + limit + 1]]
+        resultados, siguiente_cursor = split_page(rows, limit)
+        return {
+            "total": len(positions) if contar else None,
+            "resultados": resultados,
+            "siguiente_cursor": siguiente_cursor,
+        }
+
+    def _search_ranked(self, positions, limit, offset, contar, campos, texto) -> dict:
+        # Orden por relevancia del índice de texto; el cursor es la posición en el ranking
+        allowed = positions if isinstance(positions, range) else set(positions)
+        ranked = [
+            self.positions[cod] for cod in station_text_index.search(texto)
+            if cod in self.positions and self.positions[cod] in allowed
+        ]
+        offset = offset or 0
+        end = offset + limit
+        return {
+            "total": len(ranked) if contar else None,
+            "resultados": [self._project(position, campos) for position in ranked[offset:end]],
+            "siguiente_cursor": encode_cursor(end) if end < len(ranked) else None,
+        }
+
+    def facets(self, filtros: tuple, texto: str | None, facets: dict[str, str]) -> dict:
+        """Recuentos por cada faceta (nombre -> campo) entre las estaciones filtradas."""
+        positions = self.matches(filtros)
+        if texto:
+            positions = self._codes_to_positions(station_text_index.search(texto)).intersection(positions)
+
+        resultado = {}
+        for faceta, campo in facets.items():
+            counts = Counter(self.rows[position][campo] for position in positions)
+            resultado[faceta] = sorted(
+                ({"valor": valor, "total": total} for valor, total in counts.items()),
+                key=lambda item: (-item["total"], item["valor"] or ""),
+            )
+        resultado["total"] = len(positions)
+        return resultado
+
+    def get(self, cod_estacion: int) -> dict | None:
+        position = self.positions.get(cod_estacion)
+        return None if position is None else self.rows[position]
+
+
+def _group(records: list[dict], key: str) -> dict:
+    index: dict = {}
+    for position, record in enumerate(records):
+        value = record[key]
+        if value is not None:
+            index.setdefault(value, []).append(position)
+    return index
+
+
+def _lookup(index: dict, keys) -> set[int]:
+    return {position for key in keys for position in index.get(key, ())}
+
+
+def _names(records: list[dict], code_key: str, name_key: str) -> set[tuple[int, str]]:
+    return {
+        (record[code_key], record[name_key])
+        for record in records
+        if record[code_key] is not None and record[name_key]
+    }
+
+
+class StationReadModel:
+    """Instantánea en memoria del catálogo para la generación de datos actual."""
+
+    def __init__(self):
+        self._snapshot: _Snapshot | None = None
+        self._lock = asyncio.Lock()
+
+    def current(self, generation: int) -> _Snapshot | None:
+        """Instantánea de generation, o None si hay que consultar la BD."""
+        snapshot = self._snapshot
+        return snapshot if snapshot is not None and snapshot.generation == generation else None
+
+    async def load(self, generation: int) -> None:
+        """Carga el catálogo de generation y sustituye la instantánea (suscrito a data_generation)."""
+        async with self._lock:
+            if self._snapshot is not None and self._snapshot.generation >= generation:
+                return
+            try:
+                async with AsyncSessionLocal() as db:
+                    result = await db.execute(
+                        select(*STATION_COLUMNS, EstacionBusqueda.codigo_tipo, EstacionBusqueda.codigo_provincia)
+                        .order_by(EstacionBusqueda.cod_estacion)
+                    )
+                    records = [dict(row) for row in result.mappings()]
+                    # Los índices que usa la instantánea quedan listos antes del cambio
+                    await station_geo_index.refresh(db, generation)
+                    await station_text_index.refresh(db, generation)
+            except Exception:
+                # Sin instantánea nueva las rutas siguen respondiendo desde la BD
+                logger.exception("No se pudo cargar el modelo de lectura de la generación %s", generation)
+                return
+            self._snapshot = _Snapshot(generation, records)
+
+    async def start(self) -> None:
+        """Carga inicial al arrancar la API, antes de atender peticiones."""
+        try:
+            async with AsyncSessionLocal() as db:
+                generation = await data_generation.current(db)
+        except Exception:
+            logger.exception("No se pudo leer la generación de datos al arrancar")
+            return
+        await self.load(generation)
+
+
+station_read_model = StationReadModel()
+data_generation.subscribe(station_read_model.load)
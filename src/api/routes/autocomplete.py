@@ -0,0 +1,46 @@
+# src/api/routes/autocomplete.py
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from src.database.async_session import get_async_db
+from src.api.schemas import AutocompletarLocalidadesResponse, AutocompletarProvinciasResponse
+from src.api.cache import data_generation
+from src.api.autocomplete import MAX_SUGGESTIONS, name_completions
+
+router = APIRouter(prefix="/autocompletar", tags=["Autocompletado"])
+
+
+@router.get(
+    "/localidades",
+    response_model=AutocompletarLocalidadesResponse,
+    summary="Sugerencias de localidades",
+    description="""
+    Localidades cuyo nombre, o alguna de sus palabras, empieza por **prefijo**
+    (sin distinguir mayúsculas ni tildes), ordenadas por número de estaciones.
+    """
+)
+async def complete_localidades(
+    prefijo: str = Query("", max_length=100, description="Texto escrito hasta ahora", example="vale"),
+    limit: int = Query(10, ge=1, le=MAX_SUGGESTIONS, description="Número máximo de sugerencias"),
+    db: AsyncSession = Depends(get_async_db)
+) -> dict:
+    await name_completions.refresh(db, await data_generation.current(db))
+    return {"resultados": name_completions.localidades.complete(prefijo, limit)}
+
+
+@router.get(
+    "/provincias",
+    response_model=AutocompletarProvinciasResponse,
+    summary="Sugerencias de provincias",
+    description="""
+    Provincias cuyo nombre, o alguna de sus palabras, empieza por **prefijo**
+    (sin distinguir mayúsculas ni tildes), ordenadas por número de estaciones.
+    """
+)
+async def complete_provincias(
+    prefijo: str = Query("", max_length=100, description="Texto escrito hasta ahora", example="bar"),
+    limit: int = Query(10, ge=1, le=MAX_SUGGESTIONS, description="Número máximo de sugerencias"),
+    db: AsyncSession = Depends(get_async_db)
+) -> dict:
+    await name_completions.refresh(db, await data_generation.current(db))
+    return {"resultados": name_completions.provincias.complete(prefijo, limit)}
@@ -1,14 +1,26 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
 from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 
 from src.database.session import get_db
-from src.database.models import Estacion, Localidad, Provincia
+from src.database.models import Estacion, EstacionBusqueda, Localidad, Provincia
+from src.api.projections import parse_fields, select_stations, rows_to_dicts
+from src.api.cache import make_etag, etag_matches
+from src.api.pagination import (
+	DEFAULT_LIMIT,
+	MAX_LIMIT,
+	decode_cursor,
+	paginate,
+	split_page,
+	count_statement,
+	estimate_statement,
+	parse_estimate,
+)
 from src.api.schemas import (
-	EstacionSchema,
 	SearchResponse,
 	LoadRequest,
 	LoadProcessResponse,
@@ -17,8 +29,28 @@ from src.api.schemas import (
 	RegistroRechazadoSchema,
 	RegistroIncidenciaSchema,
 	EstadoIncidencia,
+	ModoCarga,
+	ModoConteo,
+)
+from src.common.db_storage import (
+	save_stations,
+	delete_stations,
+	unique_station_codes,
+	delete_source_rows,
+	bump_data_generation,
+	read_data_generation,
+	refresh_search_table,
+	prepare_staging_tables,
+	swap_staging_tables,
+)
+from src.common.fingerprints import (
+	RECORD_KEY_FIELD,
+	group_records,
+	tag_records,
+	diff_fingerprints,
+	load_fingerprints,
+	save_fingerprints,
 )
-from src.common.db_storage import save_stations
 from src.common.errors import consume_error_logs, reset_error_logs
 from src.wrappers.wrapper_gal import csvtojson
 from src.wrappers.wrapper_cv import jsontojson
@@ -51,7 +83,10 @@ TRANSFORMERS = {
 	"",
 	response_model=SearchResponse,
 	summary="Listar estaciones por comunidad autónoma",
-	description="Devuelve todas las estaciones registradas en la base de datos para la comunidad seleccionada.",
+	description=(
+		"Devuelve las estaciones registradas en la base de datos para la comunidad seleccionada, "
+		"paginadas por cursor sobre cod_estacion."
+	),
 )
 async def get_stations_by_source(
 	fuente: str = Query(
@@ -59,8 +94,13 @@ async def get_stations_by_source(
 		description="Código de la comunidad autónoma (gal, cv o cat)",
 		example="gal",
 	),
+	limit: int = Query(DEFAULT_LIMIT, ge=1, le=MAX_LIMIT, description="Número máximo de estaciones por página"),
+	cursor: Optional[str] = Query(None, description="Cursor opaco devuelto en siguiente_cursor por la página anterior"),
+	count: ModoConteo = Query(ModoConteo.exact, description="Cálculo del total: exact, estimate o none"),
+	fields: Optional[str] = Query(None, description="Campos a devolver separados por comas (por defecto, todos)"),
+	if_none_match: Optional[str] = Header(None, include_in_schema=False),
 	db: Session = Depends(get_db),
-) -> SearchResponse:
+) -> Response:
 	fuente_normalizada = fuente.strip().lower()
 	if fuente_normalizada not in VALID_SOURCES:
 		raise HTTPException(
@@ -68,59 +108,74 @@ async def get_stations_by_source(
 			detail="La comunidad seleccionada no es válida. Valores permitidos: gal, cv, cat",
 		)
 
-	# Consulta todas las estaciones cuyo origen coincide con la comunidad seleccionada
-	estaciones = db.query(Estacion).filter(Estacion.origen_datos == fuente_normalizada).all()
-
-	if not estaciones:
+	# El ETag depende de la generación de datos: cambia con cada carga o borrado
+	after = decode_cursor(cursor)
+	campos = parse_fields(fields)
+	etag = make_etag(read_data_generation(db), ("load", fuente_normalizada, limit, after, count.value, campos))
+	if etag_matches(if_none_match, etag):
+		return Response(status_code=304, headers={"ETag": etag})
+
+	# Consulta proyectada de las estaciones cuyo origen coincide con la comunidad seleccionada
+	query = select_stations(campos).where(EstacionBusqueda.origen_datos == fuente_normalizada)
+
+	total = None
+	if count == ModoConteo.estimate:
+		estimate = estimate_statement(query, db.bind.dialect)
+		if estimate is not None:
+			total = parse_estimate(db.connection().exec_driver_sql(estimate).scalar_one())
+		else:
+			count = ModoConteo.exact
+	if count == ModoConteo.exact:
+		total = db.execute(count_statement(query)).scalar_one()
+
+	rows = rows_to_dicts(db.execute(paginate(query, after, limit)))
+	resultados, siguiente_cursor = split_page(rows, limit)
+
+	if not resultados and after is None:
 		raise HTTPException(
 			status_code=404,
 			detail="No hay estaciones almacenadas para la comunidad seleccionada",
 		)
 
-	resultados = []
-	for estacion in estaciones:
-		# ChoiceType puede exponer Enum o string según el backend, de ahí la comprobación
-		tipo_value = estacion.tipo.value if hasattr(estacion.tipo, "value") else str(estacion.tipo)
-
-		localidad_nombre = None
-		provincia_nombre = None
-
-		if estacion.localidad:
-			# Traemos el nombre de la localidad
-			localidad_nombre = estacion.localidad.nombre
-			if estacion.localidad.provincia:
-				# Igual para la provincia
-				provincia_nombre = estacion.localidad.provincia.nombre
-
-		resultados.append(
-			EstacionSchema(
-				cod_estacion=estacion.cod_estacion,
-				nombre=estacion.nombre,
-				tipo=tipo_value,
-				direccion=estacion.direccion,
-				codigo_postal=estacion.codigo_postal,
-				latitud=estacion.latitud,
-				longitud=estacion.longitud,
-				descripcion=estacion.descripcion,
-				horario=estacion.horario,
-				contacto=estacion.contacto,
-				url=estacion.url,
-				codigo_localidad=estacion.codigo_localidad,
-				origen_datos=estacion.origen_datos,
-				localidad_nombre=localidad_nombre,
-				provincia_nombre=provincia_nombre,
-			)
-		)
-
-	return SearchResponse(total=len(resultados), resultados=resultados)
+	return ORJSONResponse(
+		{"total": total, "resultados": resultados, "siguiente_cursor": siguiente_cursor},
+		headers={"ETag": etag},
+	)
 
 
 @router.delete(
 	"",
-	summary="Borrar todo el almacén de datos",
-	description="Elimina estaciones, localidades y provincias almacenadas en la base de datos.",
+	summary="Borrar el almacén de datos",
+	description=(
+		"Elimina estaciones, localidades y provincias almacenadas en la base de datos. "
+		"Si se indica una comunidad, solo se eliminan sus estaciones y las localidades "
+		"y provincias que queden huérfanas."
+	),
 )
-async def delete_storage(db: Session = Depends(get_db)) -> dict:
+async def delete_storage(
+	fuente: Optional[str] = Query(
+		None,
+		description="Código de la comunidad autónoma a eliminar (gal, cv o cat). Si se omite se borra todo",
+		example="cv",
+	),
+	db: Session = Depends(get_db),
+) -> dict:
+	if fuente is not None:
+		fuente_normalizada = fuente.strip().lower()
+		if fuente_normalizada not in VALID_SOURCES:
+			raise HTTPException(
+				status_code=400,
+				detail="La comunidad seleccionada no es válida. Valores permitidos: gal, cv, cat",
+			)
+		eliminados = delete_source_rows(db, fuente_normalizada)
+		db.commit()
+		refresh_search_table()
+		bump_data_generation()
+		return {
+			"message": f"Datos de la comunidad '{fuente_normalizada}' eliminados correctamente",
+			"eliminados": eliminados,
+		}
+
 	# Contadores previos para informar al usuario
 	estaciones_count = db.query(Estacion).count()
 	localidades_count = db.query(Localidad).count()
@@ -130,11 +185,15 @@ async def delete_storage(db: Session = Depends(get_db)) -> dict:
 		"TRUNCATE TABLE estaciones RESTART IDENTITY CASCADE",
 		"TRUNCATE TABLE localidades RESTART IDENTITY CASCADE",
 		"TRUNCATE TABLE provincias RESTART IDENTITY CASCADE",
+		# Sin huellas, la siguiente carga incremental vuelve a procesar todos los registros
+		"TRUNCATE TABLE huellas_registros",
 	)
 	for stmt in truncate_statements:
 		db.execute(text(stmt))
 	
 	db.commit()
+	refresh_search_table()
+	bump_data_generation()
 
 	return {
 		"message": "Almacén reiniciado correctamente",
@@ -177,48 +236,102 @@ async def run_load_pipelines(payload: LoadRequest) -> LoadProcessResponse:
 			detail=f"Las siguientes comunidades no son válidas: {', '.join(invalid)}",
 		)
 
-	result = await run_in_threadpool(_process_sources_pipeline, fuentes_normalizadas)
+	result = await run_in_threadpool(_process_sources_pipeline, fuentes_normalizadas, payload.modo)
 	return LoadProcessResponse(**result)
 
 
-def _process_sources_pipeline(fuentes: List[str]) -> dict:
+def _process_sources_pipeline(fuentes: List[str], modo: ModoCarga = ModoCarga.insertar) -> dict:
 	detalles: List[FuenteCargaDetalle] = []
 	total_insertados = 0
 	total_duplicados = 0
+	total_actualizados = 0
+	total_sin_cambios = 0
+	total_eliminados = 0
 	total_rechazados = 0
 	reparados_global: List[RegistroReparadoSchema] = []
 	rechazados_global: List[RegistroRechazadoSchema] = []
 	incidencias_global: List[RegistroIncidenciaSchema] = []
 
+	if modo == ModoCarga.recarga:
+		prepare_staging_tables()
+
 	for fuente in fuentes:
-		detalle = _process_single_source(fuente)
+		detalle = _process_single_source(fuente, modo)
 		detalles.append(detalle)
 		total_insertados += detalle.insertados
 		total_duplicados += detalle.duplicados
+		total_actualizados += detalle.actualizados
+		total_sin_cambios += detalle.sin_cambios
+		total_eliminados += detalle.eliminados
 		total_rechazados += detalle.rechazados_transformacion + len(detalle.errores_guardado)
 		reparados_global.extend(detalle.reparados)
 		rechazados_global.extend(detalle.rechazados)
 		incidencias_global.extend(detalle.incidencias)
 
+	recarga_aplicada = False
+	if modo == ModoCarga.recarga:
+		# Solo se publica la recarga si todas las fuentes han aportado estaciones
+		if all(detalle.insertados > 0 for detalle in detalles):
+			swap_staging_tables()
+			recarga_aplicada = True
+
+	# Las APIs de lectura invalidan sus cachés al ver una generación nueva
+	if modo == ModoCarga.recarga:
+		datos_modificados = recarga_aplicada
+	else:
+		datos_modificados = bool(total_insertados or total_actualizados or total_eliminados)
+	# La tabla de lectura de la API de búsqueda se sincroniza en cada ejecución
+	# (es incremental) para recuperar un refresco fallido o una tabla vacía,
+	# y siempre antes de publicar la generación
+	cambios_busqueda = refresh_search_table()
+	if datos_modificados or any(cambios_busqueda.values()):
+		bump_data_generation()
+
 	return {
 		"total_fuentes": len(detalles),
 		"total_insertados": total_insertados,
 		"total_duplicados": total_duplicados,
+		"total_actualizados": total_actualizados,
+		"total_sin_cambios": total_sin_cambios,
+		"total_eliminados": total_eliminados,
 		"total_rechazados": total_rechazados,
 		"detalles": detalles,
 		"reparados": reparados_global,
 		"rechazados": rechazados_global,
 		"incidencias": incidencias_global,
+		"recarga_aplicada": recarga_aplicada,
 	}
 
 
-def _process_single_source(fuente: str) -> FuenteCargaDetalle:
+def _process_single_source(fuente: str, modo: ModoCarga = ModoCarga.insertar) -> FuenteCargaDetalle:
 	try:
 		fetcher = RAW_FETCHERS[fuente]
 		transformer = TRANSFORMERS[fuente]
 		reset_error_logs()
 		raw_records = fetcher()
-		transformed_records = transformer(raw_records)
+
+		incremental = modo == ModoCarga.incremental
+		if incremental:
+			groups = group_records(raw_records, fuente)
+			previous = load_fingerprints(fuente)
+			changed_keys, deleted_keys = diff_fingerprints(groups, previous)
+			if not changed_keys and not deleted_keys:
+				# El origen no ha cambiado desde la última carga: no se transforma ni se guarda nada
+				return FuenteCargaDetalle(
+					fuente=fuente,
+					registros_origen=len(raw_records),
+					registros_transformados=0,
+					rechazados_transformacion=0,
+					insertados=0,
+					duplicados=0,
+					sin_cambios=len(groups),
+					omitida=True,
+				)
+			records_to_transform = tag_records(groups, changed_keys)
+		else:
+			records_to_transform = raw_records
+
+		transformed_records = transformer(records_to_transform)
 		log_data = consume_error_logs()
 		reparados = [RegistroReparadoSchema(**entry) for entry in log_data["reparados"]]
 		rechazos_transformacion = [RegistroRechazadoSchema(**entry) for entry in log_data["rechazados"]]
@@ -246,7 +359,26 @@ def _process_single_source(fuente: str) -> FuenteCargaDetalle:
 				for entry in rechazos_transformacion
 			]
 		)
-		stats = save_stations(transformed_records, fuente)
+		stats = save_stations(
+			transformed_records,
+			fuente,
+			upsert=modo in (ModoCarga.upsert, ModoCarga.incremental),
+			staging=modo == ModoCarga.recarga,
+			replace=modo == ModoCarga.reemplazar,
+		)
+		eliminados = stats.get("deleted", 0)
+		sin_cambios = stats.get("unchanged", 0)
+		if incremental:
+			eliminados = _apply_incremental_changes(
+				fuente,
+				groups,
+				previous,
+				changed_keys,
+				deleted_keys,
+				transformed_records,
+				stats.get("station_codes", {}),
+			)
+			sin_cambios += len(groups) - len(changed_keys)
 		errores_guardado_raw = stats.get("errors", [])
 		rechazos_guardado: List[RegistroRechazadoSchema] = []
 		errores_guardado: List[str] = []
@@ -291,6 +423,9 @@ def _process_single_source(fuente: str) -> FuenteCargaDetalle:
 			rechazados_transformacion=rechazados_transformacion,
 			insertados=stats.get("inserted", 0),
 			duplicados=stats.get("duplicates", 0),
+			actualizados=stats.get("updated", 0),
+			sin_cambios=sin_cambios,
+			eliminados=eliminados,
 			errores_guardado=errores_guardado,
 			reparados=reparados,
 			rechazados=rechazados,
@@ -309,4 +444,54 @@ def _process_single_source(fuente: str) -> FuenteCargaDetalle:
 			reparados=[],
 			rechazados=[],
 			incidencias=[],
-		)
\ No newline at end of file
+		)
+
+
+def _apply_incremental_changes(
+	fuente: str,
+	groups: dict,
+	previous: dict,
+	changed_keys: List[str],
+	deleted_keys: List[str],
+	transformed_records: List[dict],
+	station_codes: dict,
+) -> int:
+	"""
+	Elimina las estaciones de registros desaparecidos o renombrados y guarda las
+	nuevas huellas del origen. Las estaciones se identifican por cod_estacion:
+	el mismo nombre puede repetirse en varias localidades. Devuelve el número
+	de estaciones eliminadas.
+	"""
+	new_names = {
+		record[RECORD_KEY_FIELD]: record.get("nombre")
+		for record in transformed_records
+		if record.get(RECORD_KEY_FIELD)
+	}
+	changed = set(changed_keys)
+	# Huellas anteriores sin cod_estacion: se resuelven por nombre si no es ambiguo
+	legacy_codes = unique_station_codes(fuente, [
+		nombre for _, nombre, cod in previous.values() if nombre and cod is None
+	])
+
+	def previous_code(key: str) -> Optional[int]:
+		_, nombre, cod = previous[key]
+		return cod if cod is not None else legacy_codes.get(nombre)
+
+	stale_codes = {previous_code(key) for key in deleted_keys}
+	stale_codes.update(
+		previous_code(key)
+		for key in changed_keys
+		if key in previous and previous_code(key) != station_codes.get(key)
+	)
+	# Nunca se borra una estación que siga viva en otro registro del origen
+	live_codes = set(station_codes.values())
+	live_codes.update(previous_code(key) for key in previous if key in groups and key not in changed)
+	stale_codes = [cod for cod in stale_codes if cod is not None and cod not in live_codes]
+
+	eliminados = delete_stations(fuente, stale_codes)
+	save_fingerprints(
+		fuente,
+		{key: (groups[key][0], new_names.get(key), station_codes.get(key)) for key in changed_keys},
+		deleted_keys,
+	)
+	return eliminados
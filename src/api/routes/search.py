@@ -1,15 +1,68 @@
 # src/api/routes/search.py
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import cast, String
-from typing import Optional
+import numpy as np
+import orjson
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from pydantic import StringConstraints
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import Select, and_, false, func, literal, or_, select, union_all
+from typing import Annotated, List, Optional
 
-from src.database.session import get_db
-from src.database.models import Estacion, Localidad, Provincia
-from src.api.schemas import EstacionSchema, SearchResponse
+from src.database.async_session import AsyncSessionLocal, get_async_db
+from src.common.search_keys import POSTAL_CODE_LENGTH, normalize_postal_code, normalize_search_text
+from src.database.models import EstacionBusqueda, TIPO_CODIGOS
+from src.api.schemas import (
+    EstacionSchema,
+    SearchResponse,
+    CercanasResponse,
+    CercanasLoteRequest,
+    CercanasLoteResponse,
+    ClustersResponse,
+    MarcadoresResponse,
+    FacetasResponse,
+    EstacionesLoteRequest,
+    EstacionesLoteResponse,
+    FormatoMarcadores,
+    ModoCombinacion,
+    ModoConteo,
+    TipoEstacionSchema,
+)
+from src.api.pagination import (
+    DEFAULT_LIMIT,
+    MAX_LIMIT,
+    decode_cursor,
+    encode_cursor,
+    paginate,
+    split_page,
+    count_statement,
+    estimate_statement,
+    parse_estimate,
+)
+from src.api.projections import codes_condition, parse_fields, select_stations, where_codes, rows_to_dicts
+from src.api.cache import data_generation, response_cache, make_etag, etag_matches
+from src.api.text_search import name_search
+from src.api.full_text import station_text_index, tokenize
+from src.api.geo import parse_bbox, station_geo_index
+from src.api.clusters import MAX_CLUSTER_ZOOM, MAX_ZOOM, cluster_pyramid
+from src.api.markers import select_markers, markers_json, markers_binary
+from src.api.read_model import station_read_model
 
 router = APIRouter(prefix="/estaciones", tags=["Estaciones"])
 
+# Facetas de /estaciones/facetas y columna de la proyección de la que salen
+FACETS = {"provincia": "provincia_nombre", "tipo": "tipo", "origen_datos": "origen_datos"}
+FACET_FIELDS = ("cod_estacion", "tipo", "origen_datos", "provincia_nombre")
+
+# Código postal exacto (4 o 5 cifras) o prefijo terminado en * ("46*"). El prefijo se
+# compara con el código de 5 cifras con ceros a la izquierda: Barcelona es "08*", no "8*"
+POSTAL_CODE_PATTERN = r"^(\d{4,5}|\d{1,4}\*)$"
+POSTAL_BOUND_PATTERN = r"^\d{4,5}$"
+
+# Valores admitidos en cada filtro repetible (provincia=Lugo&provincia=Ourense)
+MAX_FILTER_VALUES = 50
+NombreFiltro = Annotated[str, StringConstraints(min_length=1, max_length=100)]
+CodigoPostalFiltro = Annotated[str, StringConstraints(min_length=2, max_length=10, pattern=POSTAL_CODE_PATTERN)]
+OrigenFiltro = Annotated[str, StringConstraints(min_length=1, max_length=10)]
+
 
 @router.get(
     "",
@@ -19,111 +72,430 @@ router = APIRouter(prefix="/estaciones", tags=["Estaciones"])
     Recurso principal para obtener estaciones ITV con filtros opcionales.
     
     Permite filtrar por:
-    - **localidad**: Nombre de la localidad
-    - **cod_postal**: Código postal exacto
-    - **provincia**: Nombre de la provincia
+    - **q**: Texto libre sobre nombre, dirección, localidad y horario (resultados ordenados por relevancia)
+    - **localidad**: Nombre de la localidad (subcadena, sin distinguir mayúsculas ni tildes)
+    - **cod_postal**: Código postal exacto o prefijo con * (46* para toda la zona 46xxx).
+      El prefijo se aplica al código de 5 cifras con ceros a la izquierda (08* para 08xxx, no 8*)
+    - **cp_desde** / **cp_hasta**: Rango de códigos postales (ambos incluidos)
+    - **provincia**: Nombre de la provincia (subcadena, sin distinguir mayúsculas ni tildes)
     - **tipo**: Tipo de estación (Fija, Movil, Otros)
+    - **origen_datos**: Origen de los datos (gal, cat, cv)
+    - **bbox**: Rectángulo geográfico min_lon,min_lat,max_lon,max_lat
+    
+    **localidad**, **cod_postal**, **provincia**, **tipo** y **origen_datos** se pueden repetir
+    (provincia=Lugo&provincia=Ourense): basta con que se cumpla uno de los valores. Los distintos
+    filtros se combinan con AND, o con OR si **combinar=or** (selección múltiple del mapa).
+    El texto libre **q** se aplica siempre.
     
     Si no se especifica ningún filtro, devuelve todas las estaciones.
+    
+    Con **q** las palabras se buscan también como prefijo ("vive" encuentra "Viveiro") y los
+    resultados se ordenan de mayor a menor relevancia (BM25) en lugar de por **cod_estacion**.
+    
+    Los resultados se paginan por cursor sobre **cod_estacion**: se devuelven como
+    máximo **limit** estaciones y **siguiente_cursor** permite pedir la página siguiente.
+    Con **count** se elige cómo calcular el total (exact, estimate o none).
+    
+    Con **fields** (lista separada por comas) solo se devuelven esos campos de cada
+    estación; **cod_estacion** se incluye siempre.
     """
 )
 async def search_stations(
-    localidad: Optional[str] = Query(
+    q: Optional[str] = Query(
+        None,
+        description="Texto libre a buscar en nombre, dirección, localidad y horario",
+        max_length=200,
+        example="itv vigo"
+    ),
+    localidad: Optional[List[NombreFiltro]] = Query(
         None,
-        description="Nombre de la localidad a buscar",
-        min_length=1,
-        max_length=100,
-        example="Valencia"
+        description="Nombre de la localidad a buscar (se puede repetir)",
+        max_length=MAX_FILTER_VALUES,
+        example=["Valencia"]
     ),
-    cod_postal: Optional[str] = Query(
+    cod_postal: Optional[List[CodigoPostalFiltro]] = Query(
         None,
-        description="Código postal exacto a buscar",
-        min_length=4,
-        max_length=10,
-        pattern=r"^\d{4,5}$",
-        example="46001"
+        description="Código postal exacto a buscar, o prefijo de 5 cifras con ceros terminado en * (46*, 08*); se puede repetir",
+        max_length=MAX_FILTER_VALUES,
+        example=["46001"]
     ),
-    provincia: Optional[str] = Query(
+    cp_desde: Optional[str] = Query(
         None,
-        description="Nombre de la provincia a buscar",
-        min_length=1,
-        max_length=100,
-        example="Valencia"
+        description="Código postal mínimo (incluido)",
+        pattern=POSTAL_BOUND_PATTERN,
+        example="46000"
     ),
-    tipo: Optional[str] = Query(
+    cp_hasta: Optional[str] = Query(
         None,
-        description="Tipo de estación: Fija, Movil, Otros",
-        example="Fija"
+        description="Código postal máximo (incluido)",
+        pattern=POSTAL_BOUND_PATTERN,
+        example="46999"
+    ),
+    provincia: Optional[List[NombreFiltro]] = Query(
+        None,
+        description="Nombre de la provincia a buscar (se puede repetir)",
+        max_length=MAX_FILTER_VALUES,
+        example=["Valencia"]
+    ),
+    tipo: Optional[List[TipoEstacionSchema]] = Query(
+        None,
+        description="Tipo de estación: Fija, Movil, Otros (se puede repetir)",
+        example=["Fija"]
+    ),
+    origen_datos: Optional[List[OrigenFiltro]] = Query(
+        None,
+        description="Origen de los datos: gal, cat, cv (se puede repetir)",
+        max_length=MAX_FILTER_VALUES,
+        example=["gal"]
+    ),
+    bbox: Optional[str] = Query(
+        None,
+        description="Rectángulo geográfico: min_lon,min_lat,max_lon,max_lat",
+        example="-9.3,41.8,-6.7,43.8"
+    ),
+    combinar: ModoCombinacion = Query(
+        ModoCombinacion.y,
+        description="Combinación de los distintos filtros: and (todos) u or (cualquiera)"
+    ),
+    limit: int = Query(
+        DEFAULT_LIMIT,
+        ge=1,
+        le=MAX_LIMIT,
+        description="Número máximo de estaciones por página"
     ),
-    db: Session = Depends(get_db)
-) -> SearchResponse:   
-    # Construir la consulta base con joins para obtener info de localidad y provincia
-    query = db.query(Estacion).outerjoin(
-        Localidad, Estacion.codigo_localidad == Localidad.codigo
-    ).outerjoin(
-        Provincia, Localidad.codigo_provincia == Provincia.codigo
+    cursor: Optional[str] = Query(
+        None,
+        description="Cursor opaco devuelto en siguiente_cursor por la página anterior"
+    ),
+    count: ModoConteo = Query(
+        ModoConteo.exact,
+        description="Cálculo del total: exact, estimate (planificador de la BD) o none"
+    ),
+    fields: Optional[str] = Query(
+        None,
+        description="Campos a devolver separados por comas (por defecto, todos)",
+        example="cod_estacion,latitud,longitud,tipo"
+    ),
+    if_none_match: Optional[str] = Header(None, include_in_schema=False),
+    db: AsyncSession = Depends(get_async_db)
+) -> Response:
+    # Parámetros normalizados: forman la clave de la caché y se usan en la consulta
+    filtros = _normalize_filters(
+        localidad,
+        _postal_ranges(cod_postal, cp_desde, cp_hasta),
+        provincia,
+        tipo,
+        origen_datos,
+        parse_bbox(bbox),
+        combinar,
     )
-    
-    # Aplicar filtros según los parámetros recibidos
-    if localidad:
-        query = query.filter(Localidad.nombre.ilike(f"%{localidad}%"))
-    
-    if cod_postal:
-        query = query.filter(Estacion.codigo_postal == cod_postal)
-    
-    if provincia:
-        query = query.filter(Provincia.nombre.ilike(f"%{provincia}%"))
-    
-    if tipo:
-        query = query.filter(cast(Estacion.tipo, String).ilike(f"%{tipo}%"))
-    
-    # Ejecutar consulta
-    estaciones = query.all()
-    
-    # Verificar si se encontraron resultados
-    if not estaciones:
-        raise HTTPException(
-            status_code=404,
-            detail="No se encontraron estaciones con los criterios especificados"
+    after = decode_cursor(cursor)
+    campos = parse_fields(fields)
+    texto = _normalize_query(q)
+    generacion = await data_generation.current(db)
+    cache_key = ("estaciones", filtros, limit, after, count.value, campos, texto)
+
+    # Si el cliente ya tiene esta versión basta con responder 304 sin cuerpo
+    etag = make_etag(generacion, cache_key)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    body = response_cache.get(cache_key, generacion)
+    if body is None:
+        payload = await _search_page(db, generacion, filtros, limit, after, count, campos, texto)
+
+        # Verificar si se encontraron resultados (una página tras un cursor sí puede venir vacía)
+        if not payload["resultados"] and after is None:
+            raise HTTPException(
+                status_code=404,
+                detail="No se encontraron estaciones con los criterios especificados"
+            )
+
+        # Las filas ya tienen la forma de EstacionSchema: se serializan directamente
+        body = orjson.dumps(payload)
+        response_cache.set(cache_key, generacion, body)
+
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
+@router.get(
+    "/cercanas",
+    response_model=CercanasResponse,
+    summary="Estaciones más cercanas a un punto",
+    description="""
+    Devuelve las **k** estaciones más cercanas al punto (**lat**, **lon**), ordenadas por
+    distancia en km (haversine). Con **radio_km** solo se devuelven las que están dentro
+    de ese radio. Admite **fields** como el listado de estaciones.
+    """
+)
+async def nearest_stations(
+    lat: float = Query(..., ge=-90, le=90, description="Latitud del punto", example=42.2406),
+    lon: float = Query(..., ge=-180, le=180, description="Longitud del punto", example=-8.7207),
+    k: int = Query(5, ge=1, le=100, description="Número máximo de estaciones"),
+    radio_km: Optional[float] = Query(None, gt=0, description="Distancia máxima en km"),
+    fields: Optional[str] = Query(
+        None,
+        description="Campos a devolver separados por comas (por defecto, todos)"
+    ),
+    if_none_match: Optional[str] = Header(None, include_in_schema=False),
+    db: AsyncSession = Depends(get_async_db)
+) -> Response:
+    campos = parse_fields(fields)
+    generacion = await data_generation.current(db)
+    cache_key = ("cercanas", lat, lon, k, radio_km, campos)
+
+    etag = make_etag(generacion, cache_key)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    body = response_cache.get(cache_key, generacion)
+    if body is None:
+        await station_geo_index.refresh(db, generacion)
+        cercanas = station_geo_index.nearest(lat, lon, k, radio_km)
+        if not cercanas:
+            raise HTTPException(
+                status_code=404,
+                detail="No se encontraron estaciones en el radio indicado"
+            )
+
+        distancias = dict(cercanas)
+        result = await db.execute(
+            where_codes(select_stations(campos), list(distancias), db.bind.dialect)
         )
-    
-    # Transformar modelos SQLAlchemy a esquemas Pydantic
-    resultados = []
-    for estacion in estaciones:
-        # Obtener el valor del tipo (manejar ChoiceType)
-        tipo_value = estacion.tipo.value if hasattr(estacion.tipo, 'value') else str(estacion.tipo)
-        
-        # Obtener nombres de localidad y provincia si están disponibles
-        localidad_nombre = None
-        provincia_nombre = None
-        
-        if estacion.localidad:
-            localidad_nombre = estacion.localidad.nombre
-            if estacion.localidad.provincia:
-                provincia_nombre = estacion.localidad.provincia.nombre
-        
-        estacion_dict = EstacionSchema(
-            cod_estacion=estacion.cod_estacion,
-            nombre=estacion.nombre,
-            tipo=tipo_value,
-            direccion=estacion.direccion,
-            codigo_postal=estacion.codigo_postal,
-            latitud=estacion.latitud,
-            longitud=estacion.longitud,
-            descripcion=estacion.descripcion,
-            horario=estacion.horario,
-            contacto=estacion.contacto,
-            url=estacion.url,
-            codigo_localidad=estacion.codigo_localidad,
-            origen_datos=estacion.origen_datos,
-            localidad_nombre=localidad_nombre,
-            provincia_nombre=provincia_nombre
+        resultados = rows_to_dicts(result)
+        for row in resultados:
+            row["distancia_km"] = round(distancias[row["cod_estacion"]], 3)
+        resultados.sort(key=lambda row: (row["distancia_km"], row["cod_estacion"]))
+
+        body = orjson.dumps({"total": len(resultados), "resultados": resultados})
+        response_cache.set(cache_key, generacion, body)
+
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
+@router.post(
+    "/cercanas/lote",
+    response_model=CercanasLoteResponse,
+    summary="Estaciones más cercanas a muchos puntos",
+    description="""
+    Calcula en una sola llamada las **k** estaciones más cercanas a cada punto de **puntos**
+    (haversine vectorizado). Opcionalmente se limita a un **tipo**, a un **origen_datos** o a
+    un **radio_km**. Los datos de las estaciones se devuelven una sola vez en **estaciones**.
+    """
+)
+async def nearest_stations_batch(
+    payload: CercanasLoteRequest,
+    fields: Optional[str] = Query(
+        None,
+        description="Campos de estaciones separados por comas (por defecto, todos)"
+    ),
+    db: AsyncSession = Depends(get_async_db)
+) -> Response:
+    campos = parse_fields(fields)
+    generacion = await data_generation.current(db)
+    await station_geo_index.refresh(db, generacion)
+
+    lats = np.fromiter((punto.lat for punto in payload.puntos), dtype=float, count=len(payload.puntos))
+    lons = np.fromiter((punto.lon for punto in payload.puntos), dtype=float, count=len(payload.puntos))
+    codes, distances = station_geo_index.nearest_batch(
+        lats,
+        lons,
+        payload.k,
+        payload.radio_km,
+        payload.tipo.value if payload.tipo else None,
+        payload.origen_datos.strip().lower() if payload.origen_datos else None,
+    )
+
+    distances = np.round(distances, 3)
+    resultados = [
+        [
+            {"cod_estacion": cod, "distancia_km": distance}
+            for cod, distance in zip(row_codes, row_distances)
+            if cod >= 0
+        ]
+        for row_codes, row_distances in zip(codes.tolist(), distances.tolist())
+    ]
+
+    usadas = np.unique(codes[codes >= 0]).tolist()
+    estaciones = []
+    if usadas:
+        result = await db.execute(
+            where_codes(select_stations(campos), usadas, db.bind.dialect)
+            .order_by(EstacionBusqueda.cod_estacion)
         )
-        resultados.append(estacion_dict)
-    
-    return SearchResponse(
-        total=len(resultados),
-        resultados=resultados
+        estaciones = rows_to_dicts(result)
+
+    return Response(
+        content=orjson.dumps({"resultados": resultados, "estaciones": estaciones}),
+        media_type="application/json",
+    )
+
+
+@router.get(
+    "/clusters",
+    response_model=ClustersResponse,
+    summary="Estaciones agrupadas para el mapa",
+    description=f"""
+    Devuelve las estaciones del rectángulo **bbox** (min_lon,min_lat,max_lon,max_lat)
+    agrupadas en una rejilla según el nivel de **zoom** del mapa: centroide, número de
+    estaciones y tipo predominante de cada grupo. Con zoom mayor que {MAX_CLUSTER_ZOOM}
+    se devuelven las estaciones individuales.
+    """
+)
+async def station_clusters(
+    zoom: int = Query(..., ge=0, le=MAX_ZOOM, description="Nivel de zoom del mapa (mosaicos OSM)"),
+    bbox: Optional[str] = Query(
+        None,
+        description="Rectángulo visible: min_lon,min_lat,max_lon,max_lat (por defecto, todo)",
+        example="-9.3,41.8,-6.7,43.8"
+    ),
+    if_none_match: Optional[str] = Header(None, include_in_schema=False),
+    db: AsyncSession = Depends(get_async_db)
+) -> Response:
+    rectangulo = parse_bbox(bbox)
+    generacion = await data_generation.current(db)
+    cache_key = ("clusters", zoom, rectangulo)
+
+    etag = make_etag(generacion, cache_key)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    body = response_cache.get(cache_key, generacion)
+    if body is None:
+        await cluster_pyramid.refresh(db, generacion)
+        body = orjson.dumps(cluster_pyramid.query(zoom, rectangulo))
+        response_cache.set(cache_key, generacion, body)
+
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
+@router.get(
+    "/facetas",
+    response_model=FacetasResponse,
+    summary="Recuentos de estaciones por provincia, tipo y origen",
+    description="""
+    Devuelve cuántas estaciones hay por **provincia**, **tipo** y **origen_datos** entre las
+    que cumplen los mismos filtros que el listado de estaciones (q, localidad, cod_postal,
+    provincia, tipo y bbox). Sin filtros, los recuentos son de todo el catálogo.
+    """
+)
+async def station_facets(
+    q: Optional[str] = Query(None, max_length=200, description="Texto libre"),
+    localidad: Optional[List[NombreFiltro]] = Query(
+        None, max_length=MAX_FILTER_VALUES, description="Nombre de la localidad (se puede repetir)"
+    ),
+    cod_postal: Optional[List[CodigoPostalFiltro]] = Query(
+        None,
+        max_length=MAX_FILTER_VALUES,
+        description="Código postal exacto o prefijo de 5 cifras con ceros terminado en * (46*, 08*); se puede repetir"
+    ),
+    cp_desde: Optional[str] = Query(None, pattern=POSTAL_BOUND_PATTERN, description="Código postal mínimo"),
+    cp_hasta: Optional[str] = Query(None, pattern=POSTAL_BOUND_PATTERN, description="Código postal máximo"),
+    provincia: Optional[List[NombreFiltro]] = Query(
+        None, max_length=MAX_FILTER_VALUES, description="Nombre de la provincia (se puede repetir)"
+    ),
+    tipo: Optional[List[TipoEstacionSchema]] = Query(
+        None, description="Tipo de estación: Fija, Movil, Otros (se puede repetir)"
+    ),
+    origen_datos: Optional[List[OrigenFiltro]] = Query(
+        None, max_length=MAX_FILTER_VALUES, description="Origen de los datos (se puede repetir)"
+    ),
+    bbox: Optional[str] = Query(None, description="Rectángulo geográfico: min_lon,min_lat,max_lon,max_lat"),
+    combinar: ModoCombinacion = Query(ModoCombinacion.y, description="Combinación de los filtros: and u or"),
+    if_none_match: Optional[str] = Header(None, include_in_schema=False),
+    db: AsyncSession = Depends(get_async_db)
+) -> Response:
+    filtros = _normalize_filters(
+        localidad,
+        _postal_ranges(cod_postal, cp_desde, cp_hasta),
+        provincia,
+        tipo,
+        origen_datos,
+        parse_bbox(bbox),
+        combinar,
+    )
+    texto = _normalize_query(q)
+    generacion = await data_generation.current(db)
+    cache_key = ("facetas", filtros, texto)
+
+    etag = make_etag(generacion, cache_key)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    body = response_cache.get(cache_key, generacion)
+    if body is None:
+        body = orjson.dumps(await _facet_counts(db, generacion, filtros, texto))
+        response_cache.set(cache_key, generacion, body)
+
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
+@router.get(
+    "/marcadores",
+    response_model=MarcadoresResponse,
+    summary="Posiciones de todas las estaciones para el mapa",
+    description="""
+    Devuelve solo el código, las coordenadas y el tipo de cada estación como arrays
+    paralelos, para dibujar el mapa sin descargar el resto de campos. Con
+    **formato=binario** el cuerpo es application/octet-stream (little-endian):
+    uint32 n, uint32[n] ids, float32[n] lat, float32[n] lon, uint8[n] tipo
+    (0 = Fija, 1 = Movil, 2 = Otros). Los detalles se piden con /estaciones/{cod_estacion}.
+    """
+)
+async def station_markers(
+    formato: FormatoMarcadores = Query(FormatoMarcadores.json, description="json o binario"),
+    if_none_match: Optional[str] = Header(None, include_in_schema=False),
+    db: AsyncSession = Depends(get_async_db)
+) -> Response:
+    generacion = await data_generation.current(db)
+    cache_key = ("marcadores", formato.value)
+
+    etag = make_etag(generacion, cache_key)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    binario = formato == FormatoMarcadores.binario
+    body = response_cache.get(cache_key, generacion)
+    if body is None:
+        rows = (await db.execute(select_markers())).all()
+        body = markers_binary(rows) if binario else orjson.dumps(markers_json(rows))
+        response_cache.set(cache_key, generacion, body)
+
+    media_type = "application/octet-stream" if binario else "application/json"
+    return Response(content=body, media_type=media_type, headers={"ETag": etag})
+
+
+@router.post(
+    "/lote",
+    response_model=EstacionesLoteResponse,
+    summary="Obtener muchas estaciones por su código",
+    description="""
+    Devuelve en una sola consulta las estaciones de **codigos** (hasta 5000), en el orden
+    en que se pidieron, y lista en **no_encontrados** los códigos que no existen.
+    Admite **fields** como el listado de estaciones.
+    """
+)
+async def get_stations_batch(
+    payload: EstacionesLoteRequest,
+    fields: Optional[str] = Query(
+        None,
+        description="Campos a devolver separados por comas (por defecto, todos)"
+    ),
+    db: AsyncSession = Depends(get_async_db)
+) -> Response:
+    campos = parse_fields(fields)
+    # Orden de la petición sin códigos repetidos
+    codigos = list(dict.fromkeys(payload.codigos))
+
+    result = await db.execute(where_codes(select_stations(campos), codigos, db.bind.dialect))
+    encontradas = {row["cod_estacion"]: row for row in rows_to_dicts(result)}
+
+    return Response(
+        content=orjson.dumps({
+            "resultados": [encontradas[cod] for cod in codigos if cod in encontradas],
+            "no_encontrados": [cod for cod in codigos if cod not in encontradas],
+        }),
+        media_type="application/json",
     )
 
 
@@ -135,39 +507,293 @@ async def search_stations(
 )
 async def get_station(
     cod_estacion: int,
-    db: Session = Depends(get_db)
-) -> EstacionSchema:
-    estacion = db.query(Estacion).filter(Estacion.cod_estacion == cod_estacion).first()
-
-    if not estacion:
-        raise HTTPException(
-            status_code=404,
-            detail=f"No se encontró la estación con código {cod_estacion}"
-        )
+    if_none_match: Optional[str] = Header(None, include_in_schema=False),
+    db: AsyncSession = Depends(get_async_db)
+) -> Response:
+    generacion = await data_generation.current(db)
+    cache_key = ("estacion", cod_estacion)
+
+    etag = make_etag(generacion, cache_key)
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    body = response_cache.get(cache_key, generacion)
+    if body is None:
+        modelo = station_read_model.current(generacion)
+        if modelo is not None:
+            estacion = modelo.get(cod_estacion)
+        else:
+            result = await db.execute(select_stations().where(EstacionBusqueda.cod_estacion == cod_estacion))
+            estacion = next(iter(rows_to_dicts(result)), None)
+
+        if estacion is None:
+            raise HTTPException(
+                status_code=404,
+                detail=f"No se encontró la estación con código {cod_estacion}"
+            )
+
+        body = orjson.dumps(estacion)
+        response_cache.set(cache_key, generacion, body)
+
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
+def _normalize_text(value: Optional[str]) -> Optional[str]:
+    # Los filtros de texto no distinguen mayúsculas ni tildes: se normalizan a minúsculas sin tildes
+    value = normalize_search_text(value.strip()) if value else None
+    return value or None
+
+
+def _normalize_query(q: Optional[str]) -> Optional[str]:
+    # El orden y la repetición de las palabras no cambian el resultado de la búsqueda
+    tokens = sorted(set(tokenize(q)))
+    return " ".join(tokens) or None
+
+
+def _normalize_values(values: Optional[List[str]]) -> Optional[tuple]:
+    # Valores de un filtro repetible normalizados, sin repetir y en orden (clave de caché estable)
+    normalized = {_normalize_text(value) for value in values or ()} - {None}
+    return tuple(sorted(normalized)) or None
+
+
+def _postal_bounds(cod_postal: str) -> tuple[str, str]:
+    cod_postal = cod_postal.strip()
+    if cod_postal.endswith("*"):
+        # Un prefijo equivale al rango de todos los códigos que lo completan
+        prefijo = cod_postal[:-1]
+        return prefijo.ljust(POSTAL_CODE_LENGTH, "0"), prefijo.ljust(POSTAL_CODE_LENGTH, "9")
+    exacto = normalize_postal_code(cod_postal)
+    return exacto, exacto
 
-    tipo_value = estacion.tipo.value if hasattr(estacion.tipo, 'value') else str(estacion.tipo)
-
-    localidad_nombre = None
-    provincia_nombre = None
-    if estacion.localidad:
-        localidad_nombre = estacion.localidad.nombre
-        if estacion.localidad.provincia:
-            provincia_nombre = estacion.localidad.provincia.nombre
-
-    return EstacionSchema(
-        cod_estacion=estacion.cod_estacion,
-        nombre=estacion.nombre,
-        tipo=tipo_value,
-        direccion=estacion.direccion,
-        codigo_postal=estacion.codigo_postal,
-        latitud=estacion.latitud,
-        longitud=estacion.longitud,
-        descripcion=estacion.descripcion,
-        horario=estacion.horario,
-        contacto=estacion.contacto,
-        url=estacion.url,
-        codigo_localidad=estacion.codigo_localidad,
-        origen_datos=estacion.origen_datos,
-        localidad_nombre=localidad_nombre,
-        provincia_nombre=provincia_nombre
+
+def _postal_ranges(
+    cod_postal: Optional[List[str]],
+    cp_desde: Optional[str],
+    cp_hasta: Optional[str],
+) -> Optional[tuple]:
+    """
+    Reduce los cod_postal (exactos o prefijos) y cp_desde/cp_hasta a rangos
+    (desde, hasta) de códigos de 5 cifras; None en un extremo lo deja abierto.
+    Cada cod_postal da un rango, acotado por cp_desde/cp_hasta; una tupla
+    vacía significa que ningún código puede cumplir el filtro.
+    """
+    desde = normalize_postal_code(cp_desde)
+    hasta = normalize_postal_code(cp_hasta)
+    if desde and hasta and desde > hasta:
+        raise HTTPException(status_code=400, detail="cp_desde no puede ser mayor que cp_hasta")
+
+    if not cod_postal:
+        return None if desde is None and hasta is None else ((desde, hasta),)
+
+    rangos = set()
+    for bajo, alto in map(_postal_bounds, cod_postal):
+        bajo = max(desde, bajo) if desde else bajo
+        alto = min(hasta, alto) if hasta else alto
+        if bajo <= alto:
+            rangos.add((bajo, alto))
+    return tuple(sorted(rangos))
+
+
+def _tipo_codes(tipos: Optional[List[TipoEstacionSchema]]) -> Optional[tuple]:
+    # Los tipos pedidos se traducen a sus códigos, sin repetir y en orden
+    return tuple(sorted({TIPO_CODIGOS[tipo.value] for tipo in tipos})) if tipos else None
+
+
+def _normalize_filters(
+    localidad: Optional[List[str]],
+    cod_postal: Optional[tuple],
+    provincia: Optional[List[str]],
+    tipo: Optional[List[TipoEstacionSchema]],
+    origen_datos: Optional[List[str]] = None,
+    bbox: Optional[tuple] = None,
+    combinar: ModoCombinacion = ModoCombinacion.y,
+) -> tuple:
+    filtros = (
+        _normalize_values(localidad),
+        cod_postal,
+        _normalize_values(provincia),
+        _tipo_codes(tipo),
+        _normalize_values(origen_datos),
+        bbox,
     )
+    # Con menos de dos filtros AND y OR son lo mismo: comparten entrada de caché
+    if sum(filtro is not None for filtro in filtros) < 2:
+        combinar = ModoCombinacion.y
+    return filtros + (combinar.value,)
+
+
+def _postal_condition(rangos: tuple):
+    # Códigos de ancho fijo: los exactos van en un IN y prefijos y rangos son rangos del índice
+    exactos = [desde for desde, hasta in rangos if desde == hasta]
+    conditions = [EstacionBusqueda.codigo_postal.in_(exactos)] if exactos else []
+    for desde, hasta in rangos:
+        if desde == hasta:
+            continue
+        limites = []
+        if desde:
+            limites.append(EstacionBusqueda.codigo_postal >= desde)
+        if hasta:
+            limites.append(EstacionBusqueda.codigo_postal <= hasta)
+        conditions.append(and_(*limites))
+    return or_(*conditions) if conditions else false()
+
+
+async def _filtered_query(
+    db: AsyncSession,
+    generacion: int,
+    filtros: tuple,
+    campos: Optional[tuple] = None,
+) -> Select:
+    """
+    Consulta proyectada con todos los filtros de búsqueda salvo el texto libre,
+    en una sola sentencia: OR (IN) entre los valores de un filtro y AND u OR
+    entre filtros según combinar.
+    """
+    localidades, cod_postal, provincias, tipos, origenes, bbox, combinar = filtros
+    # Localidad y provincia se resuelven con la búsqueda indexada de nombres
+    conditions = await name_search.conditions(db, generacion, localidades, provincias)
+
+    if cod_postal is not None:
+        conditions.append(_postal_condition(cod_postal))
+
+    if tipos:
+        # Igualdad sobre el código indexado en lugar de comparar texto fila a fila
+        conditions.append(EstacionBusqueda.codigo_tipo.in_(tipos))
+
+    if origenes:
+        conditions.append(EstacionBusqueda.origen_datos.in_(origenes))
+
+    if bbox:
+        # El KD-tree en memoria resuelve el rectángulo a la lista de estaciones que contiene
+        await station_geo_index.refresh(db, generacion)
+        conditions.append(codes_condition(station_geo_index.in_bbox(bbox), db.bind.dialect))
+
+    # Consulta proyectada sobre la tabla de lectura: solo las columnas pedidas
+    query = select_stations(campos)
+    if conditions:
+        combine = or_ if combinar == ModoCombinacion.o.value else and_
+        query = query.where(combine(*conditions))
+    return query
+
+
+async def _search_page(
+    db: AsyncSession,
+    generacion: int,
+    filtros: tuple,
+    limit: int,
+    after: Optional[int],
+    count: ModoConteo,
+    campos: Optional[tuple] = None,
+    texto: Optional[str] = None,
+) -> dict:
+    # Con el catálogo de esta generación en memoria no hace falta ir a la BD
+    modelo = station_read_model.current(generacion)
+    if modelo is not None:
+        return modelo.search(filtros, limit, after, count != ModoConteo.none, campos, texto)
+
+    query = await _filtered_query(db, generacion, filtros, campos)
+
+    if texto:
+        return await _search_ranked(db, generacion, query, texto, limit, after, count)
+
+    total = None
+    if count == ModoConteo.estimate:
+        estimate = estimate_statement(query, db.bind.dialect)
+        if estimate is not None:
+            connection = await db.connection()
+            total = parse_estimate((await connection.exec_driver_sql(estimate)).scalar_one())
+        else:
+            count = ModoConteo.exact
+    if count == ModoConteo.exact:
+        total = (await db.execute(count_statement(query))).scalar_one()
+
+    rows = rows_to_dicts(await db.execute(paginate(query, after, limit)))
+    resultados, siguiente_cursor = split_page(rows, limit)
+    return {"total": total, "resultados": resultados, "siguiente_cursor": siguiente_cursor}
+
+
+async def _search_ranked(
+    db: AsyncSession,
+    generacion: int,
+    query: Select,
+    texto: str,
+    limit: int,
+    offset: Optional[int],
+    count: ModoConteo,
+) -> dict:
+    """
+    Búsqueda de texto libre: el índice en memoria da el orden por relevancia y
+    la BD aplica el resto de filtros. Aquí el cursor codifica la posición en el ranking.
+    """
+    await station_text_index.refresh(db, generacion)
+    ranking = station_text_index.search(texto)
+    if not ranking:
+        return {"total": None if count == ModoConteo.none else 0, "resultados": [], "siguiente_cursor": None}
+
+    position = {cod: index for index, cod in enumerate(ranking)}
+    rows = rows_to_dicts(await db.execute(where_codes(query, ranking, db.bind.dialect)))
+    rows.sort(key=lambda row: position[row["cod_estacion"]])
+
+    offset = offset or 0
+    end = offset + limit
+    return {
+        "total": None if count == ModoConteo.none else len(rows),
+        "resultados": rows[offset:end],
+        "siguiente_cursor": encode_cursor(end) if end < len(rows) else None,
+    }
+
+
+async def _facet_counts(
+    db: AsyncSession,
+    generacion: int,
+    filtros: tuple,
+    texto: Optional[str],
+) -> dict:
+    """Recuentos por provincia, tipo y origen en una sola sentencia (UNION ALL de GROUP BY)."""
+    modelo = station_read_model.current(generacion)
+    if modelo is not None:
+        return modelo.facets(filtros, texto, FACETS)
+
+    query = await _filtered_query(db, generacion, filtros, FACET_FIELDS)
+    if texto:
+        await station_text_index.refresh(db, generacion)
+        query = where_codes(query, station_text_index.search(texto), db.bind.dialect)
+
+    base = query.subquery()
+    statement = union_all(*(
+        select(literal(faceta).label("faceta"), base.c[campo].label("valor"), func.count().label("total"))
+        .group_by(base.c[campo])
+        for faceta, campo in FACETS.items()
+    ))
+    facetas = {faceta: [] for faceta in FACETS}
+    for faceta, valor, total in await db.execute(statement):
+        facetas[faceta].append({"valor": valor, "total": total})
+    for valores in facetas.values():
+        valores.sort(key=lambda item: (-item["total"], item["valor"] or ""))
+
+    # Cada estación tiene exactamente un origen: su suma es el total filtrado
+    facetas["total"] = sum(item["total"] for item in facetas["origen_datos"])
+    return facetas
+
+
+async def _prewarm_cache(generacion: int) -> None:
+    """Precalcula el listado completo y el de cada provincia para la nueva generación."""
+    async with AsyncSessionLocal() as db:
+        provincias = (await db.execute(
+            select(EstacionBusqueda.provincia_nombre)
+            .where(EstacionBusqueda.provincia_nombre.is_not(None))
+            .distinct()
+        )).scalars().all()
+        consultas = [_normalize_filters(None, None, None, None)]
+        consultas.extend(_normalize_filters(None, None, [nombre], None) for nombre in provincias)
+        for filtros in consultas:
+            if response_cache.generation != generacion:
+                return  # Ha llegado otra generación mientras se precalentaba
+            # Primera página con los parámetros por defecto, la que piden los clientes
+            payload = await _search_page(db, generacion, filtros, DEFAULT_LIMIT, None, ModoConteo.exact)
+            if payload["resultados"]:
+                cache_key = ("estaciones", filtros, DEFAULT_LIMIT, None, ModoConteo.exact.value, None, None)
+                response_cache.set(cache_key, generacion, orjson.dumps(payload))
+
+
+data_generation.subscribe(_prewarm_cache)
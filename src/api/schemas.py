@@ -49,9 +49,160 @@ class EstacionSchema(BaseModel):
         from_attributes = True
 
 
+class ModoConteo(str, Enum):
+    exact = "exact"
+    estimate = "estimate"
+    none = "none"
+
+
 class SearchResponse(BaseModel):
-    total: int = Field(..., description="Número total de resultados encontrados")
-    resultados: List[EstacionSchema] = Field(..., description="Lista de estaciones encontradas")
+    total: Optional[int] = Field(
+        None,
+        description="Número total de resultados (estimado con count=estimate, ausente con count=none)",
+    )
+    resultados: List[EstacionSchema] = Field(..., description="Estaciones de la página actual")
+    siguiente_cursor: Optional[str] = Field(
+        None,
+        description="Cursor para pedir la página siguiente (null si es la última)",
+    )
+
+
+class EstacionCercanaSchema(EstacionSchema):
+    distancia_km: float = Field(..., description="Distancia en km desde el punto de búsqueda")
+
+
+class CercanasResponse(BaseModel):
+    total: int = Field(..., description="Número de estaciones devueltas")
+    resultados: List[EstacionCercanaSchema] = Field(
+        ...,
+        description="Estaciones ordenadas de la más cercana a la más lejana",
+    )
+
+
+class PuntoSchema(BaseModel):
+    lat: float = Field(..., ge=-90, le=90, description="Latitud del punto")
+    lon: float = Field(..., ge=-180, le=180, description="Longitud del punto")
+
+
+class CercanasLoteRequest(BaseModel):
+    puntos: List[PuntoSchema] = Field(
+        ...,
+        min_length=1,
+        max_length=100_000,
+        description="Puntos para los que se buscan las estaciones más cercanas",
+    )
+    k: int = Field(1, ge=1, le=20, description="Número de estaciones por punto")
+    radio_km: Optional[float] = Field(None, gt=0, description="Distancia máxima en km")
+    tipo: Optional[TipoEstacionSchema] = Field(None, description="Solo estaciones de este tipo")
+    origen_datos: Optional[str] = Field(None, description="Solo estaciones de este origen (gal, cat, cv)")
+
+
+class EstacionDistanciaSchema(BaseModel):
+    cod_estacion: int = Field(..., description="Código de la estación")
+    distancia_km: float = Field(..., description="Distancia en km desde el punto")
+
+
+class CercanasLoteResponse(BaseModel):
+    resultados: List[List[EstacionDistanciaSchema]] = Field(
+        ...,
+        description="Para cada punto, en el mismo orden, sus estaciones de la más cercana a la más lejana",
+    )
+    estaciones: List[EstacionSchema] = Field(
+        ...,
+        description="Datos de las estaciones que aparecen en los resultados",
+    )
+
+
+class ClusterSchema(BaseModel):
+    latitud: float = Field(..., description="Latitud del centroide")
+    longitud: float = Field(..., description="Longitud del centroide")
+    total: int = Field(..., description="Número de estaciones agrupadas")
+    tipo_dominante: str = Field(..., description="Tipo de estación más frecuente en el grupo")
+    cod_estacion: Optional[int] = Field(None, description="Código de la estación si el grupo tiene solo una")
+
+
+class EstacionMapaSchema(BaseModel):
+    cod_estacion: int = Field(..., description="Código único de la estación")
+    nombre: str = Field(..., description="Nombre de la estación ITV")
+    latitud: float = Field(..., description="Coordenada de latitud")
+    longitud: float = Field(..., description="Coordenada de longitud")
+    tipo: str = Field(..., description="Tipo de estación: Fija, Movil, u Otros")
+
+
+class ClustersResponse(BaseModel):
+    zoom: int = Field(..., description="Nivel de zoom solicitado")
+    clusters: List[ClusterSchema] = Field(..., description="Grupos de estaciones visibles")
+    estaciones: List[EstacionMapaSchema] = Field(
+        ...,
+        description="Estaciones individuales (solo con zoom alto, cuando ya no se agrupan)",
+    )
+
+
+class EstacionesLoteRequest(BaseModel):
+    codigos: List[int] = Field(
+        ...,
+        min_length=1,
+        max_length=5000,
+        description="Códigos de las estaciones a recuperar",
+    )
+
+
+class EstacionesLoteResponse(BaseModel):
+    resultados: List[EstacionSchema] = Field(
+        ...,
+        description="Estaciones encontradas, en el orden de la petición (sin repetir)",
+    )
+    no_encontrados: List[int] = Field(..., description="Códigos pedidos que no existen")
+
+
+class FacetaValorSchema(BaseModel):
+    valor: Optional[str] = Field(None, description="Valor de la faceta (null si no consta)")
+    total: int = Field(..., description="Número de estaciones con ese valor")
+
+
+class FacetasResponse(BaseModel):
+    total: int = Field(..., description="Número de estaciones que cumplen los filtros")
+    provincia: List[FacetaValorSchema] = Field(..., description="Recuento por provincia")
+    tipo: List[FacetaValorSchema] = Field(..., description="Recuento por tipo de estación")
+    origen_datos: List[FacetaValorSchema] = Field(..., description="Recuento por origen de los datos")
+
+
+class ModoCombinacion(str, Enum):
+    y = "and"
+    o = "or"
+
+
+class FormatoMarcadores(str, Enum):
+    json = "json"
+    binario = "binario"
+
+
+class MarcadoresResponse(BaseModel):
+    total: int = Field(..., description="Número de estaciones con coordenadas")
+    tipos: List[str] = Field(..., description="Tipo correspondiente a cada código de 'tipo'")
+    ids: List[int] = Field(..., description="Códigos de las estaciones")
+    lat: List[float] = Field(..., description="Latitudes, en el mismo orden que ids")
+    lon: List[float] = Field(..., description="Longitudes, en el mismo orden que ids")
+    tipo: List[int] = Field(..., description="Código de tipo de cada estación (índice en 'tipos')")
+
+
+class SugerenciaLocalidadSchema(BaseModel):
+    nombre: str = Field(..., description="Nombre de la localidad")
+    provincia: Optional[str] = Field(None, description="Provincia de la localidad")
+    estaciones: int = Field(..., description="Número de estaciones en la localidad")
+
+
+class SugerenciaProvinciaSchema(BaseModel):
+    nombre: str = Field(..., description="Nombre de la provincia")
+    estaciones: int = Field(..., description="Número de estaciones en la provincia")
+
+
+class AutocompletarLocalidadesResponse(BaseModel):
+    resultados: List[SugerenciaLocalidadSchema] = Field(..., description="Sugerencias ordenadas")
+
+
+class AutocompletarProvinciasResponse(BaseModel):
+    resultados: List[SugerenciaProvinciaSchema] = Field(..., description="Sugerencias ordenadas")
 
 
 class RegistroReparadoSchema(BaseModel):
@@ -83,6 +234,14 @@ class RegistroIncidenciaSchema(BaseModel):
     accion: Optional[str] = Field(None, description="Transformación aplicada si se pudo reparar")
 
 
+class ModoCarga(str, Enum):
+    insertar = "insertar"
+    upsert = "upsert"
+    incremental = "incremental"
+    recarga = "recarga"
+    reemplazar = "reemplazar"
+
+
 class LoadRequest(BaseModel):
     fuentes: List[str] = Field(
         ...,
@@ -90,6 +249,17 @@ class LoadRequest(BaseModel):
         min_length=1,
         examples=[["gal", "cv"]],
     )
+    modo: ModoCarga = Field(
+        ModoCarga.insertar,
+        description=(
+            "insertar: las estaciones existentes se cuentan como duplicadas; "
+            "upsert: se actualizan solo las estaciones cuyo contenido ha cambiado; "
+            "incremental: solo se procesan los registros nuevos, modificados o eliminados en el origen; "
+            "recarga: sustituye todo el almacén por las fuentes indicadas, cargándolas en tablas de "
+            "staging y publicándolas en una única transacción; "
+            "reemplazar: sustituye solo las estaciones de cada fuente indicada, sin tocar las demás"
+        ),
+    )
 
 
 class FuenteCargaDetalle(BaseModel):
@@ -99,6 +269,10 @@ class FuenteCargaDetalle(BaseModel):
     rechazados_transformacion: int = Field(..., description="Registros descartados durante la transformación")
     insertados: int = Field(..., description="Registros nuevos insertados en base de datos")
     duplicados: int = Field(..., description="Registros detectados como duplicados")
+    actualizados: int = Field(0, description="Registros existentes actualizados por cambio de contenido")
+    sin_cambios: int = Field(0, description="Registros existentes cuyo contenido no ha cambiado")
+    eliminados: int = Field(0, description="Registros eliminados por haber desaparecido del origen")
+    omitida: bool = Field(False, description="La fuente no ha cambiado desde la última carga y se ha omitido")
     errores_guardado: List[str] = Field(default_factory=list, description="Errores detectados al guardar")
     reparados: List[RegistroReparadoSchema] = Field(
         default_factory=list,
@@ -118,6 +292,9 @@ class LoadProcessResponse(BaseModel):
     total_fuentes: int = Field(..., description="Número de comunidades procesadas")
     total_insertados: int = Field(..., description="Total de registros insertados")
     total_duplicados: int = Field(..., description="Total de registros duplicados")
+    total_actualizados: int = Field(0, description="Total de registros actualizados")
+    total_sin_cambios: int = Field(0, description="Total de registros sin cambios")
+    total_eliminados: int = Field(0, description="Total de registros eliminados")
     total_rechazados: int = Field(..., description="Total de registros descartados (transformación + guardado)")
     detalles: List[FuenteCargaDetalle] = Field(..., description="Detalle por comunidad procesada")
     reparados: List[RegistroReparadoSchema] = Field(
@@ -132,3 +309,7 @@ class LoadProcessResponse(BaseModel):
         default_factory=list,
         description="Incidencias detalladas que muestran reparaciones o rechazos",
     )
+    recarga_aplicada: bool = Field(
+        False,
+        description="En modo recarga, indica si los datos de staging se han publicado",
+    )
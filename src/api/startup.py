@@ -0,0 +1,24 @@
+# src/api/startup.py
+"""
+Preparación de la base de datos al arrancar las APIs de búsqueda y de carga:
+esquema al día (ver src/database/migrations.py) y tabla de lectura rellena en
+las BD cargadas antes de que existiera.
+"""
+import logging
+
+from fastapi.concurrency import run_in_threadpool
+
+from src.common.db_storage import backfill_search_table
+from src.database.migrations import upgrade_schema
+
+logger = logging.getLogger(__name__)
+
+
+async def prepare_database() -> None:
+    """Aplica los cambios de esquema pendientes y rellena estaciones_busqueda si está vacía."""
+    try:
+        await run_in_threadpool(upgrade_schema)
+        await run_in_threadpool(backfill_search_table)
+    except Exception:
+        # Sin BD la API arranca igualmente, como hace el modelo de lectura
+        logger.exception("No se pudo preparar la base de datos al arrancar")
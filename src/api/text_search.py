@@ -0,0 +1,134 @@
+# src/api/text_search.py
+"""
+Búsqueda por subcadena de localidad y provincia sin distinguir mayúsculas
+ni tildes ("castellon" encuentra "Castellón").
+Los nombres ya normalizados se guardan en la tabla de lectura
+estaciones_busqueda (localidad_clave, provincia_clave). En Postgres se usa
+un índice GIN de trigramas (pg_trgm) sobre esas columnas, creado en
+create_db_and_tables. En otros backends (SQLite) se mantiene en memoria un
+índice de trigramas de los nombres que se reconstruye con cada generación de
+datos y resuelve el filtro a una lista de códigos.
+"""
+from sqlalchemy import false, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.elements import ColumnElement
+
+from src.api.cache import data_generation
+from src.common.search_keys import normalize_search_text
+from src.database.models import EstacionBusqueda
+
+NGRAM_SIZE = 3
+
+
+def _ngrams(text: str) -> set[str]:
+    return {text[i:i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)}
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+class NgramIndex:
+    """Índice invertido trigrama -> códigos para búsquedas por subcadena."""
+
+    def __init__(self):
+        self._names: dict[int, str] = {}
+        self._postings: dict[str, set[int]] = {}
+
+    def build(self, rows) -> None:
+        """rows: pares (codigo, nombre)."""
+        self._names = {codigo: normalize_search_text(nombre) for codigo, nombre in rows}
+        self._postings = {}
+        for codigo, nombre in self._names.items():
+            for ngram in _ngrams(nombre):
+                self._postings.setdefault(ngram, set()).add(codigo)
+
+    def search(self, pattern: str) -> set[int]:
+        """Códigos cuyo nombre normalizado contiene pattern (ya normalizado)."""
+        ngrams = _ngrams(pattern)
+        if not ngrams:
+            # Patrones más cortos que un trigrama: se recorren los nombres
+            return {codigo for codigo, nombre in self._names.items() if pattern in nombre}
+
+        # Se intersecan primero las listas más cortas
+        postings = sorted((self._postings.get(ngram, set()) for ngram in ngrams), key=len)
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates &= posting
+            if not candidates:
+                return candidates
+        # Los trigramas no garantizan el orden: se confirma la subcadena
+        return {codigo for codigo in candidates if pattern in self._names[codigo]}
+
+
+class NameSearch:
+    """Índices en memoria de localidades y provincias para la generación actual."""
+
+    def __init__(self):
+        self.generation: int | None = None
+        self.localidades = NgramIndex()
+        self.provincias = NgramIndex()
+
+    def reset(self, generation: int) -> None:
+        # Se reconstruye en la siguiente búsqueda que lo necesite
+        self.generation = None
+
+    async def refresh(self, db: AsyncSession, generation: int) -> None:
+        if self.generation == generation:
+            return
+        localidades = await db.execute(
+            select(EstacionBusqueda.codigo_localidad, EstacionBusqueda.localidad_nombre)
+            .where(EstacionBusqueda.localidad_nombre.is_not(None))
+            .distinct()
+        )
+        provincias = await db.execute(
+            select(EstacionBusqueda.codigo_provincia, EstacionBusqueda.provincia_nombre)
+            .where(EstacionBusqueda.provincia_nombre.is_not(None))
+            .distinct()
+        )
+        self.localidades.build(localidades.all())
+        self.provincias.build(provincias.all())
+        self.generation = generation
+
+    async def conditions(
+        self,
+        db: AsyncSession,
+        generation: int,
+        localidades: tuple[str, ...] | None,
+        provincias: tuple[str, ...] | None,
+    ) -> list[ColumnElement]:
+        """
+        Una condición WHERE por filtro de localidad y de provincia (valores ya
+        normalizados); basta con que el nombre contenga uno de los valores.
+        """
+        if not localidades and not provincias:
+            return []
+
+        if db.bind.dialect.name == "postgresql":
+            # Usa el índice GIN de trigramas sobre las claves normalizadas
+            return [
+                or_(*(column.like(f"%{_escape_like(value)}%", escape="\\") for value in values))
+                for column, values in (
+                    (EstacionBusqueda.localidad_clave, localidades),
+                    (EstacionBusqueda.provincia_clave, provincias),
+                )
+                if values
+            ]
+
+        await self.refresh(db, generation)
+        conditions = []
+        if localidades:
+            codes = set().union(*(self.localidades.search(value) for value in localidades))
+            conditions.append(_in_codes(EstacionBusqueda.codigo_localidad, codes))
+        if provincias:
+            codes = set().union(*(self.provincias.search(value) for value in provincias))
+            conditions.append(_in_codes(EstacionBusqueda.codigo_provincia, codes))
+        return conditions
+
+
+def _in_codes(column, codes: set[int]) -> ColumnElement:
+    return column.in_(sorted(codes)) if codes else false()
+
+
+name_search = NameSearch()
+data_generation.subscribe(name_search.reset)
@@ -1,5 +1,6 @@
 # src/gui.py
 """ITV Station Search GUI with ttkbootstrap and OpenStreetMap integration."""
+import struct
 import threading
 import time
 
@@ -22,15 +23,27 @@ class ITVSearchApp:
     
     # Station types from database model
     TIPOS_ESTACION = ["Todos", "Fija", "Movil", "Otros"]
+    # Type codes of the binary /estaciones/marcadores payload (0 = Fija, 1 = Movil, 2 = Otros)
+    MARKER_TIPOS = ["Fija", "Movil", "Otros"]
     
     # API base URL
     API_BASE_URL = "http://localhost:8000"
+    # Page size requested from the paginated /estaciones endpoint
+    PAGE_SIZE = 1000
     # Tile source URL (plain OSM)
     TILE_SERVER_URL = "https://tile.openstreetmap.org/{z}/{x}/{y}.png"
     
     # Marker colors
     MARKER_COLOR_NORMAL = ("#C02720", "#EA4335")       # Red (circle, outside)
     MARKER_COLOR_HIGHLIGHT = ("#FF6600", "#FF8C00")    # Orange (circle, outside)
+    MARKER_COLOR_CLUSTER = ("#1F5FA8", "#4285F4")      # Blue (circle, outside)
+    
+    # How often the map viewport is checked for pan/zoom changes (ms)
+    VIEWPORT_POLL_MS = 400
+    # Pause after the last key press before asking the API for suggestions (ms)
+    AUTOCOMPLETE_DEBOUNCE_MS = 250
+    # Number of suggestions shown in the locality and province dropdowns
+    AUTOCOMPLETE_LIMIT = 20
 
     def __init__(self):
         """Initialize the application."""
@@ -43,8 +56,17 @@ class ITVSearchApp:
         self.root.position_center()
 
         # Store all markers with their station data for recreation
-        self.all_markers = {}  # {station_id: marker}
-        self.station_data = {}  # {station_id: station_dict} for marker recreation
+        self.all_markers = {}  # {cod_estacion: marker}
+        self.station_data = {}  # {cod_estacion: station_dict} for marker recreation
+        
+        # Full station records fetched lazily when a marker is clicked
+        self.station_details = {}  # {cod_estacion: station_dict}
+        
+        # Cluster markers from /estaciones/clusters and the viewport they belong to
+        self.cluster_markers = []
+        self.stations_by_cod = {}  # {cod_estacion: station_dict}
+        self.highlight_ids = set()
+        self._viewport = None
         
         # Store current search result IDs for highlighting
         self.search_result_ids = set()
@@ -59,10 +81,14 @@ class ITVSearchApp:
         # Store search results
         self.results = []
         
-        # Store all stations for dropdowns
+        # ETag of the last /estaciones/marcadores download (conditional GET on refresh)
+        self.stations_etag = None
+        
+        # Marker data of every station (cod_estacion, latitud, longitud, tipo)
         self.all_stations = []
-        self.all_localidades = []
-        self.all_provincias = []
+        
+        # Pending debounced autocomplete requests {"localidades"|"provincias": after id}
+        self._autocomplete_jobs = {}
         
         # Build the UI
         self._create_header()
@@ -76,6 +102,9 @@ class ITVSearchApp:
         # Load all stations on startup
         self.root.after(100, self._load_all_stations)
         
+        # Redraw clustered markers whenever the map is panned or zoomed
+        self.root.after(self.VIEWPORT_POLL_MS, self._watch_viewport)
+        
     def _create_header(self):
         """Create the header with title and theme selector."""
         header_frame = ttk.Frame(self.root, padding=10)
@@ -157,6 +186,21 @@ class ITVSearchApp:
         )
         search_frame.grid(row=0, column=0, sticky=NSEW, padx=(0, 10))
         
+        # Free text (name, address, locality, schedule; ranked by relevance)
+        ttk.Label(
+            search_frame,
+            text="Texto libre:",
+            font=("Segoe UI", 11)
+        ).pack(anchor=W, pady=(0, 5))
+        
+        self.texto_var = ttk.StringVar()
+        ttk.Entry(
+            search_frame,
+            textvariable=self.texto_var,
+            font=("Segoe UI", 11),
+            bootstyle="warning"
+        ).pack(fill=X, pady=(0, 15))
+        
         # Localidad (autocomplete combobox)
         ttk.Label(
             search_frame,
@@ -244,28 +288,55 @@ class ITVSearchApp:
         ).pack(side=RIGHT, expand=True, padx=(5, 0))
         
     def _filter_localidades(self, event=None):
-        """Filter localidades dropdown based on typed text."""
-        # Skip if arrow keys or navigation
-        if event and event.keysym in ('Down', 'Up', 'Left', 'Right', 'Return', 'Escape'):
-            return
-        typed = self.localidad_var.get().lower()
-        if typed:
-            filtered = [l for l in self.all_localidades if typed in l.lower()]
-            self.localidad_combo['values'] = filtered[:20]
-        else:
-            self.localidad_combo['values'] = self.all_localidades[:20]
+        """Refresh locality suggestions after a short pause in typing."""
+        self._schedule_autocomplete(event, "localidades", self.localidad_var, self.localidad_combo)
             
     def _filter_provincias(self, event=None):
-        """Filter provincias dropdown based on typed text."""
+        """Refresh province suggestions after a short pause in typing."""
+        self._schedule_autocomplete(event, "provincias", self.provincia_var, self.provincia_combo)
+    
+    def _schedule_autocomplete(self, event, kind, var, combo):
+        """Debounce key releases: only the last one within the pause triggers a request."""
         # Skip if arrow keys or navigation
         if event and event.keysym in ('Down', 'Up', 'Left', 'Right', 'Return', 'Escape'):
             return
-        typed = self.provincia_var.get().lower()
-        if typed:
-            filtered = [p for p in self.all_provincias if typed in p.lower()]
-            self.provincia_combo['values'] = filtered
-        else:
-            self.provincia_combo['values'] = self.all_provincias
+        pending = self._autocomplete_jobs.get(kind)
+        if pending:
+            self.root.after_cancel(pending)
+        self._autocomplete_jobs[kind] = self.root.after(
+            self.AUTOCOMPLETE_DEBOUNCE_MS,
+            lambda: self._start_autocomplete(kind, var.get(), combo)
+        )
+    
+    def _start_autocomplete(self, kind, typed, combo):
+        """Ask the API for suggestions in a background thread."""
+        self._autocomplete_jobs.pop(kind, None)
+        threading.Thread(
+            target=self._fetch_suggestions,
+            args=(kind, typed, combo),
+            daemon=True
+        ).start()
+    
+    def _fetch_suggestions(self, kind, typed, combo):
+        """Fetch suggestions from /autocompletar and update the dropdown."""
+        try:
+            response = requests.get(
+                f"{self.API_BASE_URL}/autocompletar/{kind}",
+                params={"prefijo": typed.strip(), "limit": self.AUTOCOMPLETE_LIMIT},
+                timeout=5
+            )
+            if response.status_code == 200:
+                names = [s['nombre'] for s in response.json().get('resultados', [])]
+                self.root.after(0, lambda: self._on_suggestions_loaded(kind, typed, combo, names))
+        except Exception:
+            pass
+    
+    def _on_suggestions_loaded(self, kind, typed, combo, names):
+        """Show suggestions unless the user kept typing meanwhile."""
+        var = self.localidad_var if kind == "localidades" else self.provincia_var
+        if var.get() != typed:
+            return
+        combo['values'] = [""] + names if not typed.strip() else names
         
     def _create_map_panel(self, parent):
         """Create the map panel with OpenStreetMap."""
@@ -378,105 +449,260 @@ class ITVSearchApp:
         """Load all stations on startup."""
         threading.Thread(target=self._fetch_all_stations, daemon=True).start()
         
-    def _fetch_all_stations(self):
-        """Fetch all stations from API."""
-        try:
-            response = requests.get(
+    def _get_stations(self, params=None, etag=None, timeout=15):
+        """GET /estaciones following the pagination cursor until the last page.
+        
+        Args:
+            params: Search filters
+            etag: ETag of a previous download; the server answers 304 if nothing changed
+            
+        Returns:
+            (status_code, data, etag) where data merges every page
+        """
+        params = dict(params or {}, limit=self.PAGE_SIZE)
+        headers = {"If-None-Match": etag} if etag else {}
+        response = requests.get(
+            f"{self.API_BASE_URL}/estaciones",
+            params=params,
+            headers=headers,
+            timeout=timeout
+        )
+        if response.status_code != 200:
+            return response.status_code, None, None
+        
+        first_etag = response.headers.get("ETag")
+        data = response.json()
+        resultados = list(data.get('resultados', []))
+        cursor = data.get('siguiente_cursor')
+        while cursor:
+            page = requests.get(
                 f"{self.API_BASE_URL}/estaciones",
-                timeout=15
+                params=dict(params, cursor=cursor, count="none"),
+                timeout=timeout
             )
+            page.raise_for_status()
+            page_data = page.json()
+            resultados.extend(page_data.get('resultados', []))
+            cursor = page_data.get('siguiente_cursor')
+        
+        total = data.get('total')
+        return 200, {'total': total if total is not None else len(resultados), 'resultados': resultados}, first_etag
+    
+    def _get_all_stations(self):
+        """Download the compact marker payload, sending the stored ETag when there is local data.
+        
+        Returns:
+            (status_code, stations) where stations holds cod_estacion, latitud, longitud and tipo
+        """
+        headers = {"If-None-Match": self.stations_etag} if self.all_stations and self.stations_etag else {}
+        response = requests.get(
+            f"{self.API_BASE_URL}/estaciones/marcadores",
+            params={"formato": "binario"},
+            headers=headers,
+            timeout=15
+        )
+        if response.status_code != 200:
+            return response.status_code, None
+        self.stations_etag = response.headers.get("ETag")
+        return 200, self._decode_markers(response.content)
+    
+    def _decode_markers(self, body):
+        """Decode the binary marker payload (uint32 n, uint32 ids, float32 lat, float32 lon, uint8 tipo)."""
+        (count,) = struct.unpack_from("<I", body, 0)
+        offset = 4
+        ids = struct.unpack_from(f"<{count}I", body, offset)
+        offset += 4 * count
+        lats = struct.unpack_from(f"<{count}f", body, offset)
+        offset += 4 * count
+        lons = struct.unpack_from(f"<{count}f", body, offset)
+        offset += 4 * count
+        tipos = struct.unpack_from(f"<{count}B", body, offset)
+        return [
+            {
+                'cod_estacion': cod,
+                'latitud': lat,
+                'longitud': lon,
+                'tipo': self.MARKER_TIPOS[tipo] if tipo < len(self.MARKER_TIPOS) else "Otros",
+            }
+            for cod, lat, lon, tipo in zip(ids, lats, lons, tipos)
+        ]
+        
+    def _fetch_all_stations(self):
+        """Fetch all station markers from API."""
+        try:
+            status, stations = self._get_all_stations()
             
-            if response.status_code == 200:
-                data = response.json()
-                self.root.after(0, lambda: self._on_stations_loaded(data))
+            if status == 200:
+                self.root.after(0, lambda: self._on_stations_loaded(stations))
                 
         except Exception:
             pass  # Silently fail on startup
-            
-    def _on_stations_loaded(self, data):
-        """Handle loaded stations - populate dropdowns and map with all markers."""
-        self.all_stations = data.get('resultados', [])
-        
-        # Extract unique localidades and provincias for dropdowns
-        localidades_set = set()
-        provincias_set = set()
-        
-        for est in self.all_stations:
-            loc = est.get('localidad_nombre')
-            prov = est.get('provincia_nombre')
-            if loc:
-                localidades_set.add(loc)
-            if prov:
-                provincias_set.add(prov)
-        
-        self.all_localidades = [""] + sorted(list(localidades_set))
-        self.all_provincias = [""] + sorted(list(provincias_set))
         
-        # Update dropdowns
-        self.localidad_combo['values'] = self.all_localidades[:20]
-        self.provincia_combo['values'] = self.all_provincias
+        # Initial dropdown suggestions (most stations first)
+        self._fetch_suggestions("localidades", "", self.localidad_combo)
+        self._fetch_suggestions("provincias", "", self.provincia_combo)
+            
+    def _on_stations_loaded(self, stations):
+        """Handle loaded station markers - draw them on the map."""
+        self.all_stations = stations
+        self.stations_by_cod = {est.get('cod_estacion'): est for est in self.all_stations}
+        # Cached details may be outdated after a data change
+        self.station_details = {}
         
         # Clear old markers and create new ones for all stations
         self._clear_all_markers()
         self._create_all_markers()
         
-        # Display all stations in table (not filtered, so all markers stay red)
-        self._display_results(data, is_filtered=False)
+        # Details are listed only for search results
+        self._show_station_count()
+    
+    def _show_station_count(self):
+        """Empty the results table and show how many stations are on the map."""
+        self.results = []
+        for item in self.tree.get_children():
+            self.tree.delete(item)
+        self.results_label.configure(
+            text=f"Estaciones en el mapa: {len(self.all_stations)} (use los filtros para listarlas)"
+        )
     
     def _create_all_markers(self, highlight_ids=None):
-        """Create markers for all stations on the map.
+        """Draw highlighted stations individually and request clusters for the rest.
         
         Args:
             highlight_ids: Set of station IDs to highlight in orange. If None, all are red.
         """
-        highlight_ids = highlight_ids or set()
+        self.highlight_ids = highlight_ids or set()
         
-        # Helper function to create a marker
-        def create_marker(est, is_highlighted):
-            lat = est.get('latitud')
-            lon = est.get('longitud')
-            station_id = est.get('nombre')
-            
-            if not (lat and lon and station_id):
-                return
-            
-            # Store station data for later recreation
-            self.station_data[station_id] = est
-            
-            # Determine color
-            if is_highlighted:
-                color_circle = self.MARKER_COLOR_HIGHLIGHT[0]
-                color_outside = self.MARKER_COLOR_HIGHLIGHT[1]
-            else:
-                color_circle = self.MARKER_COLOR_NORMAL[0]
-                color_outside = self.MARKER_COLOR_NORMAL[1]
-            
-            # Create closure to capture est value
-            def make_click_handler(station):
-                def handler(marker):
-                    self._on_marker_click(station)
-                return handler
-            
-            marker = self.map_widget.set_marker(
-                lat, lon,
-                text="",
-                marker_color_circle=color_circle,
-                marker_color_outside=color_outside,
-                command=make_click_handler(est)
+        # Highlighted markers are always drawn one by one so search results stay visible
+        for est in self.all_stations:
+            station_id = est.get('cod_estacion')
+            if station_id in self.highlight_ids:
+                self._create_station_marker(est, is_highlighted=True)
+        
+        # The remaining stations come clustered for the current viewport
+        self._sync_viewport(force=True)
+    
+    def _create_station_marker(self, est, is_highlighted):
+        """Create the map marker of a single station."""
+        lat = est.get('latitud')
+        lon = est.get('longitud')
+        station_id = est.get('cod_estacion')
+        
+        if not (lat and lon) or station_id is None or station_id in self.all_markers:
+            return
+        
+        # Store station data for later recreation
+        self.station_data[station_id] = est
+        
+        # Determine color
+        if is_highlighted:
+            color_circle = self.MARKER_COLOR_HIGHLIGHT[0]
+            color_outside = self.MARKER_COLOR_HIGHLIGHT[1]
+        else:
+            color_circle = self.MARKER_COLOR_NORMAL[0]
+            color_outside = self.MARKER_COLOR_NORMAL[1]
+        
+        # Create closure to capture est value
+        def make_click_handler(station):
+            def handler(marker):
+                self._on_marker_click(station)
+            return handler
+        
+        marker = self.map_widget.set_marker(
+            lat, lon,
+            text="",
+            marker_color_circle=color_circle,
+            marker_color_outside=color_outside,
+            command=make_click_handler(est)
+        )
+        self.all_markers[station_id] = marker
+    
+    def _current_viewport(self):
+        """Return (zoom, bbox) of the visible map area, bbox as min_lon,min_lat,max_lon,max_lat."""
+        zoom = round(self.map_widget.zoom)
+        upper_left = self.map_widget.upper_left_tile_pos
+        lower_right = self.map_widget.lower_right_tile_pos
+        max_lat, min_lon = tkintermapview.osm_to_decimal(upper_left[0], upper_left[1], zoom)
+        min_lat, max_lon = tkintermapview.osm_to_decimal(lower_right[0], lower_right[1], zoom)
+        
+        # Clamp to valid coordinates and round so small jitters reuse the server cache
+        min_lon, max_lon = max(min_lon, -180.0), min(max_lon, 180.0)
+        min_lat, max_lat = max(min_lat, -90.0), min(max_lat, 90.0)
+        bbox = f"{min_lon:.3f},{min_lat:.3f},{max_lon:.3f},{max_lat:.3f}"
+        return zoom, bbox
+    
+    def _watch_viewport(self):
+        """Poll the map viewport and request new clusters when it changes."""
+        try:
+            self._sync_viewport()
+        finally:
+            self.root.after(self.VIEWPORT_POLL_MS, self._watch_viewport)
+    
+    def _sync_viewport(self, force=False):
+        """Request clusters for the current viewport if it changed (or if forced)."""
+        if not self.all_stations:
+            return
+        viewport = self._current_viewport()
+        if viewport == self._viewport and not force:
+            return
+        self._viewport = viewport
+        threading.Thread(target=self._fetch_clusters, args=(viewport,), daemon=True).start()
+    
+    def _fetch_clusters(self, viewport):
+        """Fetch clustered stations for a viewport from the API."""
+        zoom, bbox = viewport
+        try:
+            response = requests.get(
+                f"{self.API_BASE_URL}/estaciones/clusters",
+                params={"zoom": zoom, "bbox": bbox},
+                timeout=10
             )
-            self.all_markers[station_id] = marker
+            if response.status_code == 200:
+                data = response.json()
+                self.root.after(0, lambda: self._on_clusters_loaded(viewport, data))
+        except Exception:
+            pass
+    
+    def _on_clusters_loaded(self, viewport, data):
+        """Replace the non-highlighted markers with the clusters of the viewport."""
+        # A newer viewport was requested meanwhile: this answer is stale
+        if viewport != self._viewport:
+            return
         
-        # First pass: create non-highlighted markers (red) - these go on bottom
-        for est in self.all_stations:
-            station_id = est.get('nombre')
-            if station_id and station_id not in highlight_ids:
-                create_marker(est, is_highlighted=False)
+        for marker in self.cluster_markers:
+            marker.delete()
+        self.cluster_markers = []
+        for station_id in list(self.all_markers):
+            if station_id not in self.highlight_ids:
+                self.all_markers.pop(station_id).delete()
+        
+        zoom = viewport[0]
+        singles = [est.get('cod_estacion') for est in data.get('estaciones', [])]
+        for cluster in data.get('clusters', []):
+            if cluster.get('cod_estacion') is not None:
+                singles.append(cluster['cod_estacion'])
+            else:
+                self._create_cluster_marker(cluster, zoom)
         
-        # Second pass: create highlighted markers (orange) - these go on top
-        for est in self.all_stations:
-            station_id = est.get('nombre')
-            if station_id and station_id in highlight_ids:
-                create_marker(est, is_highlighted=True)
+        for cod in singles:
+            est = self.stations_by_cod.get(cod)
+            if est and cod not in self.highlight_ids:
+                self._create_station_marker(est, is_highlighted=False)
+    
+    def _create_cluster_marker(self, cluster, zoom):
+        """Create a marker for a group of stations; clicking it zooms in."""
+        def handler(marker):
+            self.map_widget.set_position(cluster['latitud'], cluster['longitud'])
+            self.map_widget.set_zoom(min(zoom + 2, 18))
+        
+        marker = self.map_widget.set_marker(
+            cluster['latitud'], cluster['longitud'],
+            text=str(cluster['total']),
+            marker_color_circle=self.MARKER_COLOR_CLUSTER[0],
+            marker_color_outside=self.MARKER_COLOR_CLUSTER[1],
+            command=handler
+        )
+        self.cluster_markers.append(marker)
     
     def _refresh_data(self):
         """Refresh all data from the API."""
@@ -486,23 +712,27 @@ class ITVSearchApp:
     def _fetch_and_refresh(self):
         """Fetch data and refresh the UI."""
         try:
-            response = requests.get(
-                f"{self.API_BASE_URL}/estaciones",
-                timeout=15
-            )
+            status, stations = self._get_all_stations()
             
-            if response.status_code == 200:
-                data = response.json()
-                self.root.after(0, lambda: self._on_refresh_complete(data))
+            if status == 200:
+                self.root.after(0, lambda: self._on_refresh_complete(stations))
+            elif status == 304:
+                # Data unchanged: keep current stations and markers
+                self.root.after(0, lambda: self._on_refresh_not_modified())
             else:
                 self.root.after(0, lambda: self._on_refresh_error())
                 
         except Exception:
             self.root.after(0, lambda: self._on_refresh_error())
     
-    def _on_refresh_complete(self, data):
+    def _on_refresh_complete(self, stations):
         """Handle refresh completion."""
-        self._on_stations_loaded(data)
+        self._on_stations_loaded(stations)
+        self.refresh_btn.configure(text="Refrescar", state="normal")
+        self._clear_search()
+    
+    def _on_refresh_not_modified(self):
+        """Handle refresh when the server reports no changes."""
         self.refresh_btn.configure(text="Refrescar", state="normal")
         self._clear_search()
     
@@ -512,6 +742,7 @@ class ITVSearchApp:
         
     def _clear_search(self):
         """Clear all search fields and show all stations."""
+        self.texto_var.set("")
         self.localidad_var.set("")
         self.codigo_postal_var.set("")
         self.provincia_var.set("")
@@ -520,9 +751,9 @@ class ITVSearchApp:
         # Reset all marker colors to normal (red)
         self._reset_marker_colors()
         
-        # Reload all stations in table (not filtered, so all markers stay red)
+        # Back to the unfiltered map (details are listed only for searches)
         if self.all_stations:
-            self._display_results({'resultados': self.all_stations, 'total': len(self.all_stations)}, is_filtered=False)
+            self._show_station_count()
             self._center_map_spain()
         
     def _perform_search(self):
@@ -532,6 +763,10 @@ class ITVSearchApp:
         # Build query parameters
         params = {}
         
+        texto = self.texto_var.get().strip()
+        if texto:
+            params['q'] = texto
+        
         localidad = self.localidad_var.get().strip()
         if localidad:
             params['localidad'] = localidad
@@ -557,17 +792,12 @@ class ITVSearchApp:
     def _api_search(self, params, has_filters):
         """Make API request for search."""
         try:
-            response = requests.get(
-                f"{self.API_BASE_URL}/estaciones",
-                params=params,
-                timeout=10
-            )
+            status, data, _ = self._get_stations(params, timeout=10)
             
-            if response.status_code == 200:
-                data = response.json()
+            if status == 200:
                 # Only highlight markers if actual filters were applied
                 self.root.after(0, lambda: self._display_results(data, is_filtered=has_filters))
-            elif response.status_code == 404:
+            elif status == 404:
                 self.root.after(0, lambda: self._display_no_results())
                 
         except Exception:
@@ -587,9 +817,11 @@ class ITVSearchApp:
         # Get IDs of search results
         self.search_result_ids = set()
         for est in self.results:
-            station_id = est.get('nombre')
-            if station_id:
+            station_id = est.get('cod_estacion')
+            if station_id is not None:
                 self.search_result_ids.add(station_id)
+                # Search results already carry every field
+                self.station_details[station_id] = est
         
         # Update results label
         self.results_label.configure(
@@ -608,7 +840,7 @@ class ITVSearchApp:
         
         # Add rows to table
         for est in self.results:
-            self.tree.insert("", END, values=(
+            self.tree.insert("", END, iid=str(est.get('cod_estacion')), values=(
                 est.get('nombre', 'N/A'),
                 est.get('tipo', 'N/A'),
                 est.get('direccion', 'N/A') or 'N/A',
@@ -653,6 +885,9 @@ class ITVSearchApp:
         for station_id, marker in self.all_markers.items():
             marker.delete()
         self.all_markers = {}
+        for marker in self.cluster_markers:
+            marker.delete()
+        self.cluster_markers = []
         
     def _center_map_spain(self):
         """Center the map on Spain."""
@@ -717,15 +952,11 @@ class ITVSearchApp:
         if not selection:
             return
             
-        item = self.tree.item(selection[0])
-        nombre = item['values'][0] if item['values'] else None
-        
-        if not nombre:
-            return
+        cod = int(selection[0])
             
         # Find the station and center map on it
         for est in self.results:
-            if est.get('nombre') == nombre:
+            if est.get('cod_estacion') == cod:
                 lat = est.get('latitud')
                 lon = est.get('longitud')
                 if lat and lon:
@@ -735,25 +966,39 @@ class ITVSearchApp:
     
     def _on_marker_click(self, station):
         """Handle marker click - show info popup and highlight row in table."""
-        nombre = station.get('nombre')
-        if not nombre:
+        cod = station.get('cod_estacion')
+        if cod is None:
             return
         
-        # Show info popup
-        self._show_info_popup(station)
+        # Markers only carry position and type: details are fetched on first click
+        details = self.station_details.get(cod)
+        if details is None:
+            threading.Thread(target=self._fetch_station_details, args=(cod,), daemon=True).start()
+            return
         
-        # Set flag to skip zoom when selecting in table
-        self._skip_zoom_on_select = True
+        # Show info popup
+        self._show_info_popup(details)
         
         # Find and select the corresponding row in the table
-        for item_id in self.tree.get_children():
-            item = self.tree.item(item_id)
-            if item['values'] and item['values'][0] == nombre:
-                # Select and scroll to the row
-                self.tree.selection_set(item_id)
-                self.tree.see(item_id)
-                self.tree.focus(item_id)
-                break
+        item_id = str(cod)
+        if self.tree.exists(item_id):
+            # Set flag to skip zoom when selecting in table
+            self._skip_zoom_on_select = True
+            # Select and scroll to the row
+            self.tree.selection_set(item_id)
+            self.tree.see(item_id)
+            self.tree.focus(item_id)
+    
+    def _fetch_station_details(self, cod):
+        """Fetch the full record of a station and show it."""
+        try:
+            response = requests.get(f"{self.API_BASE_URL}/estaciones/{cod}", timeout=10)
+            if response.status_code == 200:
+                details = response.json()
+                self.station_details[cod] = details
+                self.root.after(0, lambda: self._on_marker_click(details))
+        except Exception:
+            pass
     
     def _show_info_popup(self, station):
         """Show info popup for a station."""
@@ -1,6 +1,6 @@
 import ttkbootstrap as ttk
 from ttkbootstrap.constants import *
-from tkinter import BooleanVar, Text, DISABLED, NORMAL, END, messagebox
+from tkinter import BooleanVar, StringVar, Text, DISABLED, NORMAL, END, messagebox
 import requests
 import threading
 from typing import Dict
@@ -12,6 +12,9 @@ class ITVCargaApp(ttk.Frame):
         ("Catalunya", "cat"),
     ]
 
+    # Modos de carga aceptados por /load/run
+    MODOS = ["insertar", "upsert", "incremental", "recarga", "reemplazar"]
+
     LOAD_API_PORT = 8004
 
     def __init__(self, master=None, on_back=None, *args, **kwargs):
@@ -33,6 +36,7 @@ class ITVCargaApp(ttk.Frame):
         self.pack(fill=BOTH, expand=True)
         self.selected_fuentes = {key: BooleanVar(value=False) for _, key in self.FUENTES}
         self.select_all_var = BooleanVar(value=False)
+        self.modo_var = StringVar(value="insertar")
         self._build_ui()
 
     def _build_ui(self):
@@ -75,6 +79,11 @@ class ITVCargaApp(ttk.Frame):
                 fuente_frame, text=label, variable=self.selected_fuentes[key],
                 command=self._update_select_all, bootstyle="checkbox"
             ).grid(row=i, column=0, sticky=W, columnspan=2, pady=2)
+        ttk.Label(fuente_frame, text="Modo de carga:").grid(row=len(self.FUENTES) + 2, column=0, sticky=W, pady=(10, 2))
+        ttk.Combobox(
+            fuente_frame, textvariable=self.modo_var, values=self.MODOS,
+            state="readonly", width=12, bootstyle="warning"
+        ).grid(row=len(self.FUENTES) + 2, column=1, sticky=W, padx=(5, 0), pady=(10, 2))
 
         # Botones (centrados)
         btn_frame = ttk.Frame(main, style="TFrame")
@@ -101,6 +110,7 @@ class ITVCargaApp(ttk.Frame):
 
     def _reset(self):
         self.select_all_var.set(False)
+        self.modo_var.set("insertar")
         for var in self.selected_fuentes.values():
             var.set(False)
         self._set_resultados("")
@@ -127,7 +137,10 @@ class ITVCargaApp(ttk.Frame):
         try:
             self._agregar_resultado(f"\n▶ Ejecutando carga para: {', '.join(f.upper() for f in fuentes)}")
             url = f"http://localhost:{self.LOAD_API_PORT}/load/run"
-            payload = {"fuentes": fuentes}
+            payload = {
+                "fuentes": fuentes,
+                "modo": self.modo_var.get(),
+            }
             response = requests.post(url, json=payload, timeout=120)
             response.raise_for_status()
             data = response.json()
@@ -158,6 +171,17 @@ class ITVCargaApp(ttk.Frame):
     def _mostrar_resumen_carga(self, data: Dict):
         total_insertados = data.get("total_insertados", 0)
         self._agregar_resultado(f"\nNúmero de registros cargados correctamente: {total_insertados}")
+        if self.modo_var.get() == "recarga" and not data.get("recarga_aplicada"):
+            self._agregar_resultado("Recarga NO publicada: alguna fuente no aportó estaciones, se mantienen los datos anteriores")
+        if self.modo_var.get() != "insertar":
+            self._agregar_resultado(
+                f"Registros actualizados: {data.get('total_actualizados', 0)}, "
+                f"sin cambios: {data.get('total_sin_cambios', 0)}, "
+                f"eliminados: {data.get('total_eliminados', 0)}"
+            )
+            omitidas = [d.get("fuente", "-").upper() for d in data.get("detalles", []) if d.get("omitida")]
+            if omitidas:
+                self._agregar_resultado(f"Fuentes sin cambios omitidas: {', '.join(omitidas)}")
 
         self._agregar_resultado("\nRegistros con errores y reparados:")
         reparados = data.get("reparados", []) or []
@@ -1,7 +1,33 @@
+import hashlib
+import json
+
+from sqlalchemy import String, delete, exists, insert, select, text, type_coerce, update
 from sqlalchemy.orm import Session
 
-from src.database.models import TipoEstacion, Provincia, Localidad, Estacion
-from src.database.session import get_db
+from src.database.models import (
+    Base,
+    TipoEstacion,
+    Provincia,
+    Localidad,
+    Estacion,
+    HuellaRegistro,
+    ProvinciaStaging,
+    LocalidadStaging,
+    EstacionStaging,
+    EstacionBusqueda,
+    GeneracionDatos,
+    TIPO_CODIGOS,
+)
+from src.database.session import engine, get_db
+from src.common.search_keys import encode_geohash, normalize_postal_code, normalize_search_text
+from src.common.fingerprints import RECORD_KEY_FIELD
+
+# Pares (tabla real, tabla de staging) en orden de dependencia
+STAGING_PAIRS = (
+    (Provincia, ProvinciaStaging),
+    (Localidad, LocalidadStaging),
+    (Estacion, EstacionStaging),
+)
 
 def _map_tipo_enum(tipo: str | TipoEstacion) -> TipoEstacion:
     if isinstance(tipo, TipoEstacion):
@@ -22,10 +48,49 @@ def _safe_int(value) -> int | None:
     except (TypeError, ValueError):
         return None
 
-def save_stations(stations_data: list[dict], source_tag: str) -> dict:
+# Campos de Estacion que forman la huella de contenido (orden fijo)
+HASHED_FIELDS = (
+    "nombre",
+    "tipo",
+    "codigo_localidad",
+    "origen_datos",
+    "direccion",
+    "codigo_postal",
+    "latitud",
+    "longitud",
+    "horario",
+    "contacto",
+    "url",
+)
+
+
+def _content_hash(values: dict) -> str:
+    """Huella SHA-256 de los campos normalizados de una estación."""
+    normalized = []
+    for field in HASHED_FIELDS:
+        value = values.get(field)
+        if isinstance(value, TipoEstacion):
+            value = value.value
+        elif isinstance(value, str):
+            value = value.strip()
+        normalized.append(value)
+    payload = json.dumps(normalized, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def save_stations(
+    stations_data: list[dict],
+    source_tag: str,
+    upsert: bool = False,
+    staging: bool = False,
+    replace: bool = False,
+) -> dict:
     """
     Guarda estaciones en la BD.
     Asume que los datos en stations_data ya han sido validados previamente.
+    Si upsert es True, las estaciones ya existentes se actualizan solo cuando
+    su huella de contenido ha cambiado (stats "updated" / "unchanged");
+    en caso contrario se cuentan como duplicadas y no se modifican.
     Campos esperados:
       - nombre
       - p_nombre (Provincia) - opcional si no es fija, pero recomendado
@@ -33,18 +98,38 @@ def save_stations(stations_data: list[dict], source_tag: str) -> dict:
       - l_nombre (Localidad) - opcional
       - tipo
       - direccion, codigo_postal, latitud, longitud, horario, contacto, url
+    Con staging=True se escribe en las tablas de staging en lugar de las reales.
+    Con replace=True se sustituye la partición del origen en la misma transacción:
+    se borran sus estaciones antes de insertar y al final las localidades y
+    provincias que hayan quedado huérfanas.
+    Los registros marcados con su clave de origen (cargas incrementales) se
+    devuelven en stats["station_codes"] como {clave: cod_estacion}.
     """
+    if staging:
+        prov_model, loc_model, est_model = ProvinciaStaging, LocalidadStaging, EstacionStaging
+    else:
+        prov_model, loc_model, est_model = Provincia, Localidad, Estacion
+
     stats = {
         "processed": 0,
         "inserted": 0,
         "duplicates": 0,
-        "errors": []
+        "updated": 0,
+        "unchanged": 0,
+        "deleted": 0,
+        "errors": [],
+        "station_codes": {},
     }
 
     with next(get_db()) as session:
+        if replace:
+            stats["deleted"] = _delete_source_stations(session, source_tag)
+
         prov_cache = {}
         loc_cache = {}
         est_cache = {}
+        # (clave de origen, estación) para devolver el cod_estacion de cada registro
+        keyed = []
 
         for data in stations_data:
             stats["processed"] += 1
@@ -71,16 +156,16 @@ def save_stations(stations_data: list[dict], source_tag: str) -> dict:
                     prov = prov_cache[p_norm]
                 else:
                     # Intentar buscar
-                    query = session.query(Provincia)
+                    query = session.query(prov_model)
                     if p_cod:
                         prov = query.filter_by(codigo=p_cod).first()
                     if not prov:
-                        prov = query.filter(Provincia.nombre.ilike(p_nombre)).first()
+                        prov = query.filter(prov_model.nombre.ilike(p_nombre)).first()
                     
                     if not prov:
                         # Crear
                         prov_final_name = p_nombre.strip().capitalize()
-                        prov = Provincia(nombre=prov_final_name, codigo=p_cod)
+                        prov = prov_model(nombre=prov_final_name, codigo=p_cod)
                         session.add(prov)
                         session.flush()
                     
@@ -94,14 +179,14 @@ def save_stations(stations_data: list[dict], source_tag: str) -> dict:
                 if loc_key in loc_cache:
                     loc = loc_cache[loc_key]
                 else:
-                    loc = session.query(Localidad).filter(
-                        Localidad.nombre.ilike(l_nombre), 
-                        Localidad.codigo_provincia == prov.codigo
+                    loc = session.query(loc_model).filter(
+                        loc_model.nombre.ilike(l_nombre), 
+                        loc_model.codigo_provincia == prov.codigo
                     ).first()
                     
                     if not loc:
                         loc_final_name = l_nombre.strip().capitalize() # Normalización simple
-                        loc = Localidad(nombre=loc_final_name, codigo_provincia=prov.codigo)
+                        loc = loc_model(nombre=loc_final_name, codigo_provincia=prov.codigo)
                         session.add(loc)
                         session.flush()
                     loc_cache[loc_key] = loc
@@ -110,39 +195,319 @@ def save_stations(stations_data: list[dict], source_tag: str) -> dict:
             loc_cod = loc.codigo if loc else None
             est_key = (nombre, loc_cod)
             
+            record_key = data.get(RECORD_KEY_FIELD)
             if est_key in est_cache:
+                if record_key:
+                    keyed.append((record_key, est_cache[est_key]))
                 stats["duplicates"] += 1
                 continue
             
+            values = {
+                "nombre": nombre,
+                "tipo": _map_tipo_enum(data.get("tipo")),
+                "codigo_localidad": loc_cod,
+                "origen_datos": source_tag,
+                "direccion": data.get("direccion"),
+                "codigo_postal": normalize_postal_code(data.get("codigo_postal")),
+                "latitud": data.get("latitud"),
+                "longitud": data.get("longitud"),
+                "horario": data.get("horario"),
+                "contacto": data.get("contacto"),
+                "url": data.get("url"),
+            }
+            content_hash = _content_hash(values)
+
             # Check DB
-            query_est = session.query(Estacion).filter_by(nombre=nombre)
+            query_est = session.query(est_model).filter_by(nombre=nombre)
             if loc_cod is not None:
                 query_est = query_est.filter_by(codigo_localidad=loc_cod)
             else:
-                query_est = query_est.filter(Estacion.codigo_localidad.is_(None))
+                query_est = query_est.filter(est_model.codigo_localidad.is_(None))
                 
             est = query_est.first()
             if est:
                 est_cache[est_key] = est
-                stats["duplicates"] += 1
+                if record_key:
+                    keyed.append((record_key, est))
+                if not upsert:
+                    stats["duplicates"] += 1
+                elif est.hash_contenido == content_hash:
+                    stats["unchanged"] += 1
+                else:
+                    # Solo se reescriben las filas cuyo contenido ha cambiado
+                    for field, value in values.items():
+                        setattr(est, field, value)
+                    est.hash_contenido = content_hash
+                    stats["updated"] += 1
                 continue
 
-            estacion = Estacion(
-                nombre=nombre,
-                tipo=_map_tipo_enum(data.get("tipo")),
-                codigo_localidad=loc_cod,
-                origen_datos=source_tag,
-                direccion=data.get("direccion"),
-                codigo_postal=_safe_int(data.get("codigo_postal")),
-                latitud=data.get("latitud"),
-                longitud=data.get("longitud"),
-                horario=data.get("horario"),
-                contacto=data.get("contacto"),
-                url=data.get("url")
-            )
+            estacion = est_model(**values, hash_contenido=content_hash)
             session.add(estacion)
             est_cache[est_key] = estacion
+            if record_key:
+                keyed.append((record_key, estacion))
             stats["inserted"] += 1
 
+        if keyed:
+            # Las estaciones nuevas necesitan su cod_estacion antes del commit
+            session.flush()
+            stats["station_codes"] = {key: est.cod_estacion for key, est in keyed}
+
+        if replace:
+            # Las estaciones nuevas deben estar en la BD antes de buscar huérfanas
+            session.flush()
+            delete_orphan_locations(session)
         session.commit()
     return stats
+
+
+def _delete_source_stations(session: Session, source_tag: str) -> int:
+    estaciones = Estacion.__table__
+    deleted = session.execute(
+        delete(estaciones).where(estaciones.c.origen_datos == source_tag)
+    ).rowcount
+    # Las huellas del origen dejan de describir lo almacenado
+    huellas = HuellaRegistro.__table__
+    session.execute(delete(huellas).where(huellas.c.origen_datos == source_tag))
+    return deleted
+
+
+def delete_orphan_locations(session: Session) -> dict:
+    """Borra en bloque las localidades sin estaciones y las provincias sin localidades."""
+    estaciones = Estacion.__table__
+    localidades = Localidad.__table__
+    provincias = Provincia.__table__
+    localidades_count = session.execute(
+        delete(localidades).where(
+            ~exists().where(estaciones.c.codigo_localidad == localidades.c.codigo)
+        )
+    ).rowcount
+    provincias_count = session.execute(
+        delete(provincias).where(
+            ~exists().where(localidades.c.codigo_provincia == provincias.c.codigo)
+        )
+    ).rowcount
+    return {"localidades": localidades_count, "provincias": provincias_count}
+
+
+def delete_source_rows(session: Session, source_tag: str) -> dict:
+    """
+    Borra la partición de un origen (origen_datos) y las localidades y provincias
+    que queden huérfanas. No hace commit.
+    """
+    estaciones_count = _delete_source_stations(session, source_tag)
+    return {"estaciones": estaciones_count, **delete_orphan_locations(session)}
+
+
+def delete_stations(source_tag: str, codigos: list[int]) -> int:
+    """
+    Elimina las estaciones de un origen por cod_estacion.
+    Se usa en las cargas incrementales para los registros que han desaparecido del origen.
+    """
+    if not codigos:
+        return 0
+    with next(get_db()) as session:
+        deleted = session.query(Estacion).filter(
+            Estacion.origen_datos == source_tag,
+            Estacion.cod_estacion.in_(codigos),
+        ).delete(synchronize_session=False)
+        delete_orphan_locations(session)
+        session.commit()
+    return deleted
+
+
+def unique_station_codes(source_tag: str, nombres: list[str]) -> dict[str, int]:
+    """
+    {nombre: cod_estacion} de los nombres que identifican una sola estación del
+    origen. Resuelve huellas guardadas antes de registrar el cod_estacion; un
+    nombre repetido en varias localidades no se resuelve.
+    """
+    if not nombres:
+        return {}
+    with next(get_db()) as session:
+        rows = session.query(Estacion.nombre, Estacion.cod_estacion).filter(
+            Estacion.origen_datos == source_tag,
+            Estacion.nombre.in_(nombres),
+        ).all()
+    codes: dict[str, list[int]] = {}
+    for nombre, cod in rows:
+        codes.setdefault(nombre, []).append(cod)
+    return {nombre: cods[0] for nombre, cods in codes.items() if len(cods) == 1}
+
+
+def prepare_staging_tables() -> None:
+    """Crea (si no existen) y vacía las tablas de staging antes de una recarga."""
+    Base.metadata.create_all(bind=engine, tables=[staging.__table__ for _, staging in STAGING_PAIRS])
+    with next(get_db()) as session:
+        for _, staging in reversed(STAGING_PAIRS):
+            session.query(staging).delete(synchronize_session=False)
+        session.commit()
+
+
+def swap_staging_tables() -> dict:
+    """
+    Sustituye el contenido de las tablas reales por el de staging en una única
+    transacción. Las lecturas concurrentes siguen viendo el conjunto anterior
+    completo hasta el commit. Devuelve el número de filas volcadas por tabla.
+    """
+    counts = {}
+    with next(get_db()) as session:
+        # Las huellas describen el contenido anterior, una recarga completa las invalida
+        session.query(HuellaRegistro).delete(synchronize_session=False)
+        for live, _ in reversed(STAGING_PAIRS):
+            session.query(live).delete(synchronize_session=False)
+        for live, staging in STAGING_PAIRS:
+            columns = [column.name for column in live.__table__.columns]
+            session.execute(
+                insert(live.__table__).from_select(
+                    columns,
+                    select(*[staging.__table__.c[name] for name in columns]),
+                )
+            )
+            counts[live.__tablename__] = session.query(live).count()
+
+        if session.bind.dialect.name == "postgresql":
+            # Los IDs se copian tal cual: se ajustan las secuencias para futuras inserciones
+            for live, _ in STAGING_PAIRS:
+                table = live.__tablename__
+                pk = live.__table__.primary_key.columns.values()[0].name
+                session.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', '{pk}'), "
+                    f"COALESCE((SELECT MAX({pk}) FROM {table}), 0) + 1, false)"
+                ))
+        session.commit()
+    return counts
+
+
+def _search_rows(session: Session):
+    """Estaciones reales con localidad y provincia resueltas, en la forma de estaciones_busqueda."""
+    return session.execute(
+        select(
+            Estacion.cod_estacion,
+            Estacion.nombre,
+            type_coerce(Estacion.tipo, String).label("tipo"),
+            Estacion.direccion,
+            Estacion.codigo_postal,
+            Estacion.latitud,
+            Estacion.longitud,
+            Estacion.descripcion,
+            Estacion.horario,
+            Estacion.contacto,
+            Estacion.url,
+            Estacion.codigo_localidad,
+            Estacion.origen_datos,
+            Localidad.nombre.label("localidad_nombre"),
+            Localidad.codigo_provincia,
+            Provincia.nombre.label("provincia_nombre"),
+            Estacion.hash_contenido,
+        )
+        .select_from(Estacion)
+        .outerjoin(Localidad, Estacion.codigo_localidad == Localidad.codigo)
+        .outerjoin(Provincia, Localidad.codigo_provincia == Provincia.codigo)
+    ).mappings().all()
+
+
+def _search_signature(row) -> tuple | None:
+    # Sin hash no se puede saber si la estación ha cambiado: se reescribe siempre
+    if row["hash_contenido"] is None:
+        return None
+    return (row["hash_contenido"], row["localidad_nombre"], row["codigo_provincia"], row["provincia_nombre"])
+
+
+def refresh_search_table() -> dict:
+    """
+    Sincroniza la tabla de lectura estaciones_busqueda con las tablas reales.
+    Solo se reescriben las estaciones nuevas o cuyo contenido, localidad o
+    provincia han cambiado, y se borran las que ya no existen. Se llama al
+    terminar cada carga o borrado, antes de incrementar la generación.
+    """
+    with next(get_db()) as session:
+        current = {
+            row["cod_estacion"]: _search_signature(row)
+            for row in session.execute(
+                select(
+                    EstacionBusqueda.cod_estacion,
+                    EstacionBusqueda.hash_contenido,
+                    EstacionBusqueda.localidad_nombre,
+                    EstacionBusqueda.codigo_provincia,
+                    EstacionBusqueda.provincia_nombre,
+                )
+            ).mappings()
+        }
+        source = _search_rows(session)
+
+        changed = []
+        for row in source:
+            signature = _search_signature(row)
+            if signature is None or current.get(row["cod_estacion"], ()) != signature:
+                changed.append(row)
+        seen = {row["cod_estacion"] for row in source}
+        removed = [cod for cod in current if cod not in seen]
+
+        stale = removed + [row["cod_estacion"] for row in changed if row["cod_estacion"] in current]
+        if stale:
+            session.execute(delete(EstacionBusqueda).where(EstacionBusqueda.cod_estacion.in_(stale)))
+        if changed:
+            session.execute(insert(EstacionBusqueda), [_search_values(row) for row in changed])
+        session.commit()
+
+    return {
+        "insertadas": sum(1 for row in changed if row["cod_estacion"] not in current),
+        "actualizadas": sum(1 for row in changed if row["cod_estacion"] in current),
+        "eliminadas": len(removed),
+    }
+
+
+def _search_values(row) -> dict:
+    values = dict(row)
+    # Filas guardadas antes de normalizar el código postal (sin ceros a la izquierda)
+    values["codigo_postal"] = normalize_postal_code(values["codigo_postal"])
+    values["codigo_tipo"] = TIPO_CODIGOS.get(values["tipo"], TIPO_CODIGOS[TipoEstacion.Otros.value])
+    localidad = values["localidad_nombre"]
+    provincia = values["provincia_nombre"]
+    values["localidad_clave"] = normalize_search_text(localidad) if localidad else None
+    values["provincia_clave"] = normalize_search_text(provincia) if provincia else None
+    has_position = values["latitud"] is not None and values["longitud"] is not None
+    values["geohash"] = encode_geohash(values["latitud"], values["longitud"]) if has_position else None
+    return values
+
+
+def read_data_generation(session: Session) -> int:
+    """Generación de datos actual (0 si todavía no se ha cargado nada)."""
+    return session.execute(
+        select(GeneracionDatos.generacion).where(GeneracionDatos.id == 1)
+    ).scalar_one_or_none() or 0
+
+
+def bump_data_generation() -> int:
+    """
+    Incrementa la generación de datos tras una escritura confirmada.
+    Se llama después del commit de los datos para que ningún lector asocie
+    la nueva generación a datos anteriores. Devuelve la nueva generación.
+    """
+    with next(get_db()) as session:
+        updated = session.execute(
+            update(GeneracionDatos)
+            .where(GeneracionDatos.id == 1)
+            .values(generacion=GeneracionDatos.generacion + 1)
+        ).rowcount
+        if not updated:
+            session.add(GeneracionDatos(id=1, generacion=1))
+        session.commit()
+        return read_data_generation(session)
+
+
+def backfill_search_table() -> bool:
+    """
+    Rellena estaciones_busqueda al arrancar si está vacía pero ya hay
+    estaciones (BD cargada antes de existir la tabla de lectura) y publica una
+    nueva generación. Devuelve True si la ha rellenado.
+    """
+    with next(get_db()) as session:
+        if session.execute(select(EstacionBusqueda.cod_estacion).limit(1)).first() is not None:
+            return False
+        if session.execute(select(Estacion.cod_estacion).limit(1)).first() is None:
+            return False
+    refresh_search_table()
+    bump_data_generation()
+    return True
@@ -0,0 +1,117 @@
+# src/common/fingerprints.py
+"""
+Huellas de los registros originales para cargas incrementales.
+Cada registro crudo se agrupa por la misma clave que usa su extractor para
+detectar duplicados, y cada grupo se resume en un hash SHA-256. Comparando
+con las huellas de la última carga correcta se sabe qué registros son
+nuevos, cuáles han cambiado y cuáles han desaparecido del origen.
+"""
+import hashlib
+import json
+
+from src.database.models import HuellaRegistro
+from src.database.session import get_db
+
+# Campo auxiliar que los extractores copian del registro crudo al transformado
+RECORD_KEY_FIELD = "_clave_origen"
+
+# Campo del registro crudo que identifica la estación en cada origen
+SOURCE_KEY_FIELDS = {
+    "gal": "NOME DA ESTACIÓN",
+    "cat": "denominaci",
+    "cv": "Nº ESTACIÓN",
+}
+
+# Metadatos del origen que cambian sin que cambie la estación
+VOLATILE_FIELDS = {"_position", RECORD_KEY_FIELD}
+
+
+def _record_hash(record: dict) -> str:
+    stable = {k: v for k, v in record.items() if k not in VOLATILE_FIELDS}
+    payload = json.dumps(stable, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _record_key(record: dict, source_tag: str, record_hash: str) -> str:
+    value = record.get(SOURCE_KEY_FIELDS[source_tag])
+    key = str(value).strip().lower() if value is not None else ""
+    # Sin clave no se puede seguir el registro entre cargas: se identifica por su contenido
+    return key or f"_sin_clave_{record_hash}"
+
+
+def group_records(records: list[dict], source_tag: str) -> dict[str, tuple[str, list[dict]]]:
+    """
+    Agrupa los registros crudos por clave de origen.
+    Devuelve {clave: (hash_del_grupo, registros)}.
+    """
+    hashes: dict[str, list[str]] = {}
+    groups: dict[str, list[dict]] = {}
+    for record in records:
+        record_hash = _record_hash(record)
+        key = _record_key(record, source_tag, record_hash)
+        hashes.setdefault(key, []).append(record_hash)
+        groups.setdefault(key, []).append(record)
+
+    result = {}
+    for key, group in groups.items():
+        group_hash = hashlib.sha256("".join(hashes[key]).encode("ascii")).hexdigest()
+        result[key] = (group_hash, group)
+    return result
+
+
+def tag_records(groups: dict[str, tuple[str, list[dict]]], keys) -> list[dict]:
+    """Devuelve copias de los registros de las claves indicadas marcadas con su clave."""
+    tagged = []
+    for key in keys:
+        for record in groups[key][1]:
+            tagged.append({**record, RECORD_KEY_FIELD: key})
+    return tagged
+
+
+def diff_fingerprints(
+    groups: dict[str, tuple[str, list[dict]]],
+    previous: dict[str, tuple[str, str | None, int | None]],
+) -> tuple[list[str], list[str]]:
+    """
+    Compara los grupos actuales con las huellas anteriores.
+    Devuelve (claves_nuevas_o_modificadas, claves_eliminadas).
+    """
+    changed = [key for key, (group_hash, _) in groups.items()
+               if key not in previous or previous[key][0] != group_hash]
+    deleted = [key for key in previous if key not in groups]
+    return changed, deleted
+
+
+def load_fingerprints(source_tag: str) -> dict[str, tuple[str, str | None, int | None]]:
+    """Huellas de la última carga correcta: {clave: (hash, nombre_estacion, cod_estacion)}."""
+    with next(get_db()) as session:
+        rows = session.query(
+            HuellaRegistro.clave,
+            HuellaRegistro.hash_contenido,
+            HuellaRegistro.nombre_estacion,
+            HuellaRegistro.cod_estacion,
+        ).filter(HuellaRegistro.origen_datos == source_tag).all()
+    return {clave: (hash_contenido, nombre, cod) for clave, hash_contenido, nombre, cod in rows}
+
+
+def save_fingerprints(
+    source_tag: str,
+    updated: dict[str, tuple[str, str | None, int | None]],
+    deleted: list[str],
+) -> None:
+    """Guarda las huellas nuevas o modificadas y elimina las de registros desaparecidos."""
+    with next(get_db()) as session:
+        if deleted:
+            session.query(HuellaRegistro).filter(
+                HuellaRegistro.origen_datos == source_tag,
+                HuellaRegistro.clave.in_(deleted),
+            ).delete(synchronize_session=False)
+        for key, (group_hash, nombre, cod_estacion) in updated.items():
+            session.merge(HuellaRegistro(
+                origen_datos=source_tag,
+                clave=key,
+                hash_contenido=group_hash,
+                nombre_estacion=nombre,
+                cod_estacion=cod_estacion,
+            ))
+        session.commit()
@@ -0,0 +1,58 @@
+# src/common/search_keys.py
+"""
+Claves derivadas que se guardan en la tabla de lectura estaciones_busqueda:
+nombres normalizados para buscar sin mayúsculas ni tildes, códigos postales
+de 5 cifras y geohash de las coordenadas.
+"""
+import unicodedata
+
+_GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+GEOHASH_PRECISION = 9
+POSTAL_CODE_LENGTH = 5
+
+
+def normalize_search_text(value: str) -> str:
+    """Minúsculas y sin tildes ni diéresis ("Castellón" -> "castellon")."""
+    decomposed = unicodedata.normalize("NFKD", value.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def normalize_postal_code(value) -> str | None:
+    """
+    Código postal como texto de 5 cifras con ceros a la izquierda
+    (8001 -> "08001"). Con el ancho fijo el orden del texto coincide con el
+    numérico y los prefijos y rangos se resuelven con el índice.
+    """
+    if value is None:
+        return None
+    text = str(value).strip()
+    if not text.isdigit() or len(text) > POSTAL_CODE_LENGTH:
+        return None
+    return text.zfill(POSTAL_CODE_LENGTH)
+
+
+def encode_geohash(lat: float, lon: float, precision: int = GEOHASH_PRECISION) -> str:
+    """Geohash de un punto (precisión 9 = celdas de unos 5 m)."""
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        # Los bits alternan longitud y latitud, empezando por la longitud
+        interval, coord = (lon_range, lon) if even else (lat_range, lat)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coord >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_GEOHASH_ALPHABET[value])
+            bits = 0
+            value = 0
+    return "".join(chars)
@@ -0,0 +1,34 @@
+# src/database/async_session.py
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from .settings import DATABASE_URL, ASYNC_DATABASE_URL
+from .session import engine_options
+
+# Drivers asíncronos por backend
+ASYNC_DRIVERS = {
+    "postgresql": "asyncpg",
+    "sqlite": "aiosqlite",
+}
+
+
+def _async_url(url: str) -> str:
+    """Convierte la URL síncrona (psycopg2/pysqlite) en su equivalente asíncrona."""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    driver = ASYNC_DRIVERS.get(backend)
+    if driver is None:
+        raise ValueError(f"No hay driver asíncrono configurado para '{backend}'")
+    return parsed.set(drivername=f"{backend}+{driver}").render_as_string(hide_password=False)
+
+
+_url = ASYNC_DATABASE_URL or _async_url(DATABASE_URL)
+
+async_engine = create_async_engine(_url, **engine_options(_url))
+
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# Obtener sesión asíncrona de la base de datos (API de búsqueda)
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
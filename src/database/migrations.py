@@ -0,0 +1,96 @@
+# src/database/migrations.py
+"""
+Puesta al día del esquema de una base de datos ya desplegada.
+
+create_all solo crea las tablas que faltan (estaciones_busqueda,
+huellas_registros, generacion_datos y las de staging en una BD anterior a
+ellas), pero no toca las existentes: las columnas e índices añadidos después
+a tablas ya creadas se aplican aquí con ALTER TABLE / CREATE INDEX. En
+Postgres se crean además los índices de trigramas de la búsqueda por nombre.
+Los datos guardados con un formato anterior se corrigen también aquí
+(códigos postales de 4 cifras).
+
+Todos los pasos son idempotentes; las APIs lo ejecutan al arrancar y también
+puede lanzarse a mano con `python -m src.database.migrations`.
+"""
+import logging
+
+from sqlalchemy import func, inspect, select, update
+
+from src.common.search_keys import POSTAL_CODE_LENGTH, normalize_postal_code
+from .models import Base, Estacion, EstacionStaging, HuellaRegistro
+from .session import SEARCH_INDEX_DDL, engine
+
+logger = logging.getLogger(__name__)
+
+# Columnas añadidas a tablas que ya existían en despliegues anteriores.
+# Todas admiten NULL, así que se pueden añadir sin valor por defecto
+ADDED_COLUMNS = (
+    Estacion.__table__.c.hash_contenido,
+    EstacionStaging.__table__.c.hash_contenido,
+    HuellaRegistro.__table__.c.cod_estacion,
+)
+
+
+def _pad_postal_codes(conn) -> int:
+    """
+    Completa con ceros a la izquierda los códigos postales guardados antes de
+    normalizarlos ("8001" -> "08001"), como hace ya la carga. Devuelve las filas
+    actualizadas.
+    """
+    column = Estacion.__table__.c.codigo_postal
+    short = conn.execute(
+        select(column).distinct().where(func.length(column) < POSTAL_CODE_LENGTH)
+    ).scalars().all()
+    padded = 0
+    for value in short:
+        normalized = normalize_postal_code(value)
+        if normalized is not None and normalized != value:
+            padded += conn.execute(
+                update(Estacion.__table__).where(column == value).values(codigo_postal=normalized)
+            ).rowcount
+    return padded
+
+
+def upgrade_schema(bind=engine) -> list[str]:
+    """Crea tablas, columnas e índices que falten. Devuelve los cambios aplicados."""
+    Base.metadata.create_all(bind=bind)
+
+    applied = []
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        for column in ADDED_COLUMNS:
+            table = column.table
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            if column.name in existing:
+                continue
+            column_type = column.type.compile(dialect=bind.dialect)
+            conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}")
+            applied.append(f"{table.name}.{column.name}")
+
+        # Índices declarados en los modelos sobre tablas que ya existían
+        for table in Base.metadata.sorted_tables:
+            existing = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in existing:
+                    index.create(bind=conn)
+                    applied.append(index.name)
+
+        padded = _pad_postal_codes(conn)
+        if padded:
+            applied.append(f"estaciones.codigo_postal ({padded} filas con 5 cifras)")
+
+        if bind.dialect.name == "postgresql":
+            # pg_trgm y los índices GIN no se declaran en los modelos (IF NOT EXISTS)
+            for statement in SEARCH_INDEX_DDL:
+                conn.exec_driver_sql(statement)
+
+    for change in applied:
+        logger.info("Esquema actualizado: %s", change)
+    return applied
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    cambios = upgrade_schema()
+    print(f"Esquema al día ({len(cambios)} cambios aplicados)")
@@ -1,6 +1,6 @@
 # src/database/models.py
-from sqlalchemy import Column, Integer, String, Float, Enum, ForeignKey
-from sqlalchemy.orm import declarative_base, relationship
+from sqlalchemy import Column, Integer, SmallInteger, String, Float, Enum, ForeignKey
+from sqlalchemy.orm import declarative_base, declared_attr, relationship
 from sqlalchemy_utils import ChoiceType
 import enum
 
@@ -12,45 +12,41 @@ class TipoEstacion(enum.Enum):
     Otros = "Otros"
 
 
-class Provincia(Base):
-    __tablename__ = 'provincias'
+# Código numérico de cada tipo en la tabla de lectura (filtro por igualdad indexado)
+TIPO_CODIGOS = {tipo.value: codigo for codigo, tipo in enumerate(TipoEstacion)}
 
+# Columnas compartidas por las tablas reales y sus tablas de staging (recarga atómica)
+class ProvinciaColumns:
     codigo = Column(Integer, primary_key=True, index=True)
     nombre = Column(String, nullable=False)
 
-    # Relación con Localidades (1 Provincia tiene 1 o más Localidades)
-    localidades = relationship("Localidad", back_populates="provincia", lazy="joined")
-
     def __repr__(self):
         return f"<Provincia(codigo='{self.codigo}', nombre='{self.nombre}')>"
 
 
-
-class Localidad(Base):
-    __tablename__ = 'localidades'
+class LocalidadColumns:
+    __provincias_table__ = 'provincias'
 
     codigo = Column(Integer, primary_key=True, index=True, autoincrement=True)
     nombre = Column(String, nullable=False)
 
-    # Relación con Provincia (N localidades a 1 Provincia)
-    codigo_provincia = Column(Integer, ForeignKey('provincias.codigo'), nullable=False)
-    provincia = relationship("Provincia", back_populates="localidades", lazy="joined")
-
-    # Relación con Estaciones (1 Localidad tiene 0 o más Estaciones)
-    estaciones = relationship("Estacion", back_populates="localidad", lazy="joined")
+    @declared_attr
+    def codigo_provincia(cls):
+        return Column(Integer, ForeignKey(f'{cls.__provincias_table__}.codigo'), nullable=False)
 
     def __repr__(self):
         return f"<Localidad(codigo='{self.codigo}', nombre='{self.nombre}', provincia='{self.codigo_provincia}')>"
 
 
+class EstacionColumns:
+    __localidades_table__ = 'localidades'
 
-class Estacion(Base):
-    __tablename__ = 'estaciones'
     cod_estacion = Column(Integer, primary_key=True, index=True, autoincrement=True)
     nombre = Column(String, nullable=False)
     tipo = Column(ChoiceType(TipoEstacion, impl=String()), nullable=False)
     direccion = Column(String)
-    codigo_postal = Column(String)
+    # Siempre 5 cifras con ceros a la izquierda ("08001")
+    codigo_postal = Column(String(5), index=True)
     latitud = Column(Float)
     longitud = Column(Float)
     descripcion = Column(String)
@@ -58,13 +54,128 @@ class Estacion(Base):
     contacto = Column(String)
     url = Column(String)
 
-    # Relación con Localidad (N Estaciones a 1 Localidad)
-    codigo_localidad = Column(Integer, ForeignKey('localidades.codigo'), nullable=True)
-    localidad = relationship("Localidad", back_populates="estaciones", lazy="joined")
+    @declared_attr
+    def codigo_localidad(cls):
+        return Column(Integer, ForeignKey(f'{cls.__localidades_table__}.codigo'), nullable=True)
 
     # Origen de datos (ej. 'gal', 'cat', 'cv') para saber de dónde vino el registro
     origen_datos = Column(String(3), nullable=False)
 
+    # Huella SHA-256 de los campos normalizados, permite detectar cambios en recargas
+    hash_contenido = Column(String(64), nullable=True)
+
     def __repr__(self):
         return (f"<Estacion(cod_estacion='{self.cod_estacion}', nombre='{self.nombre}', "
-                f"tipo='{self.tipo.value}', localidad='{self.codigo_localidad}')>")
\ No newline at end of file
+                f"tipo='{self.tipo.value}', localidad='{self.codigo_localidad}')>")
+
+
+# Las relaciones son perezosas: cada consulta indica explícitamente qué joins
+# necesita (contains_eager / joinedload) para no arrastrar provincias enteras
+class Provincia(ProvinciaColumns, Base):
+    __tablename__ = 'provincias'
+
+    # Relación con Localidades (1 Provincia tiene 1 o más Localidades)
+    localidades = relationship("Localidad", back_populates="provincia")
+
+
+
+class Localidad(LocalidadColumns, Base):
+    __tablename__ = 'localidades'
+
+    # Relación con Provincia (N localidades a 1 Provincia)
+    provincia = relationship("Provincia", back_populates="localidades")
+
+    # Relación con Estaciones (1 Localidad tiene 0 o más Estaciones)
+    estaciones = relationship("Estacion", back_populates="localidad")
+
+
+
+class Estacion(EstacionColumns, Base):
+    __tablename__ = 'estaciones'
+
+    # Relación con Localidad (N Estaciones a 1 Localidad)
+    localidad = relationship("Localidad", back_populates="estaciones")
+
+
+
+# Tablas de staging: una recarga completa se escribe aquí y se vuelca a las
+# tablas reales en una única transacción cuando ha terminado correctamente
+class ProvinciaStaging(ProvinciaColumns, Base):
+    __tablename__ = 'provincias_staging'
+
+
+class LocalidadStaging(LocalidadColumns, Base):
+    __tablename__ = 'localidades_staging'
+    __provincias_table__ = 'provincias_staging'
+
+
+class EstacionStaging(EstacionColumns, Base):
+    __tablename__ = 'estaciones_staging'
+    __localidades_table__ = 'localidades_staging'
+
+
+# Tabla de lectura desnormalizada para la API de búsqueda: una fila por estación
+# con los nombres de localidad y provincia ya resueltos y claves de búsqueda
+# normalizadas. La carga la sincroniza al terminar cada pipeline
+class EstacionBusqueda(Base):
+    __tablename__ = 'estaciones_busqueda'
+
+    cod_estacion = Column(Integer, primary_key=True, autoincrement=False)
+    nombre = Column(String, nullable=False)
+    # Valor del tipo como texto ("Fija", "Movil", "Otros") y su código en TIPO_CODIGOS
+    tipo = Column(String, nullable=False)
+    codigo_tipo = Column(SmallInteger, nullable=False, index=True)
+    direccion = Column(String)
+    codigo_postal = Column(String(5), index=True)
+    latitud = Column(Float)
+    longitud = Column(Float)
+    descripcion = Column(String)
+    horario = Column(String)
+    contacto = Column(String)
+    url = Column(String)
+    codigo_localidad = Column(Integer, index=True)
+    origen_datos = Column(String(3), nullable=False, index=True)
+    localidad_nombre = Column(String)
+    codigo_provincia = Column(Integer, index=True)
+    provincia_nombre = Column(String)
+
+    # Nombres en minúsculas y sin tildes para las búsquedas por subcadena
+    localidad_clave = Column(String)
+    provincia_clave = Column(String)
+    geohash = Column(String(12), index=True)
+
+    # hash_contenido de la estación al sincronizar, para refrescar solo lo que cambia
+    hash_contenido = Column(String(64), nullable=True)
+
+    def __repr__(self):
+        return f"<EstacionBusqueda(cod_estacion='{self.cod_estacion}', nombre='{self.nombre}')>"
+
+
+class HuellaRegistro(Base):
+    __tablename__ = 'huellas_registros'
+
+    # Huella de un registro crudo en la última carga incremental correcta de su origen
+    origen_datos = Column(String(3), primary_key=True)
+    clave = Column(String, primary_key=True)
+    hash_contenido = Column(String(64), nullable=False)
+
+    # Estación generada (None si el registro fue rechazado): las cargas
+    # incrementales borran por cod_estacion, el nombre se repite entre localidades
+    nombre_estacion = Column(String, nullable=True)
+    cod_estacion = Column(Integer, nullable=True)
+
+    def __repr__(self):
+        return f"<HuellaRegistro(origen_datos='{self.origen_datos}', clave='{self.clave}')>"
+
+
+
+class GeneracionDatos(Base):
+    __tablename__ = 'generacion_datos'
+
+    # Fila única con un contador que se incrementa tras cada escritura de la carga.
+    # Las APIs de lectura lo usan para invalidar cachés y estructuras en memoria
+    id = Column(Integer, primary_key=True)
+    generacion = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<GeneracionDatos(generacion='{self.generacion}')>"
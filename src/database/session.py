@@ -1,20 +1,43 @@
 # src/database/session.py
 from sqlalchemy import create_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker
-from .settings import DATABASE_URL
-from .models import Base
+from .settings import DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_PRE_PING
 
-engine = create_engine(DATABASE_URL)
+
+def engine_options(url: str) -> dict:
+    """Opciones de pool comunes a los motores síncrono y asíncrono."""
+    options = {"pool_pre_ping": DB_POOL_PRE_PING}
+    # SQLite no usa un QueuePool configurable
+    if make_url(url).get_backend_name() != "sqlite":
+        options.update(pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW)
+    return options
+
+
+engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Búsqueda por subcadena sin tildes en localidades y provincias (ver src/api/text_search.py).
+# Las claves ya se guardan normalizadas en estaciones_busqueda: basta un índice de trigramas
+SEARCH_INDEX_DDL = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm;",
+    "CREATE INDEX IF NOT EXISTS ix_estaciones_busqueda_localidad_trgm "
+    "ON estaciones_busqueda USING gin (localidad_clave gin_trgm_ops);",
+    "CREATE INDEX IF NOT EXISTS ix_estaciones_busqueda_provincia_trgm "
+    "ON estaciones_busqueda USING gin (provincia_clave gin_trgm_ops);",
+)
+
 # Crea las tablas si no existen, sino las ignora
 def create_db_and_tables():
     """
-    Crea en la base de datos todas las tablas definidas en models.py.
+    Crea en la base de datos todas las tablas definidas en models.py y las
+    columnas e índices que falten, incluidos los de trigramas para la
+    búsqueda por nombre (ver migrations.py).
     Además, habilita Row Level Security (RLS) en cada tabla para Supabase.
     """
-    Base.metadata.create_all(bind=engine)
+    from .migrations import upgrade_schema
+    upgrade_schema(engine)
 
     # Habilita RLS en cada tabla 
     from sqlalchemy import text
@@ -22,6 +45,12 @@ def create_db_and_tables():
         conn.execute(text("ALTER TABLE provincias ENABLE ROW LEVEL SECURITY;"))
         conn.execute(text("ALTER TABLE localidades ENABLE ROW LEVEL SECURITY;"))
         conn.execute(text("ALTER TABLE estaciones ENABLE ROW LEVEL SECURITY;"))
+        conn.execute(text("ALTER TABLE huellas_registros ENABLE ROW LEVEL SECURITY;"))
+        conn.execute(text("ALTER TABLE provincias_staging ENABLE ROW LEVEL SECURITY;"))
+        conn.execute(text("ALTER TABLE localidades_staging ENABLE ROW LEVEL SECURITY;"))
+        conn.execute(text("ALTER TABLE estaciones_staging ENABLE ROW LEVEL SECURITY;"))
+        conn.execute(text("ALTER TABLE generacion_datos ENABLE ROW LEVEL SECURITY;"))
+        conn.execute(text("ALTER TABLE estaciones_busqueda ENABLE ROW LEVEL SECURITY;"))
         conn.commit()
 
 # Obtener sesión de la base de datos
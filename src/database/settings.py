@@ -5,4 +5,20 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-DATABASE_URL = os.getenv("DATABASE_URL", "")
\ No newline at end of file
+DATABASE_URL = os.getenv("DATABASE_URL", "")
+
+# URL para el motor asíncrono (API de búsqueda). Si no se indica se deriva de
+# DATABASE_URL cambiando el driver: asyncpg para Postgres, aiosqlite para SQLite
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL", "")
+
+# Pool de conexiones (no aplica a SQLite)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+# Comprueba la conexión antes de reutilizarla (evita errores tras cortes del servidor)
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").strip().lower() in ("1", "true", "yes")
+
+# Caché de respuestas de la API de búsqueda
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "512"))
+# Cada cuántos segundos se consulta la generación de datos en la BD. La API de
+# carga corre en otro proceso, así que este es el retraso máximo tras una carga
+GENERATION_POLL_SECONDS = float(os.getenv("GENERATION_POLL_SECONDS", "1.0"))
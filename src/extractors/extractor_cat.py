@@ -12,6 +12,7 @@ if str(ROOT_DIR) not in sys.path:
 from src.common.dependencies import get_api_data, save_transformed_to_json, transformed_data_to_database
 from src.common.errors import error_msg, register_rejection, register_repair
 from src.common.validators import clean_invalid_email
+from src.common.fingerprints import RECORD_KEY_FIELD
 
 provinciaCat = ["Tarragona", "Lleida", "Girona", "Barcelona"]
 
@@ -303,6 +304,8 @@ def transform_cat_data(data_list: list) -> list:
     for record in deduped_records:
         res = transform_cat_record(record)
         if res:
+            if RECORD_KEY_FIELD in record:
+                res[RECORD_KEY_FIELD] = record[RECORD_KEY_FIELD]
             transformed_data.append(res)
             stats_trans["valid"] += 1
         else:
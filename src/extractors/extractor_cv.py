@@ -14,6 +14,7 @@ if str(ROOT_DIR) not in sys.path:
 from src.extractors.selenium_cv import geolocate_google_selenium
 from src.common.dependencies import get_api_data, save_transformed_to_json, transformed_data_to_database
 from src.common.errors import error_msg, register_rejection, check_postal_code
+from src.common.fingerprints import RECORD_KEY_FIELD
 from src.common.validators import (
     is_valid_horario, 
     is_valid_email, 
@@ -242,6 +243,8 @@ def transform_cv_data(data_list: list) -> list:
             stats_trans["total"] += 1
             res = transform_cv_record(record, driver=driver)
             if res:
+                if RECORD_KEY_FIELD in record:
+                    res[RECORD_KEY_FIELD] = record[RECORD_KEY_FIELD]
                 transformed_data.append(res)
                 stats_trans["valid"] += 1
             else:
@@ -16,6 +16,7 @@ from src.common.errors import (
 )
 from src.common.dependencies import get_api_data, save_transformed_to_json, transformed_data_to_database
 from src.common.validators import clean_invalid_email
+from src.common.fingerprints import RECORD_KEY_FIELD
 
 SOURCE_TAG = "gal"
 
@@ -178,6 +179,8 @@ def transform_gal_data(data_list: list[dict]) -> list[dict]:
             seen_keys.add(key_nombre)
         res = transform_gal_record(record)
         if res:
+            if RECORD_KEY_FIELD in record:
+                res[RECORD_KEY_FIELD] = record[RECORD_KEY_FIELD]
             transformed_data.append(res)
             stats_trans["valid"] += 1
         else:
@@ -0,0 +1,138 @@
+# tests/conftest.py
+"""
+Configuración común de los tests: base de datos SQLite temporal con unas
+estaciones de ejemplo, clientes de las APIs de búsqueda y de carga y una
+tabla de lectura aparte para probar los índices en memoria con datos propios.
+DATABASE_URL se fija al cargar este módulo, antes de que los tests importen
+src, porque los motores se crean al importar src.database.
+"""
+import asyncio
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import pytest
+
+DB_PATH = Path(tempfile.mkdtemp(prefix="iei-itv-tests-")) / "itv.db"
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+os.environ["ASYNC_DATABASE_URL"] = ""
+
+LOCALIDADES = 10
+ESTACIONES_POR_LOCALIDAD = 5
+
+
+@pytest.fixture(scope="session")
+def db_path() -> Path:
+    """Fichero de la base de datos SQLite de los tests."""
+    return DB_PATH
+
+
+@pytest.fixture(scope="session")
+def stations() -> list[dict]:
+    """
+    Estaciones de ejemplo guardadas en la BD (origen cv): una provincia con
+    muchas localidades y estaciones, que una carga ansiosa traería entera.
+    """
+    from src.common.db_storage import bump_data_generation, refresh_search_table, save_stations
+    from src.database.migrations import upgrade_schema
+
+    records = [
+        {
+            "nombre": f"ITV Valencia {localidad}-{numero}",
+            "p_nombre": "Valencia",
+            "p_cod": 46,
+            "l_nombre": f"Localidad {localidad}",
+            "tipo": "Fija",
+            "direccion": f"Calle {numero}",
+            "codigo_postal": f"46{localidad:01d}{numero:02d}",
+            "latitud": 39.4 + localidad / 100,
+            "longitud": -0.3 - numero / 100,
+        }
+        for localidad in range(LOCALIDADES)
+        for numero in range(ESTACIONES_POR_LOCALIDAD)
+    ]
+    upgrade_schema()
+    save_stations(records, "cv")
+    refresh_search_table()
+    bump_data_generation()
+    return records
+
+
+@pytest.fixture(scope="session")
+def search_client(stations):
+    from fastapi.testclient import TestClient
+
+    from src.api.api_search import app
+    from src.api.cache import data_generation
+
+    with TestClient(app) as client:
+        # La primera petición publica la generación y precalienta la caché en
+        # segundo plano: se espera a que termine para no mezclar sus consultas
+        client.get("/estaciones/0")
+        deadline = time.monotonic() + 5
+        while data_generation._tasks and time.monotonic() < deadline:
+            time.sleep(0.01)
+        yield client
+
+
+@pytest.fixture(scope="session")
+def load_client(stations):
+    from fastapi.testclient import TestClient
+
+    from src.api.api_load import app
+
+    with TestClient(app) as client:
+        yield client
+
+
+class ReadTable:
+    """Tabla estaciones_busqueda en una BD propia para refrescar los índices en memoria."""
+
+    def __init__(self, path: Path):
+        from sqlalchemy import create_engine
+        from sqlalchemy.ext.asyncio import create_async_engine
+        from sqlalchemy.pool import NullPool
+
+        from src.database.models import EstacionBusqueda
+
+        self._table = EstacionBusqueda.__table__
+        self._engine = create_engine(f"sqlite:///{path}")
+        self._table.create(self._engine)
+        # Sin pool: cada refresh corre en su propio bucle de eventos
+        self._async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+
+    @staticmethod
+    def row(cod_estacion: int, **fields) -> dict:
+        """Fila con las columnas obligatorias rellenas y hash_contenido derivado del resto."""
+        from src.database.models import TIPO_CODIGOS
+
+        row = {"nombre": f"ITV {cod_estacion}", "tipo": "Fija", "origen_datos": "cv", **fields}
+        row["cod_estacion"] = cod_estacion
+        row["codigo_tipo"] = TIPO_CODIGOS[row["tipo"]]
+        row.setdefault("hash_contenido", str(hash(tuple(sorted(fields.items(), key=str)))))
+        return row
+
+    def replace(self, rows: list[dict]) -> None:
+        with self._engine.begin() as conn:
+            conn.execute(self._table.delete())
+            if rows:
+                # Todas las filas con las mismas claves para un único executemany
+                conn.execute(self._table.insert(), [
+                    {column.key: row.get(column.key) for column in self._table.columns} for row in rows
+                ])
+
+    def refresh(self, index, generation: int) -> None:
+        """Ejecuta index.refresh(db, generation) contra esta tabla."""
+        from sqlalchemy.ext.asyncio import AsyncSession
+
+        async def run():
+            async with AsyncSession(self._async_engine) as db:
+                await index.refresh(db, generation)
+
+        asyncio.run(run())
+
+
+@pytest.fixture
+def read_table(tmp_path) -> ReadTable:
+    return ReadTable(tmp_path / "busqueda.db")
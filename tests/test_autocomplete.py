@@ -0,0 +1,79 @@
+# tests/test_autocomplete.py
+"""
+Autocompletado: el trie devuelve lo mismo que filtrar por fuerza bruta los
+nombres (completos o desde el inicio de cualquier palabra) y quedarse con
+los primeros del ranking.
+"""
+import random
+import re
+
+import pytest
+
+from src.api.autocomplete import MAX_SUGGESTIONS, NameCompletions, PrefixTrie
+from src.common.search_keys import normalize_search_text
+
+NAMES = ["Santiago de Compostela", "A Coruña", "Castellón de la Plana", "Castelló", "L'Alcora",
+         "Alcoy/Alcoi", "Sant Cugat del Vallès", "Lugo", "Ourense", "València", "Vall d'Uixó", "Vigo"]
+PREFIXES = ["", "s", "sant", "SANT C", "de", "de la p", "cor", "coruna", "alco", "l'a", "alcoi",
+            "castello", "castellon", "vall", "  vigo ", "d'u", "xyz", "ò", "a c"]
+
+
+def _brute_force(entries: list[dict], prefix: str, limit: int) -> list[dict]:
+    folded_prefix = normalize_search_text(prefix.strip())
+    matches = []
+    for entry in entries:
+        folded = normalize_search_text(entry["nombre"])
+        starts = [match.start() for match in re.finditer(r"(?<![^\W_])[^\W_]", folded)]
+        if any(folded[start:].startswith(folded_prefix) for start in starts):
+            matches.append(entry)
+    return matches[:min(limit, MAX_SUGGESTIONS)]
+
+
+def _entries(seed: int, count: int) -> list[dict]:
+    rng = random.Random(seed)
+    entries = [
+        {"nombre": f"{rng.choice(NAMES)} {number}" if number >= len(NAMES) else NAMES[number],
+         "estaciones": rng.randint(1, 9)}
+        for number in range(count)
+    ]
+    return sorted(entries, key=lambda entry: (-entry["estaciones"], normalize_search_text(entry["nombre"])))
+
+
+@pytest.mark.parametrize("limit", [1, 5, MAX_SUGGESTIONS + 10])
+def test_complete_matches_brute_force(limit):
+    # Más entradas que MAX_SUGGESTIONS para que los nodos cortos se llenen
+    entries = _entries(43, 300)
+    trie = PrefixTrie(entries)
+
+    for prefix in PREFIXES:
+        assert trie.complete(prefix, limit) == _brute_force(entries, prefix, limit), prefix
+
+
+def test_refresh_ranks_names_by_station_count(read_table):
+    rng = random.Random(430)
+    rows = []
+    for cod in range(1, 151):
+        localidad = rng.randrange(len(NAMES))
+        rows.append(read_table.row(
+            cod,
+            codigo_localidad=localidad,
+            localidad_nombre=NAMES[localidad],
+            codigo_provincia=localidad % 4,
+            provincia_nombre=NAMES[localidad % 4],
+        ))
+    read_table.replace(rows)
+    completions = NameCompletions()
+    read_table.refresh(completions, 1)
+
+    counts: dict[str, int] = {}
+    for row in rows:
+        counts[row["localidad_nombre"]] = counts.get(row["localidad_nombre"], 0) + 1
+    ranked = sorted(counts, key=lambda nombre: (-counts[nombre], normalize_search_text(nombre)))
+    for prefix in PREFIXES:
+        expected = _brute_force([{"nombre": nombre} for nombre in ranked], prefix, 10)
+        found = completions.localidades.complete(prefix, 10)
+        assert [entry["nombre"] for entry in found] == [entry["nombre"] for entry in expected], prefix
+        assert [entry["estaciones"] for entry in found] == [counts[entry["nombre"]] for entry in found]
+
+    provincias = completions.provincias.complete("", 10)
+    assert sum(entry["estaciones"] for entry in provincias) == len(rows)
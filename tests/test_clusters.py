@@ -0,0 +1,113 @@
+# tests/test_clusters.py
+"""
+Pirámide de clusters: en cada nivel de zoom los clusters son las celdas de
+la rejilla Web Mercator calculadas por fuerza bruta, con su recuento,
+centroide y tipo predominante, y el filtro por rectángulo no pierde ninguno.
+"""
+import math
+import random
+
+import pytest
+
+from src.api.clusters import CLUSTER_CELL_PX, MAX_CLUSTER_ZOOM, TILE_SIZE_PX, ClusterPyramid
+
+TIPOS = ["Fija", "Fija", "Movil", "Otros"]
+
+
+@pytest.fixture
+def located(read_table) -> list[dict]:
+    rng = random.Random(41)
+    rows = []
+    for cod in range(1, 401):
+        # Grupos apretados alrededor de unas pocas ciudades y algunas sueltas
+        lat, lon = rng.choice([(39.47, -0.38), (41.39, 2.17), (42.88, -8.54), (38.35, -0.48)])
+        spread = rng.choice([0.001, 0.05, 1.0])
+        rows.append(read_table.row(
+            cod,
+            latitud=lat + rng.uniform(-spread, spread),
+            longitud=lon + rng.uniform(-spread, spread),
+            tipo=rng.choice(TIPOS),
+        ))
+    rows += [read_table.row(cod) for cod in range(401, 404)]
+    read_table.replace(rows)
+    return [row for row in rows if row.get("latitud") is not None]
+
+
+@pytest.fixture
+def pyramid(read_table, located) -> ClusterPyramid:
+    pyramid = ClusterPyramid()
+    read_table.refresh(pyramid, 1)
+    return pyramid
+
+
+def _cell(row: dict, zoom: int) -> tuple[int, int]:
+    # Píxel del mapa mundial de ese zoom dividido por el tamaño de celda
+    world_px = TILE_SIZE_PX * 2 ** zoom
+    lat = math.radians(row["latitud"])
+    x = (row["longitud"] + 180) / 360 * world_px
+    y = (1 - math.asinh(math.tan(lat)) / math.pi) / 2 * world_px
+    return int(x // CLUSTER_CELL_PX), int(y // CLUSTER_CELL_PX)
+
+
+def _brute_force(located: list[dict], zoom: int) -> list[tuple]:
+    cells: dict[tuple[int, int], list[dict]] = {}
+    for row in located:
+        cells.setdefault(_cell(row, zoom), []).append(row)
+
+    clusters = []
+    for members in cells.values():
+        counts = {tipo: sum(member["tipo"] == tipo for member in members) for tipo in TIPOS}
+        # A igual número gana el tipo de la estación de menor código
+        dominant = min(
+            (member["tipo"] for member in members),
+            key=lambda tipo: (-counts[tipo], next(i for i, m in enumerate(members) if m["tipo"] == tipo)),
+        )
+        clusters.append((
+            len(members),
+            round(sum(member["latitud"] for member in members) / len(members), 9),
+            round(sum(member["longitud"] for member in members) / len(members), 9),
+            dominant,
+            members[0]["cod_estacion"] if len(members) == 1 else None,
+        ))
+    return sorted(clusters)
+
+
+def _summary(clusters: list[dict]) -> list[tuple]:
+    return sorted(
+        (
+            cluster["total"],
+            round(cluster["latitud"], 9),
+            round(cluster["longitud"], 9),
+            cluster["tipo_dominante"],
+            cluster["cod_estacion"],
+        )
+        for cluster in clusters
+    )
+
+
+@pytest.mark.parametrize("zoom", range(MAX_CLUSTER_ZOOM + 1))
+def test_levels_match_brute_force(pyramid, located, zoom):
+    clusters = pyramid.query(zoom, None)["clusters"]
+
+    assert _summary(clusters) == _brute_force(located, zoom)
+    assert sum(cluster["total"] for cluster in clusters) == len(located)
+
+
+@pytest.mark.parametrize("zoom", [0, 6, 9, MAX_CLUSTER_ZOOM, MAX_CLUSTER_ZOOM + 1])
+def test_bbox_keeps_every_point_inside(pyramid, located, zoom):
+    bbox = (39.0, -1.0, 40.0, 0.0)
+
+    def inside(lat, lon):
+        return bbox[0] <= lat <= bbox[2] and bbox[1] <= lon <= bbox[3]
+
+    result = pyramid.query(zoom, bbox)
+
+    if zoom > MAX_CLUSTER_ZOOM:
+        assert result["clusters"] == []
+        assert [row["cod_estacion"] for row in result["estaciones"]] == [
+            row["cod_estacion"] for row in located if inside(row["latitud"], row["longitud"])
+        ]
+    else:
+        assert result["estaciones"] == []
+        expected = [cluster for cluster in _brute_force(located, zoom) if inside(cluster[1], cluster[2])]
+        assert _summary(result["clusters"]) == expected
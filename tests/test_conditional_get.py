@@ -0,0 +1,57 @@
+# tests/test_conditional_get.py
+"""
+Peticiones condicionales (If-None-Match): una ETag concreta que coincide
+responde 304, pero '*' no debe convertir en 304 el 404 de un recurso que no
+existe.
+"""
+from sqlalchemy import select
+
+from src.api.cache import etag_matches
+from src.database.models import Estacion
+from src.database.session import SessionLocal
+
+
+def _first_code() -> int:
+    with SessionLocal() as session:
+        return session.execute(select(Estacion.cod_estacion).limit(1)).scalar_one()
+
+
+def test_etag_matches_only_concrete_tags():
+    assert etag_matches('"abc"', '"abc"')
+    assert etag_matches('W/"abc", "def"', '"abc"')
+    assert not etag_matches('"def"', '"abc"')
+    assert not etag_matches("*", '"abc"')
+    assert not etag_matches(None, '"abc"')
+
+
+def test_missing_station_with_wildcard_is_not_found(search_client):
+    response = search_client.get("/estaciones/999999", headers={"If-None-Match": "*"})
+
+    assert response.status_code == 404
+
+
+def test_station_with_wildcard_is_returned(search_client):
+    cod_estacion = _first_code()
+
+    response = search_client.get(f"/estaciones/{cod_estacion}", headers={"If-None-Match": "*"})
+
+    assert response.status_code == 200
+    assert response.json()["cod_estacion"] == cod_estacion
+
+
+def test_station_with_current_etag_is_not_modified(search_client):
+    cod_estacion = _first_code()
+    etag = search_client.get(f"/estaciones/{cod_estacion}").headers["ETag"]
+
+    response = search_client.get(f"/estaciones/{cod_estacion}", headers={"If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert not response.content
+
+
+def test_load_list_with_wildcard_is_returned(load_client):
+    response = load_client.get("/load", params={"fuente": "cv", "limit": 1}, headers={"If-None-Match": "*"})
+
+    assert response.status_code == 200
+    assert len(response.json()["resultados"]) == 1
@@ -0,0 +1,97 @@
+# tests/test_full_text.py
+"""
+Índice de texto libre: la búsqueda con BM25 y prefijos coincide con una
+puntuación calculada por fuerza bruta sobre todas las estaciones, también
+tras un refresco incremental.
+"""
+import math
+import random
+
+from src.api.full_text import BM25_B, BM25_K1, StationTextIndex, tokenize
+
+WORDS = ["Valencia", "València", "Alzira", "Alcoy", "polígono", "Poligono", "calle", "carrer",
+         "mañana", "tarde", "lunes", "viernes", "sábado", "ITV", "Applus", "Sitval", "norte", "sur"]
+QUERIES = ["valencia", "al", "poli", "itv tarde", "ca sur", "SÁBADO mañana", "x", "", "applus sitval norte"]
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(0, words)))
+
+
+def _rows(read_table, rng: random.Random, codes) -> list[dict]:
+    return [
+        read_table.row(
+            cod,
+            nombre=_text(rng, 4) or "ITV",
+            direccion=_text(rng, 3),
+            horario=_text(rng, 5),
+            localidad_nombre=rng.choice(WORDS),
+        )
+        for cod in codes
+    ]
+
+
+def _brute_force(rows: list[dict], query: str) -> list[int]:
+    documents = {
+        row["cod_estacion"]: [
+            token
+            for key in ("nombre", "direccion", "horario", "localidad_nombre")
+            for token in tokenize(row[key])
+        ]
+        for row in rows
+    }
+    average_length = sum(len(tokens) for tokens in documents.values()) / len(documents)
+
+    scores: dict[int, float] = {}
+    for token in set(tokenize(query)):
+        for cod, tokens in documents.items():
+            # La mejor de las palabras de la estación que empiezan por el término
+            best = 0.0
+            for term in set(tokens):
+                if not term.startswith(token):
+                    continue
+                containing = sum(term in other for other in documents.values())
+                idf = math.log(1 + (len(documents) - containing + 0.5) / (containing + 0.5))
+                frequency = tokens.count(term)
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * len(tokens) / average_length)
+                best = max(best, idf * frequency * (BM25_K1 + 1) / (frequency + norm))
+            if best:
+                scores[cod] = scores.get(cod, 0.0) + best
+    return sorted(scores, key=lambda cod: (-scores[cod], cod))
+
+
+def test_search_matches_brute_force(read_table):
+    rows = _rows(read_table, random.Random(38), range(1, 121))
+    read_table.replace(rows)
+    index = StationTextIndex()
+    read_table.refresh(index, 1)
+
+    for query in QUERIES:
+        assert index.search(query) == _brute_force(rows, query), query
+
+
+def test_incremental_refresh_matches_brute_force(read_table):
+    rng = random.Random(380)
+    rows = _rows(read_table, rng, range(1, 121))
+    read_table.replace(rows)
+    index = StationTextIndex()
+    read_table.refresh(index, 1)
+
+    # Se cambian unas estaciones, se quitan otras y se añaden nuevas
+    kept = [row for row in rows if row["cod_estacion"] % 7]
+    changed = {row["cod_estacion"] for row in rng.sample(kept, 20)}
+    rows = [row for row in kept if row["cod_estacion"] not in changed]
+    rows += _rows(read_table, rng, sorted(changed)) + _rows(read_table, rng, range(200, 230))
+    read_table.replace(rows)
+    read_table.refresh(index, 2)
+
+    rebuilt = StationTextIndex()
+    read_table.refresh(rebuilt, 2)
+    for query in QUERIES:
+        expected = _brute_force(rows, query)
+        assert index.search(query) == expected, query
+        assert rebuilt.search(query) == expected, query
+
+
+def test_empty_index():
+    assert StationTextIndex().search("valencia") == []
@@ -0,0 +1,134 @@
+# tests/test_geo.py
+"""
+Índice espacial: los vecinos más cercanos y los rectángulos del KD-tree, y
+las consultas por lotes vectorizadas, coinciden con recorrer todas las
+estaciones por fuerza bruta.
+"""
+import math
+import random
+
+import numpy as np
+import pytest
+
+from src.api import geo
+from src.api.geo import KDTree, StationGeoIndex, haversine_km
+
+TIPOS = ["Fija", "Movil", "Otros"]
+ORIGENES = ["cv", "cat", "gal"]
+
+
+@pytest.fixture
+def located(read_table) -> list[dict]:
+    rng = random.Random(39)
+    rows = [
+        read_table.row(
+            cod,
+            latitud=rng.uniform(36.0, 43.8),
+            longitud=rng.uniform(-9.3, 3.3),
+            tipo=rng.choice(TIPOS),
+            origen_datos=rng.choice(ORIGENES),
+        )
+        for cod in range(1, 301)
+    ]
+    # Estaciones sin coordenadas: no entran en el índice
+    rows += [read_table.row(cod) for cod in range(301, 306)]
+    read_table.replace(rows)
+    return [row for row in rows if row.get("latitud") is not None]
+
+
+@pytest.fixture
+def index(read_table, located) -> StationGeoIndex:
+    index = StationGeoIndex()
+    read_table.refresh(index, 1)
+    return index
+
+
+def _points(seed: int, count: int) -> list[tuple[float, float]]:
+    rng = random.Random(seed)
+    return [(rng.uniform(35.0, 45.0), rng.uniform(-10.0, 5.0)) for _ in range(count)]
+
+
+def _closest(rows, lat, lon, k, radio_km=None) -> list[tuple[int, float]]:
+    ranked = sorted(
+        ((row["cod_estacion"], haversine_km(lat, lon, row["latitud"], row["longitud"])) for row in rows),
+        key=lambda item: (item[1], item[0]),
+    )
+    if radio_km is not None:
+        ranked = [item for item in ranked if item[1] <= radio_km]
+    return ranked[:k]
+
+
+def test_kdtree_matches_brute_force():
+    rng = random.Random(390)
+    points = [((rng.random(), rng.random(), rng.random()), value) for value in range(500)]
+    tree = KDTree(list(points), 3)
+
+    for _ in range(50):
+        target = (rng.random(), rng.random(), rng.random())
+        expected = sorted((math.dist(point, target), value) for point, value in points)
+        assert tree.nearest(target, 7) == expected[:7]
+        assert tree.nearest(target, 7, 0.2) == [item for item in expected[:7] if item[0] <= 0.2]
+
+        lows = tuple(rng.uniform(0, 0.6) for _ in range(3))
+        highs = tuple(low + rng.uniform(0, 0.4) for low in lows)
+        inside = [
+            value for point, value in points
+            if all(low <= coord <= high for coord, low, high in zip(point, lows, highs))
+        ]
+        assert sorted(tree.within(lows, highs)) == inside
+
+
+def test_nearest_matches_brute_force(index, located):
+    for lat, lon in _points(391, 40):
+        for k, radio_km in ((1, None), (10, None), (10, 60.0), (400, None)):
+            expected = _closest(located, lat, lon, k, radio_km)
+            found = index.nearest(lat, lon, k, radio_km)
+            assert [cod for cod, _ in found] == [cod for cod, _ in expected]
+            assert [distance for _, distance in found] == pytest.approx([d for _, d in expected])
+
+
+def test_in_bbox_matches_brute_force(index, located):
+    rng = random.Random(392)
+    for _ in range(40):
+        min_lat, min_lon = rng.uniform(36.0, 42.0), rng.uniform(-9.0, 1.0)
+        bbox = (min_lat, min_lon, min_lat + rng.uniform(0, 2), min_lon + rng.uniform(0, 3))
+        expected = [
+            row["cod_estacion"] for row in located
+            if bbox[0] <= row["latitud"] <= bbox[2] and bbox[1] <= row["longitud"] <= bbox[3]
+        ]
+        assert sorted(index.in_bbox(bbox)) == expected
+
+
+@pytest.mark.parametrize(
+    "k, radio_km, tipo, origen_datos",
+    [(1, None, None, None), (5, None, "Movil", None), (8, 40.0, None, "gal"), (500, None, "Otros", "cv")],
+)
+def test_nearest_batch_matches_brute_force(index, located, monkeypatch, k, radio_km, tipo, origen_datos):
+    # Bloques pequeños para pasar también por el troceado de la matriz
+    monkeypatch.setattr(geo, "BATCH_CELLS", 1000)
+    points = _points(393, 60)
+    candidates = [
+        row for row in located
+        if (tipo is None or row["tipo"] == tipo) and (origen_datos is None or row["origen_datos"] == origen_datos)
+    ]
+
+    codes, distances = index.nearest_batch(
+        np.array([lat for lat, _ in points]), np.array([lon for _, lon in points]), k, radio_km, tipo, origen_datos
+    )
+
+    assert codes.shape == distances.shape == (len(points), k)
+    for (lat, lon), row_codes, row_distances in zip(points, codes, distances):
+        expected = _closest(candidates, lat, lon, k, radio_km)
+        found = len(expected)
+        assert row_codes[:found].tolist() == [cod for cod, _ in expected]
+        assert row_distances[:found] == pytest.approx([distance for _, distance in expected])
+        # Huecos: sin estación a menos de k o fuera del radio
+        assert (row_codes[found:] == -1).all()
+        assert np.isnan(row_distances[found:]).all()
+
+
+def test_nearest_batch_without_stations():
+    codes, distances = StationGeoIndex().nearest_batch(np.array([40.0]), np.array([-3.7]), 3)
+
+    assert codes.tolist() == [[-1, -1, -1]]
+    assert np.isnan(distances).all()
@@ -0,0 +1,61 @@
+# tests/test_markers.py
+"""
+Marcadores del mapa: el JSON y el binario describen las mismas estaciones,
+en el mismo orden, que la tabla de lectura recorrida entera.
+"""
+import numpy as np
+import pytest
+from sqlalchemy import select
+
+from src.api.markers import MARKER_TIPOS
+from src.database.models import EstacionBusqueda
+from src.database.session import SessionLocal
+
+
+@pytest.fixture
+def expected(stations) -> list[tuple]:
+    with SessionLocal() as session:
+        rows = session.execute(
+            select(
+                EstacionBusqueda.cod_estacion,
+                EstacionBusqueda.latitud,
+                EstacionBusqueda.longitud,
+                EstacionBusqueda.tipo,
+            )
+        ).all()
+    return sorted(tuple(row) for row in rows if row.latitud is not None and row.longitud is not None)
+
+
+def test_json_markers_match_table(search_client, expected):
+    body = search_client.get("/estaciones/marcadores").json()
+
+    assert body["total"] == len(expected)
+    assert body["ids"] == [row[0] for row in expected]
+    assert body["lat"] == [row[1] for row in expected]
+    assert body["lon"] == [row[2] for row in expected]
+    assert [body["tipos"][codigo] for codigo in body["tipo"]] == [row[3] for row in expected]
+
+
+def test_binary_markers_match_table(search_client, expected):
+    response = search_client.get("/estaciones/marcadores", params={"formato": "binario"})
+    payload = response.content
+
+    assert response.headers["content-type"] == "application/octet-stream"
+    count = int(np.frombuffer(payload, dtype="<u4", count=1)[0])
+    assert count == len(expected)
+    assert len(payload) == 4 + count * (4 + 4 + 4 + 1)
+
+    offset = 4
+    ids = np.frombuffer(payload, dtype="<u4", count=count, offset=offset)
+    offset += 4 * count
+    lat = np.frombuffer(payload, dtype="<f4", count=count, offset=offset)
+    offset += 4 * count
+    lon = np.frombuffer(payload, dtype="<f4", count=count, offset=offset)
+    offset += 4 * count
+    tipo = np.frombuffer(payload, dtype="u1", count=count, offset=offset)
+
+    assert ids.tolist() == [row[0] for row in expected]
+    # float32: unos 7 dígitos significativos, de sobra para dibujar el mapa
+    assert lat == pytest.approx([row[1] for row in expected], abs=1e-5)
+    assert lon == pytest.approx([row[2] for row in expected], abs=1e-5)
+    assert [MARKER_TIPOS[codigo] for codigo in tipo] == [row[3] for row in expected]
@@ -0,0 +1,69 @@
+# tests/test_migrations.py
+"""Puesta al día del esquema y de los datos anteriores (src/database/migrations.py)."""
+from sqlalchemy import create_engine, event, insert, inspect, select
+
+from src.database.migrations import upgrade_schema
+from src.database.models import Estacion, TipoEstacion
+from src.database.session import SEARCH_INDEX_DDL
+
+
+def _recording_engine(dialect_name: str | None = None):
+    """Motor SQLite en memoria que anota las sentencias ejecutadas."""
+    bind = create_engine("sqlite://")
+    statements = []
+
+    @event.listens_for(bind, "before_cursor_execute", retval=True)
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+        # SQLite no entiende el DDL propio de Postgres: se anota y no se ejecuta
+        if statement in SEARCH_INDEX_DDL:
+            return "SELECT 1", ()
+        return statement, parameters
+
+    if dialect_name:
+        bind.dialect.name = dialect_name
+    return bind, statements
+
+
+def test_upgrade_schema_creates_tables_and_is_idempotent():
+    bind, _ = _recording_engine()
+
+    upgrade_schema(bind)
+    assert {"estaciones_busqueda", "huellas_registros", "generacion_datos"} <= set(inspect(bind).get_table_names())
+    assert upgrade_schema(bind) == []
+
+
+def test_upgrade_schema_runs_trigram_ddl_on_postgres():
+    bind, statements = _recording_engine("postgresql")
+
+    upgrade_schema(bind)
+
+    assert [statement for statement in statements if statement in SEARCH_INDEX_DDL] == list(SEARCH_INDEX_DDL)
+
+
+def test_upgrade_schema_skips_trigram_ddl_elsewhere():
+    bind, statements = _recording_engine()
+
+    upgrade_schema(bind)
+
+    assert not set(statements) & set(SEARCH_INDEX_DDL)
+
+
+def test_upgrade_schema_pads_short_postal_codes():
+    bind, _ = _recording_engine()
+    upgrade_schema(bind)
+    estaciones = Estacion.__table__
+    with bind.begin() as conn:
+        conn.execute(insert(estaciones), [
+            {"nombre": "ITV Barcelona", "tipo": TipoEstacion.Estacion_fija, "codigo_postal": "8001", "origen_datos": "cat"},
+            {"nombre": "ITV Valencia", "tipo": TipoEstacion.Estacion_fija, "codigo_postal": "46001", "origen_datos": "cv"},
+            {"nombre": "ITV Móvil", "tipo": TipoEstacion.Estacion_movil, "codigo_postal": None, "origen_datos": "cv"},
+        ])
+
+    applied = upgrade_schema(bind)
+
+    with bind.connect() as conn:
+        codigos = conn.execute(select(estaciones.c.codigo_postal).order_by(estaciones.c.cod_estacion)).scalars().all()
+    assert codigos == ["08001", "46001", None]
+    assert applied == ["estaciones.codigo_postal (1 filas con 5 cifras)"]
+    assert upgrade_schema(bind) == []
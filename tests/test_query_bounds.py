@@ -0,0 +1,129 @@
+# tests/test_query_bounds.py
+"""
+Cota de consultas y filas leídas por endpoint. Las relaciones del ORM son
+perezosas y cada consulta pide solo los joins que necesita: obtener una
+estación no debe arrastrar su provincia con todas sus localidades y
+estaciones, ni un listado leer más filas que la página pedida.
+"""
+import sqlite3
+from contextlib import closing
+
+import pytest
+from sqlalchemy import event, select
+
+from src.api.cache import response_cache
+from src.api.read_model import station_read_model
+from src.database.async_session import async_engine
+from src.database.models import Estacion
+from src.database.session import SessionLocal, engine
+
+LIMIT = 5
+
+
+class QueryCounter:
+    """Sentencias ejecutadas (listener before_cursor_execute) y filas que devuelven."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.statements: list[tuple[str, tuple]] = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append((statement, parameters))
+
+    @property
+    def rows(self) -> int:
+        # Las sentencias son de solo lectura: se repiten sobre la misma BD para contar sus filas
+        with closing(sqlite3.connect(self.db_path)) as conn:
+            return sum(
+                len(conn.execute(statement, parameters).fetchall())
+                for statement, parameters in self.statements
+                if statement.lstrip().upper().startswith("SELECT")
+            )
+
+
+@pytest.fixture
+def queries(db_path):
+    counter = QueryCounter(db_path)
+    engines = (engine, async_engine.sync_engine)
+    for target in engines:
+        event.listen(target, "before_cursor_execute", counter)
+    yield counter
+    for target in engines:
+        event.remove(target, "before_cursor_execute", counter)
+
+
+@pytest.fixture
+def sql_path(monkeypatch):
+    # Sin caché de respuestas ni modelo de lectura: las rutas consultan la BD
+    monkeypatch.setattr(response_cache, "get", lambda key, generation: None)
+    monkeypatch.setattr(station_read_model, "current", lambda generation: None)
+
+
+def _first_code() -> int:
+    with SessionLocal() as session:
+        return session.execute(select(Estacion.cod_estacion).limit(1)).scalar_one()
+
+
+def test_estacion_relationships_are_lazy(stations, queries):
+    cod_estacion = _first_code()
+    queries.statements.clear()
+
+    with SessionLocal() as session:
+        estacion = session.get(Estacion, cod_estacion)
+        assert len(queries.statements) == 1
+        assert queries.rows == 1
+
+        # La localidad se carga al acceder a ella, sin sus demás estaciones
+        assert estacion.localidad.nombre.startswith("Localidad")
+        assert len(queries.statements) == 2
+        assert queries.rows == 2
+
+
+def test_get_station(search_client, queries, sql_path):
+    cod_estacion = _first_code()
+    queries.statements.clear()
+
+    response = search_client.get(f"/estaciones/{cod_estacion}")
+
+    assert response.status_code == 200
+    assert response.json()["cod_estacion"] == cod_estacion
+    # Generación de datos (si toca consultarla) y la propia estación
+    assert len(queries.statements) <= 2
+    assert queries.rows <= 2
+
+
+def test_get_station_from_read_model(search_client, queries):
+    cod_estacion = _first_code()
+    response_cache.reset(None)
+    queries.statements.clear()
+
+    response = search_client.get(f"/estaciones/{cod_estacion}")
+
+    assert response.status_code == 200
+    # Como mucho la consulta periódica de la generación de datos
+    assert len(queries.statements) <= 1
+    assert queries.rows <= 1
+
+
+def test_list_stations(stations, search_client, queries, sql_path):
+    response = search_client.get("/estaciones", params={"provincia": "valencia", "limit": LIMIT})
+
+    body = response.json()
+    assert response.status_code == 200
+    assert body["total"] == len(stations)
+    assert len(body["resultados"]) == LIMIT
+    # Generación, recuento y página (limit + 1 filas para saber si hay siguiente)
+    assert len(queries.statements) <= 3
+    assert queries.rows <= 1 + 1 + LIMIT + 1
+
+
+def test_load_list_by_source(stations, load_client, queries):
+    response = load_client.get("/load", params={"fuente": "cv", "limit": LIMIT})
+
+    body = response.json()
+    assert response.status_code == 200
+    assert body["total"] == len(stations)
+    assert len(body["resultados"]) == LIMIT
+    # Generación (ETag), recuento y página
+    assert len(queries.statements) <= 3
+    assert queries.rows <= 1 + 1 + LIMIT + 1
@@ -0,0 +1,157 @@
+# tests/test_read_model.py
+"""
+Modelo de lectura: los filtros de la instantánea (AND y OR), la paginación
+por cursor, las facetas y el detalle coinciden con recorrer todas las
+estaciones por fuerza bruta.
+"""
+import itertools
+import random
+from collections import Counter
+
+import pytest
+
+from src.api import read_model
+from src.api.geo import StationGeoIndex
+from src.api.pagination import decode_cursor
+from src.api.read_model import _Snapshot
+from src.common.search_keys import normalize_search_text
+from src.database.models import TIPO_CODIGOS, EstacionBusqueda
+
+LOCALIDADES = ["València", "Alzira", "Castelló de la Plana", "Vila-real", "Lugo", "Vigo", "Girona"]
+PROVINCIAS = {"València": 46, "Alzira": 46, "Castelló de la Plana": 12, "Vila-real": 12,
+              "Lugo": 27, "Vigo": 36, "Girona": 17}
+NOMBRES_PROVINCIA = {46: "Valencia", 12: "Castellón", 27: "Lugo", 36: "Pontevedra", 17: "Girona"}
+
+FILTERS = {
+    "localidades": [None, ("vila",), ("alzira", "lugo"), ("a",)],
+    "postal": [None, (("46000", "46999"),), (("12100", "12100"), ("27000", "27999")), (), ((None, "17500"),)],
+    "provincias": [None, ("castellon",), ("valencia", "girona")],
+    "tipos": [None, (TIPO_CODIGOS["Movil"],), (TIPO_CODIGOS["Fija"], TIPO_CODIGOS["Otros"])],
+    "origenes": [None, ("gal",), ("cv", "cat")],
+    "bbox": [None, (39.0, -1.0, 41.0, 0.5)],
+}
+
+
+@pytest.fixture
+def records(read_table, monkeypatch) -> list[dict]:
+    rng = random.Random(49)
+    rows = []
+    for cod in rng.sample(range(1, 5000), 250):
+        localidad = rng.choice(LOCALIDADES)
+        provincia = PROVINCIAS[localidad]
+        located = rng.random() < 0.9
+        rows.append(read_table.row(
+            cod,
+            nombre=f"ITV {localidad} {cod}",
+            tipo=rng.choice(list(TIPO_CODIGOS)),
+            origen_datos=rng.choice(["cv", "cat", "gal"]),
+            codigo_postal=f"{provincia:02d}{rng.randrange(1000):03d}" if rng.random() < 0.95 else None,
+            latitud=rng.uniform(38.0, 43.0) if located else None,
+            longitud=rng.uniform(-8.0, 3.0) if located else None,
+            codigo_localidad=LOCALIDADES.index(localidad) + 1,
+            localidad_nombre=localidad,
+            codigo_provincia=provincia,
+            provincia_nombre=NOMBRES_PROVINCIA[provincia],
+        ))
+    read_table.replace(rows)
+
+    # El filtro bbox de la instantánea consulta el índice espacial de la misma generación
+    geo_index = StationGeoIndex()
+    read_table.refresh(geo_index, 1)
+    monkeypatch.setattr(read_model, "station_geo_index", geo_index)
+
+    columns = EstacionBusqueda.__table__.columns
+    return sorted(
+        ({column.key: row.get(column.key) for column in columns} for row in rows),
+        key=lambda record: record["cod_estacion"],
+    )
+
+
+@pytest.fixture
+def snapshot(records) -> _Snapshot:
+    return _Snapshot(1, records)
+
+
+def _all_filters():
+    for values in itertools.product(*FILTERS.values()):
+        for combinar in ("and", "or"):
+            yield values + (combinar,)
+
+
+def _brute_force(records: list[dict], filtros: tuple) -> list[int]:
+    localidades, cod_postal, provincias, tipos, origenes, bbox, combinar = filtros
+
+    def checks(record):
+        if localidades:
+            nombre = normalize_search_text(record["localidad_nombre"])
+            yield any(value in nombre for value in localidades)
+        if cod_postal is not None:
+            codigo = record["codigo_postal"]
+            yield codigo is not None and any(
+                (desde is None or desde <= codigo) and (hasta is None or codigo <= hasta)
+                for desde, hasta in cod_postal
+            )
+        if provincias:
+            nombre = normalize_search_text(record["provincia_nombre"])
+            yield any(value in nombre for value in provincias)
+        if tipos:
+            yield record["codigo_tipo"] in tipos
+        if origenes:
+            yield record["origen_datos"] in origenes
+        if bbox:
+            yield (record["latitud"] is not None
+                   and bbox[0] <= record["latitud"] <= bbox[2] and bbox[1] <= record["longitud"] <= bbox[3])
+
+    combine = any if combinar == "or" else all
+    matched = []
+    for record in records:
+        results = list(checks(record))
+        if not results or combine(results):
+            matched.append(record["cod_estacion"])
+    return matched
+
+
+def test_matches_match_brute_force(snapshot, records):
+    for filtros in _all_filters():
+        found = [snapshot.codes[position] for position in snapshot.matches(filtros)]
+        assert found == _brute_force(records, filtros), filtros
+
+
+@pytest.mark.parametrize("limit", [1, 7, 500])
+def test_pages_cover_every_match_once(snapshot, records, limit):
+    campos = ("cod_estacion", "nombre")
+    for filtros in itertools.islice(_all_filters(), 0, None, 37):
+        expected = _brute_force(records, filtros)
+        found, after = [], None
+        while True:
+            page = snapshot.search(filtros, limit, after, True, campos)
+            assert page["total"] == len(expected)
+            assert len(page["resultados"]) <= limit
+            assert all(set(row) == set(campos) for row in page["resultados"])
+            found += [row["cod_estacion"] for row in page["resultados"]]
+            if page["siguiente_cursor"] is None:
+                break
+            after = decode_cursor(page["siguiente_cursor"])
+        assert found == expected, filtros
+
+
+def test_facets_match_brute_force(snapshot, records):
+    facets = {"provincia": "provincia_nombre", "tipo": "tipo", "origen_datos": "origen_datos"}
+    by_code = {record["cod_estacion"]: record for record in records}
+    for filtros in itertools.islice(_all_filters(), 0, None, 23):
+        matched = [by_code[cod] for cod in _brute_force(records, filtros)]
+
+        result = snapshot.facets(filtros, None, facets)
+
+        assert result["total"] == len(matched)
+        for faceta, campo in facets.items():
+            counts = Counter(record[campo] for record in matched)
+            assert {item["valor"]: item["total"] for item in result[faceta]} == counts
+            assert [item["total"] for item in result[faceta]] == sorted(counts.values(), reverse=True)
+
+
+def test_get_matches_records(snapshot, records):
+    for record in records:
+        row = snapshot.get(record["cod_estacion"])
+        assert row == {key: record[key] for key in row}
+    assert snapshot.get(0) is None